@@ -0,0 +1,135 @@
+"""
+HTTP client for the PaperNest API, used by streamlit_app.py.
+
+- One pooled requests.Session (keep-alive, retries for idempotent reads) shared by every
+  browser session of the Streamlit server; each browser session gets its own
+  PaperNestClient on top of it, holding its login and its read cache.
+- Every call has a timeout: a short connect timeout, and a long read timeout for calls
+  that wait on an LLM (summarize, chat, upload). Mutations send it to the server as
+  X-Request-Timeout (a little shorter), so the server stops AI work the client would no
+  longer wait for and answers 504 in time.
+- Reads are cached: within API_CACHE_SECONDS (default 2) a repeated read is answered
+  from memory, which covers the several reads of one Streamlit rerun and quick
+  successive interactions. After that it is revalidated with If-None-Match, so an
+  unchanged response costs a bodiless 304. Every mutation expires the cache (ETags are
+  kept, so data the mutation did not touch still comes back as a 304).
+- get_many() fetches several resources concurrently.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = (3.05, 30)  # (connect, read) seconds
+SLOW_TIMEOUT = (3.05, 180)    # summarize / chat / upload wait on the LLM provider
+DEADLINE_MARGIN = 2.0         # seconds between the server's deadline and the read timeout
+CACHE_SECONDS = float(os.getenv("API_CACHE_SECONDS", "2"))
+POOL_SIZE = int(os.getenv("API_POOL_SIZE", "20"))
+
+_fanout = ThreadPoolExecutor(max_workers=8, thread_name_prefix="api-fanout")
+
+
+def make_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    """Keep-alive connection pool; GETs are retried on connection errors and 502/503/504."""
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                  allowed_methods=("GET", "HEAD"), respect_retry_after_header=True)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class PaperNestClient:
+    def __init__(self, base_url: str, session: Optional[requests.Session] = None,
+                 cache_seconds: float = CACHE_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.http = session or make_session()
+        self.cache_seconds = cache_seconds
+        self.session_id: Optional[str] = None
+        self._cache: Dict[str, Tuple[Optional[str], object, float]] = {}  # path -> (etag, data, fetched at)
+        self._lock = threading.Lock()
+
+    # --- auth -------------------------------------------------------------
+
+    def set_session(self, session_id: Optional[str]) -> None:
+        self.session_id = session_id
+        with self._lock:
+            self._cache.clear()
+
+    def _headers(self) -> dict:
+        return {"X-Session-ID": self.session_id} if self.session_id else {}
+
+    def login(self, username: str, password: str) -> requests.Response:
+        resp = self.http.post(f"{self.base_url}/auth/login", json={"username": username, "password": password},
+                              timeout=DEFAULT_TIMEOUT)
+        if resp.status_code == 200:
+            self.set_session(resp.json()["session_id"])
+        return resp
+
+    def register(self, email: str, username: str, password: str) -> requests.Response:
+        return self.http.post(f"{self.base_url}/auth/register",
+                              json={"email": email, "username": username, "password": password},
+                              timeout=DEFAULT_TIMEOUT)
+
+    # --- reads ------------------------------------------------------------
+
+    def invalidate(self) -> None:
+        """Revalidate every cached read on next use."""
+        with self._lock:
+            for path, (etag, data, _) in self._cache.items():
+                self._cache[path] = (etag, data, float("-inf"))
+
+    def get_json(self, path: str) -> Tuple[int, object]:
+        """GET `path`; returns (status_code, data), data being None unless the status is 200."""
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached and time.monotonic() - cached[2] < self.cache_seconds:
+            return 200, cached[1]
+        headers = self._headers()
+        if cached and cached[0]:
+            headers["If-None-Match"] = cached[0]
+        resp = self.http.get(f"{self.base_url}{path}", headers=headers, timeout=DEFAULT_TIMEOUT)
+        if resp.status_code == 304 and cached:
+            data = cached[1]
+        elif resp.status_code == 200:
+            data = resp.json()
+        else:
+            return resp.status_code, None
+        with self._lock:
+            self._cache[path] = (resp.headers.get("ETag"), data, time.monotonic())
+        return 200, data
+
+    def get_many(self, paths: List[str]) -> List[Tuple[int, object]]:
+        """get_json() for several paths concurrently, results in the same order."""
+        if len(paths) == 1:
+            return [self.get_json(paths[0])]
+        return list(_fanout.map(self.get_json, paths))
+
+    # --- mutations (each expires the read cache) --------------------------
+
+    def _mutate(self, method: str, path: str, timeout=DEFAULT_TIMEOUT, invalidate: bool = True,
+                **kwargs) -> requests.Response:
+        headers = self._headers()
+        headers["X-Request-Timeout"] = f"{max(timeout[1] - DEADLINE_MARGIN, 1.0):g}"
+        try:
+            return self.http.request(method, f"{self.base_url}{path}", headers=headers,
+                                     timeout=timeout, **kwargs)
+        finally:
+            if invalidate:
+                self.invalidate()
+
+    def post(self, path: str, slow: bool = False, invalidate: bool = True, **kwargs) -> requests.Response:
+        """`slow` for calls that wait on an LLM; invalidate=False for POSTs that change nothing (chat)."""
+        return self._mutate("POST", path, SLOW_TIMEOUT if slow else DEFAULT_TIMEOUT, invalidate, **kwargs)
+
+    def patch(self, path: str, **kwargs) -> requests.Response:
+        return self._mutate("PATCH", path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self._mutate("DELETE", path, **kwargs)
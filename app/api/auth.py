@@ -62,7 +62,7 @@ def login(credentials: UserLogin, db: Session = Depends(get_db)):
         )
     
     # Create session
-    session_id = create_session(user.id)
+    session_id = create_session(user.id, db)
     
     return LoginResponse(
         session_id=session_id,
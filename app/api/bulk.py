@@ -0,0 +1,335 @@
+import json
+import os
+import zipfile
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import case, delete, insert, update
+from sqlalchemy.orm import Session
+
+from app.db.database import get_db
+from app.models.paper import Paper, StatusEnum, PriorityEnum
+from app.models.user import User
+from app.schemas.paper import (
+    BulkImportItem, BulkImportJobResponse, BulkOperationResponse,
+    PaperBulkFilter, PaperBulkUpdate, PaperBulkDelete,
+)
+from app.core.dependencies import get_current_user
+from app.core.ingest import ImportJob, register_job, get_job_status, reindex_text
+from app.core.blobstore import BlobTooLarge, get_blob_store
+from app.core.ratelimit import rate_limit
+from app.core.dedup import known_extractions, text_sha256
+from app.core.httpcache import touch_users
+from app.core import pipeline, prefetch
+
+# Registered before the papers router so /papers/bulk is not taken for a {paper_id}
+router = APIRouter(prefix="/papers", tags=["papers"])
+
+INSERT_BATCH_SIZE = 500
+MAX_ITEMS = int(os.environ.get("BULK_IMPORT_MAX_ITEMS", "5000"))
+
+
+def _bad_upload(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def _decode_lines(data: bytes, name: str) -> List[str]:
+    try:
+        return data.decode("utf-8").splitlines()
+    except UnicodeDecodeError:
+        raise _bad_upload(f"{name} is not UTF-8 text")
+
+
+def _store_uploads(files: List[UploadFile]) -> Tuple[Dict[str, Union[str, Exception]], List[str]]:
+    """
+    Stream uploaded PDFs, and the PDFs inside uploaded zips, into the blob store (never
+    fully in memory). Returns ({filename: sha256, or why it could not be read},
+    lines of a metadata.jsonl found in a zip). Metadata refers to PDFs by name, so
+    names must be unique across the upload.
+    """
+    store = get_blob_store()
+    stored: Dict[str, Union[str, Exception]] = {}
+    metadata_lines: List[str] = []
+
+    def claim(name: str) -> None:
+        if name in stored:
+            raise _bad_upload(f"Duplicate file name '{name}' in the upload")
+
+    for index, upload in enumerate(files):
+        name = upload.filename or f"upload-{index}.pdf"
+        if not name.lower().endswith(".zip"):
+            claim(name)
+            try:
+                stored[name], _ = store.put(upload.file)
+            except BlobTooLarge as e:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"'{name}' is {e}")
+            continue
+        try:
+            archive = zipfile.ZipFile(upload.file)
+        except zipfile.BadZipFile:
+            raise _bad_upload(f"'{name}' is not a valid zip archive")
+        with archive:
+            for member in archive.namelist():
+                if member.lower().endswith(".pdf") and not member.startswith("__MACOSX/"):
+                    claim(member)
+                    try:
+                        with archive.open(member) as fh:
+                            stored[member], _ = store.put(fh)
+                    except (BlobTooLarge, zipfile.BadZipFile, OSError, EOFError, RuntimeError,
+                            NotImplementedError) as e:
+                        stored[member] = e  # fails this paper (corrupt, encrypted...), not the whole import
+            if "metadata.jsonl" in archive.namelist():
+                try:
+                    data = archive.read("metadata.jsonl")
+                except (zipfile.BadZipFile, OSError, EOFError, RuntimeError, NotImplementedError) as e:
+                    raise _bad_upload(f"Cannot read metadata.jsonl in '{name}': {e}")
+                metadata_lines = _decode_lines(data, f"metadata.jsonl in '{name}'")
+    return stored, metadata_lines
+
+
+def _parse_metadata(lines) -> List[BulkImportItem]:
+    items = []
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            items.append(BulkImportItem.model_validate(json.loads(line)))
+        except (json.JSONDecodeError, ValidationError) as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid metadata on line {line_no}: {e}"
+            )
+    return items
+
+
+def _match_source(sources: Dict[str, Union[str, Exception]], filename: str) -> Optional[str]:
+    if filename in sources:
+        return filename
+    for name in sources:
+        if os.path.basename(name) == filename:
+            return name
+    return None
+
+
+@router.post("/bulk", response_model=BulkImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def bulk_import_papers(
+    files: List[UploadFile] = File(None),
+    metadata: UploadFile = File(None),
+    status_default: StatusEnum = Form(StatusEnum.TO_READ, alias="status"),
+    priority_default: PriorityEnum = Form(PriorityEnum.MEDIUM, alias="priority"),
+    categories: str = Form(None),
+    embed: bool = Form(False),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(rate_limit("bulk_import"))
+):
+    """
+    Import many papers at once: PDFs (multipart and/or zip archives) plus optional
+    JSONL metadata (one object per line: filename, title, authors, status, priority,
+    categories, paper_text). Lines without a filename are metadata-only papers.
+    Rows are created immediately, queued for the upload pipeline (extraction, and
+    embedding when embed=true; no summaries). Poll GET /papers/bulk/{job_id} for
+    per-item status.
+    """
+    sources, archived_metadata = await run_in_threadpool(_store_uploads, files or [])
+
+    lines = archived_metadata
+    if metadata is not None:
+        lines = _decode_lines(await metadata.read(), metadata.filename or "metadata")
+    meta_items = _parse_metadata(lines)
+
+    # Pair metadata with files; PDFs without metadata get their file name as title
+    entries = []
+    claimed = set()
+    for meta in meta_items:
+        source_name = None
+        if meta.filename:
+            source_name = _match_source(sources, meta.filename)
+            if source_name is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Metadata references unknown file '{meta.filename}'"
+                )
+            claimed.add(source_name)
+        elif not meta.title:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Metadata lines without a filename need a title"
+            )
+        entries.append((meta, source_name))
+    for name in sources:
+        if name not in claimed:
+            entries.append((BulkImportItem(filename=name), name))
+
+    if not entries:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to import")
+    if len(entries) > MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many papers in one import ({len(entries)} > {MAX_ITEMS})"
+        )
+
+    # PDFs extracted before (by anyone) reuse that text and summary
+    known = known_extractions(db, list({h for h in sources.values() if isinstance(h, str)}))
+    stages = pipeline.EMBED if embed else ""
+    rows = []
+    for meta, source_name in entries:
+        row = {
+            "title": meta.title or os.path.splitext(os.path.basename(source_name))[0],
+            "authors": meta.authors,
+            "status": meta.status or status_default,
+            "priority": meta.priority or priority_default,
+            "categories": meta.categories if meta.categories is not None else categories,
+            "paper_text": None, "summary": None, "text_sha256": None,
+            "content_sha256": None, "pdf_sha256": None, "processing_error": None,
+            **pipeline.queued(stages),
+            "user_id": current_user.id,
+        }
+        content_hash = sources[source_name] if source_name is not None else None
+        if source_name is None:
+            row.update(paper_text=meta.paper_text, text_sha256=text_sha256(meta.paper_text))
+            if not meta.paper_text:
+                row["processing_state"] = pipeline.READY  # nothing to process
+        elif isinstance(content_hash, Exception):
+            row.update(processing_state=pipeline.FAILED, processing_error=f"Failed to read PDF: {content_hash}")
+        else:
+            row["pdf_sha256"] = content_hash
+            if content_hash in known:
+                text, summary = known[content_hash]
+                row.update(paper_text=text, summary=summary, content_sha256=content_hash,
+                           text_sha256=text_sha256(text))
+        rows.append(row)
+
+    # Multi-row INSERT ... RETURNING id, in batches
+    paper_ids: List[int] = []
+    stmt = insert(Paper).returning(Paper.id, sort_by_parameter_order=True)
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        paper_ids.extend(db.scalars(stmt, rows[start:start + INSERT_BATCH_SIZE]).all())
+    touch_users(db, [current_user.id])
+    db.commit()
+
+    # Identical PDFs are processed together, so each is extracted once
+    to_extract: Dict[str, List[int]] = {}
+    to_index: Dict[object, List[int]] = {}
+    for row, paper_id in zip(rows, paper_ids):
+        if row["processing_state"] != pipeline.QUEUED:
+            continue
+        if row["paper_text"] is not None:
+            to_index.setdefault(row["pdf_sha256"] or paper_id, []).append(paper_id)
+        else:
+            to_extract.setdefault(row["pdf_sha256"], []).append(paper_id)
+    for content_hash, group in to_extract.items():
+        pipeline.submit(group, current_user.id, content_hash, stages)
+    for group in to_index.values():
+        pipeline.submit_text(group, current_user.id, stages)
+
+    job = ImportJob(current_user.id, [{
+        "index": index,
+        "paper_id": paper_id,
+        "title": row["title"],
+        "filename": source_name,
+    } for index, ((_, source_name), row, paper_id) in enumerate(zip(entries, rows, paper_ids))])
+    register_job(job)
+    return job.status(db)
+
+
+@router.get("/bulk/{job_id}", response_model=BulkImportJobResponse)
+def get_bulk_import_status(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Per-item status of a bulk import"""
+    job_status = get_job_status(db, job_id, current_user.id)
+    if job_status is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Import job {job_id} not found"
+        )
+    return job_status
+
+
+def _bulk_conditions(where: PaperBulkFilter, user_id: int) -> list:
+    """WHERE clause for a bulk operation, always scoped to the user's own papers."""
+    conditions = []
+    if where.ids is not None:
+        if len(where.ids) > MAX_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many ids in one request ({len(where.ids)} > {MAX_ITEMS})"
+            )
+        conditions.append(Paper.id.in_(where.ids))
+    if where.status is not None:
+        conditions.append(Paper.status == where.status)
+    if where.priority is not None:
+        conditions.append(Paper.priority == where.priority)
+    if where.category:
+        conditions.append(Paper.categories.contains(where.category, autoescape=True))
+    if not conditions:
+        # An empty filter would touch the whole library; make callers say which papers
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Specify ids and/or a status, priority or category filter"
+        )
+    return [Paper.user_id == user_id, *conditions]
+
+
+@router.patch("/bulk", response_model=BulkOperationResponse)
+def bulk_update_papers(
+    request: PaperBulkUpdate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Apply the same changes to every matching paper in one UPDATE"""
+    changes = request.changes.model_dump(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No changes given")
+    if "paper_text" in changes:
+        # Rows whose text really changes lose their dedup source status and get a stale summary
+        new_hash = text_sha256(changes["paper_text"])
+        unchanged = Paper.text_sha256 == new_hash
+        changes["text_sha256"] = new_hash
+        changes["content_sha256"] = case((unchanged, Paper.content_sha256), else_=None)
+        changes["summary_stale"] = case((unchanged, Paper.summary_stale), else_=Paper.summary.isnot(None))
+    stmt = (
+        update(Paper)
+        .where(*_bulk_conditions(request.where, current_user.id))
+        .values(**changes)
+        .returning(Paper.id)
+        .execution_options(synchronize_session=False)
+    )
+    # The ids of the rows changed: re-running the filter afterwards misses rows the
+    # changes moved out of it (where status=TO_READ, changes status=READING)
+    paper_ids = db.scalars(stmt).all()
+    affected = len(paper_ids)
+    if affected:
+        touch_users(db, [current_user.id])
+    db.commit()
+    if "paper_text" in changes and affected:
+        # Same text for every row, so indexing it once covers them all
+        background_tasks.add_task(reindex_text, changes["paper_text"], current_user.id)
+    if affected and prefetch.likely_opened(changes):
+        prefetch.schedule(paper_ids[:prefetch.PER_USER])
+    return BulkOperationResponse(affected=affected)
+
+
+@router.delete("/bulk", response_model=BulkOperationResponse)
+def bulk_delete_papers(
+    request: PaperBulkDelete = Body(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete every matching paper in one DELETE"""
+    stmt = (
+        delete(Paper)
+        .where(*_bulk_conditions(request.where, current_user.id))
+        .execution_options(synchronize_session=False)
+    )
+    affected = db.execute(stmt).rowcount
+    if affected:
+        touch_users(db, [current_user.id])
+    db.commit()
+    return BulkOperationResponse(affected=affected)
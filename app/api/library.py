@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.db.database import get_db
+from app.models.user import User
+from app.schemas.paper import LibraryImportResponse
+from app.core.archive import ArchiveError, export_library, import_library
+from app.core.ratelimit import rate_limit
+from app.core import pipeline
+
+# Registered before the papers router so /papers/export is not taken for a {paper_id}
+router = APIRouter(prefix="/papers", tags=["papers"])
+
+
+@router.get("/export")
+def export_papers(
+    embeddings: bool = False,
+    pdfs: bool = False,
+    current_user: User = Depends(rate_limit("export"))
+):
+    """
+    Download the whole library as a zip archive: papers with text and summaries
+    (papers.jsonl), with embeddings=true their chunk embeddings (embeddings/*.npy,
+    for use elsewhere: import recomputes them) and with pdfs=true the original PDFs.
+    Streamed as it is written; re-import with POST /papers/import.
+    """
+    filename = f"papernest-library-{datetime.now(timezone.utc):%Y%m%d}.zip"
+    return StreamingResponse(
+        export_library(current_user.id, embeddings=embeddings, pdfs=pdfs),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import", response_model=LibraryImportResponse, status_code=status.HTTP_201_CREATED)
+def import_papers(
+    archive: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(rate_limit("bulk_import"))
+):
+    """
+    Add the papers of an archive from GET /papers/export to the library (as new papers,
+    with their summaries and PDFs). Their text is then embedded in the background,
+    reusing chunk embeddings the server already has; archived embeddings are ignored.
+    """
+    try:
+        papers, queued, pdfs = import_library(archive.file, current_user.id, db)
+    except ArchiveError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    for start in range(0, len(queued), pipeline.TEXT_BATCH_SIZE):
+        pipeline.submit_text(queued[start:start + pipeline.TEXT_BATCH_SIZE], current_user.id, pipeline.EMBED)
+    return LibraryImportResponse(papers=papers, queued=len(queued), pdfs=pdfs)
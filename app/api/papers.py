@@ -1,15 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 from app.db.database import get_db
 from app.models.paper import Paper 
 from app.models.user import User
-from app.schemas.paper import PaperCreate, PaperResponse, PaperUpdate, SummarizationResponse
+from app.schemas.paper import PaperCreate, PaperResponse, PaperUpdate, SummarizationResponse, PaperInsightsResponse
 from app.core.dependencies import get_current_user
 from app.core.summarizer import summarize_text
+from app.core.providers import ProviderError
+from app.core.ratelimit import rate_limit
+from app.core.dedup import find_extracted, fresh_summary, text_sha256
+from app.core.ingest import reindex_paper
+from app.core.insights import VERSION as INSIGHTS_VERSION, precompute as precompute_insights, stored_insights
+from app.core import deadlines, hostcache, pipeline, prefetch
+from app.core.httpcache import library_etag, not_modified, not_modified_response, set_validators
+from app.core.serialization import FastJSONResponse, columns_for, dumps, rows_as_dicts
 
 router = APIRouter(prefix="/papers", tags=["papers"])
 
+# Read endpoints select exactly the PaperResponse fields and serialize the rows as they
+# are: the data was validated on the way in, so no ORM objects or response models
+PAPER_COLUMNS = columns_for(PaperResponse, Paper)
+
+# Serialized paper lists are shared between workers through the host cache. Keys carry
+# the library version, so any change to the user's papers moves on to a new key.
+LIST_CACHE_TTL = 600
+
 
 @router.post("/", response_model=PaperResponse, status_code=status.HTTP_201_CREATED)
 def create_paper(
@@ -25,6 +43,7 @@ def create_paper(
         priority=paper.priority,
         categories=paper.categories,
         paper_text=paper.paper_text,
+        text_sha256=text_sha256(paper.paper_text),
         user_id=current_user.id  # ← ADDED THIS - CRITICAL!
     )
     db.add(db_paper)
@@ -35,45 +54,78 @@ def create_paper(
 
 @router.get("/", response_model=List[PaperResponse])
 def get_papers(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)  # ← ADDED AUTH
 ):
-    """Get all papers for current user with pagination"""
-    papers = db.query(Paper).filter(
-        Paper.user_id == current_user.id  # ← ADDED - Only user's papers
-    ).offset(skip).limit(limit).all()
-    return papers
+    """
+    Get all papers for current user with pagination.
+    Supports conditional requests (ETag / If-None-Match, Last-Modified / If-Modified-Since):
+    an unchanged library is answered with 304 without loading any papers.
+    """
+    prefetch.on_activity(current_user.id)
+    etag = library_etag(current_user)
+    if not_modified(request, etag, current_user.library_updated_at):
+        return not_modified_response(etag)
+    key = f"papers:{current_user.id}:{current_user.library_version}:{skip}:{limit}"
+    body = hostcache.get(key, cache="paper_lists")
+    if body is None:
+        rows = db.execute(
+            select(*PAPER_COLUMNS).where(
+                Paper.user_id == current_user.id  # ← ADDED - Only user's papers
+            ).offset(skip).limit(limit)
+        ).all()
+        body = dumps(rows_as_dicts(rows))
+        hostcache.set(key, body, ttl=LIST_CACHE_TTL)
+    response = Response(body, media_type="application/json")
+    set_validators(response, etag, current_user.library_updated_at)
+    return response
 
 
 @router.get("/{paper_id}", response_model=PaperResponse)
 def get_paper(
     paper_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)  # ← ADDED AUTH
 ):
-    """Get a specific paper by ID"""
-    paper = db.query(Paper).filter(
-        Paper.id == paper_id,
-        Paper.user_id == current_user.id  # ← ADDED - Security check
+    """Get a specific paper by ID (conditional requests as for GET /papers/)"""
+    etag = library_etag(current_user, paper_id)
+    if not_modified(request, etag, current_user.library_updated_at):
+        return not_modified_response(etag)
+    row = db.execute(
+        select(*PAPER_COLUMNS).where(
+            Paper.id == paper_id,
+            Paper.user_id == current_user.id  # ← ADDED - Security check
+        )
     ).first()
-    if not paper:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Paper with id {paper_id} not found"
         )
-    return paper
+    last_modified = row.updated_at or row.created_at
+    if not_modified(request, etag, last_modified):
+        return not_modified_response(etag)
+    response = FastJSONResponse(row._asdict())
+    set_validators(response, etag, last_modified)
+    return response
 
 
 @router.patch("/{paper_id}", response_model=PaperResponse)
 def update_paper(
     paper_id: int,
     paper_update: PaperUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)  # ← ADDED AUTH
 ):
-    """Update a paper's details"""
+    """
+    Update a paper's details. Editing paper_text marks the summary stale and
+    re-embeds the changed chunks in the background.
+    """
     paper = db.query(Paper).filter(
         Paper.id == paper_id,
         Paper.user_id == current_user.id  # ← ADDED - Security check
@@ -85,11 +137,24 @@ def update_paper(
         )
     
     update_data = paper_update.model_dump(exclude_unset=True)
+    text_changed = False
+    if "paper_text" in update_data:
+        new_hash = text_sha256(update_data["paper_text"])
+        text_changed = new_hash != (paper.text_sha256 or text_sha256(paper.paper_text))
+        if text_changed:
+            # Edited text no longer matches the PDF, so it must not be shared as its extraction
+            update_data["text_sha256"] = new_hash
+            update_data["content_sha256"] = None
+            update_data["summary_stale"] = paper.summary is not None
     for field, value in update_data.items():
         setattr(paper, field, value)
     
     db.commit()
     db.refresh(paper)
+    if text_changed:
+        background_tasks.add_task(reindex_paper, paper.id, current_user.id)
+    if prefetch.likely_opened(update_data):
+        prefetch.schedule([paper.id])
     return paper
 
 
@@ -115,15 +180,27 @@ def delete_paper(
     return None
 
 
+def _require_processed(paper: Paper) -> None:
+    """409 while an upload's text is still being extracted."""
+    if not paper.paper_text and paper.processing_state not in (pipeline.READY, pipeline.FAILED):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Paper is still being processed ({paper.processing_state}), try again shortly"
+        )
+
+
 @router.post("/{paper_id}/summarize", response_model=SummarizationResponse)
 async def summarize_paper(
     paper_id: int,
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(rate_limit("summarize")),
+    deadline: deadlines.Deadline = Depends(deadlines.request_deadline)
 ):
     """
     Generate AI summary for a paper.
     Paper must have paper_text field populated.
+    Bounded by the X-Request-Timeout header (seconds, see app/core/deadlines.py).
     """
     # Get paper
     paper = db.query(Paper).filter(
@@ -138,17 +215,27 @@ async def summarize_paper(
         )
     
     # Check if paper has text
+    _require_processed(paper)
     if not paper.paper_text:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Paper has no text content. Add paper_text first."
         )
     
-    # Generate summary
-    summary = summarize_text(paper.paper_text)
+    # Same text already summarized (possibly for another user): reuse it
+    donor = None
+    if paper.text_sha256:
+        donor = find_extracted(db, text_hash=paper.text_sha256, exclude_id=paper.id)
+    if donor is not None and fresh_summary(donor):
+        summary = donor.summary
+    else:
+        # Generate summary off the event loop; provider failures raise ProviderError
+        # (mapped to 502/503/504) so no error text ever gets stored as the summary
+        summary = await deadlines.run(request, deadline, summarize_text, paper.paper_text)
     
-    # Save summary to database
+    # Save summary to database (also when the client has left: it was paid for)
     paper.summary = summary
+    paper.summary_stale = False
     db.commit()
     db.refresh(paper)
     
@@ -159,11 +246,13 @@ async def summarize_paper(
 
 
 from fastapi import File, UploadFile, Form
-from app.core.pdf_utils import extract_text_from_pdf
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse
+from app.core.blobstore import BlobTooLarge, get_blob_store
 from app.core.chat import chat_with_paper
 
 @router.post("/upload", response_model=PaperResponse, status_code=status.HTTP_201_CREATED)
 async def upload_paper(
+    response: Response,
     file: UploadFile = File(...),
     title: str = Form(...),
     authors: str = Form(None),
@@ -171,15 +260,41 @@ async def upload_paper(
     priority: str = Form("MEDIUM"),
     categories: str = Form(None),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(rate_limit("upload"))
 ):
-    """Upload a PDF paper, extract text, and save it"""
-    # Extract text from PDF
+    """
+    Upload a PDF paper. The PDF is stored (GET /papers/{id}/pdf) and the paper is
+    returned at once with processing_state "queued"; text extraction, embedding
+    and summarization then run in the background (see app/core/pipeline.py).
+    A PDF already in the user's library returns that paper (200); one already
+    uploaded by anyone reuses its extracted text and summary and is ready at once.
+    """
+    # Stream the upload into the blob store, hashing it on the way
     try:
-        text_content = await extract_text_from_pdf(file)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to process PDF: {str(e)}")
-    
+        content_hash, _ = await run_in_threadpool(get_blob_store().put, file.file)
+    except BlobTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"PDF is {e}")
+
+    existing = find_extracted(db, content_sha256=content_hash, user_id=current_user.id)
+    if existing is not None and existing.user_id == current_user.id:
+        if existing.pdf_sha256 is None:
+            existing.pdf_sha256 = content_hash
+            db.commit()
+            db.refresh(existing)
+        response.status_code = 200  # `status` is shadowed by the form field here
+        return existing
+
+    if existing is not None:
+        processing = dict(
+            paper_text=existing.paper_text,
+            summary=fresh_summary(existing),
+            content_sha256=content_hash,
+            text_sha256=existing.text_sha256,
+            processing_state=pipeline.READY,
+        )
+    else:
+        processing = pipeline.queued()
+
     # Create paper entry
     db_paper = Paper(
         title=title,
@@ -187,23 +302,56 @@ async def upload_paper(
         status=status,
         priority=priority,
         categories=categories,
-        paper_text=text_content,
-        user_id=current_user.id
+        pdf_sha256=content_hash,
+        user_id=current_user.id,
+        **processing
     )
     db.add(db_paper)
     db.commit()
     db.refresh(db_paper)
+    if existing is None:
+        pipeline.submit([db_paper.id], current_user.id, content_hash)
     return db_paper
 
 
+@router.get("/{paper_id}/pdf")
+def download_paper_pdf(
+    paper_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Original PDF of an uploaded paper. Supports HTTP Range requests."""
+    paper = db.query(Paper).filter(
+        Paper.id == paper_id,
+        Paper.user_id == current_user.id
+    ).first()
+    if not paper or not paper.pdf_sha256:
+        raise HTTPException(status_code=404, detail="No stored PDF for this paper")
+
+    store = get_blob_store()
+    filename = f"{paper.title[:100]}.pdf"
+    path = store.local_path(paper.pdf_sha256)
+    if path is not None:
+        # Served with sendfile where the server supports it; handles Range / If-Range
+        return FileResponse(path, media_type="application/pdf", filename=filename,
+                            content_disposition_type="inline")
+    url = store.presigned_url(paper.pdf_sha256, filename=filename)
+    if url is None:
+        raise HTTPException(status_code=404, detail="No stored PDF for this paper")
+    return RedirectResponse(url, status_code=307)
+
+
 @router.post("/{paper_id}/chat")
 async def chat_with_paper_endpoint(
     paper_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
     query: str = Form(...),  # Using Form to keep it simple, or body Pydantic model
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(rate_limit("chat")),
+    deadline: deadlines.Deadline = Depends(deadlines.request_deadline)
 ):
-    """Chat with a specific paper"""
+    """Chat with a specific paper (bounded by the X-Request-Timeout header, in seconds)"""
     try:
         paper = db.query(Paper).filter(
             Paper.id == paper_id,
@@ -213,12 +361,20 @@ async def chat_with_paper_endpoint(
         if not paper:
             raise HTTPException(status_code=404, detail="Paper not found")
             
+        _require_processed(paper)
         if not paper.paper_text:
             raise HTTPException(status_code=400, detail="Paper has no text content")
             
-        response = chat_with_paper(paper.paper_text, query)
+        # Insights are only read here; without them this turn goes to the LLM and
+        # they are computed after the response, for the next one
+        paper_text = paper.paper_text
+        insights = await run_in_threadpool(stored_insights, db, paper_text)
+        if insights is None:
+            background_tasks.add_task(precompute_insights, paper_text)
+        prefetch.record_use(paper_text)
+        response = await deadlines.run(request, deadline, chat_with_paper, paper_text, query, insights)
         return {"response": response}
-    except HTTPException:
+    except (HTTPException, ProviderError, deadlines.RequestAbandoned):
         raise
     except Exception as e:
         import traceback
@@ -228,3 +384,42 @@ async def chat_with_paper_endpoint(
             detail=f"Chat failed: {str(e)}"
         )
 
+
+@router.get("/{paper_id}/insights", response_model=PaperInsightsResponse)
+def get_paper_insights(
+    paper_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Section outline (with offsets into paper_text), references and keyphrases of a
+    paper, computed without an LLM at ingest (see app/core/insights.py). 409 while
+    they are still being computed.
+    """
+    etag = library_etag(current_user, paper_id, f"insights{INSIGHTS_VERSION}")
+    if not_modified(request, etag, current_user.library_updated_at):
+        return not_modified_response(etag)
+    paper = db.query(Paper).filter(
+        Paper.id == paper_id,
+        Paper.user_id == current_user.id
+    ).first()
+    if not paper:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    _require_processed(paper)
+    if not paper.paper_text:
+        raise HTTPException(status_code=400, detail="Paper has no text content")
+
+    insights = stored_insights(db, paper.paper_text)
+    if insights is None:
+        # Not computed yet (or by an older version): queue it, never compute in a GET
+        background_tasks.add_task(precompute_insights, paper.paper_text)
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"detail": "Insights are still being computed, try again shortly"},
+            headers={"Retry-After": "2"},
+        )
+    response = FastJSONResponse({"paper_id": paper.id, **insights})
+    set_validators(response, etag, current_user.library_updated_at)
+    return response
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from app.models.user import User
+from app.schemas.usage import UsageResponse
+from app.core.dependencies import get_current_user
+from app.core.ratelimit import get_usage
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+
+@router.get("/me", response_model=UsageResponse)
+def get_my_usage(current_user: User = Depends(get_current_user)):
+    """Today's AI usage, daily budgets and remaining rate-limit tokens for the current user"""
+    return get_usage(current_user.id)
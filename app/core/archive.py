@@ -0,0 +1,265 @@
+"""
+Library export / import as a streamed zip archive.
+
+Archive layout:
+  manifest.json           format, version, embedding model, export time
+  papers.jsonl            one paper per line (metadata, paper_text, summary, timestamps)
+  embeddings/NNNNN.txt    chunk SHA-256 keys, one per line...   (only when requested)
+  embeddings/NNNNN.npy    ...and their float32 vectors, in parts of EMBED_PART_ROWS rows
+  pdfs/<sha256>.pdf       original PDFs (only when requested)
+
+Memory stays flat whatever the library size: papers are read with server-side cursors
+(`yield_per`) in small batches, and the zip is written to a sink that is drained
+after every batch, so the response is streamed chunk by chunk as it is produced.
+Chunk embeddings are looked up per batch (the store is shared, so a chunk occurring in
+papers of different batches may be written twice).
+
+Import reads the uploaded archive in place and inserts in batches, within one
+transaction: a broken archive imports nothing. Embeddings in the archive are never
+imported: chunk_embeddings is shared by all users and its first write wins, so the
+vectors are recomputed from the imported text by the upload pipeline (reusing those
+already in the store) rather than trusted. PDFs are re-hashed on the way in.
+"""
+import io
+import json
+import zipfile
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+
+from app.core import pipeline
+from app.core.blobstore import BlobTooLarge, get_blob_store
+from app.core.dedup import text_sha256
+from app.core.httpcache import touch_users
+from app.core.rag_utils import EMBED_MODEL, MAX_CHUNKS, chunk_key, chunk_text
+from app.core.serialization import dumps
+from app.db.database import SessionLocal
+from app.models.embedding import ChunkEmbedding
+from app.models.paper import Paper
+from app.schemas.paper import ArchivePaper
+
+FORMAT = "papernest-library"
+VERSION = 1
+BATCH_SIZE = 200
+EMBED_BATCH_SIZE = 50  # papers per chunk embedding lookup (up to 15 vectors each)
+EMBED_PART_ROWS = 1000
+
+EXPORTED_COLUMNS = [Paper.id, Paper.title, Paper.authors, Paper.status, Paper.priority, Paper.categories,
+                    Paper.paper_text, Paper.summary, Paper.summary_stale, Paper.pdf_sha256,
+                    Paper.created_at, Paper.updated_at]
+
+
+class ArchiveError(ValueError):
+    """The uploaded file is not a library archive this server can import."""
+
+
+class _Sink:
+    """Write-only file for ZipFile; it has no tell(), so zipfile streams (data descriptors)."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _batches(db, stmt, size: int = BATCH_SIZE) -> Iterator[list]:
+    """Rows of `stmt` in lists of `size`, fetched with a server-side cursor."""
+    result = db.execute(stmt.execution_options(yield_per=size))
+    for partition in result.partitions():
+        yield partition
+
+
+def export_library(user_id: int, embeddings: bool = True, pdfs: bool = False) -> Iterator[bytes]:
+    """The user's library as zip archive chunks (see the module docstring)."""
+    sink = _Sink()
+    db = SessionLocal()
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("manifest.json", json.dumps({
+                "format": FORMAT,
+                "version": VERSION,
+                "embedding_model": EMBED_MODEL if embeddings else None,
+                "exported_at": datetime.now(timezone.utc).isoformat(),
+            }))
+
+            mine = Paper.user_id == user_id
+            with archive.open("papers.jsonl", "w", force_zip64=True) as member:
+                stmt = select(*EXPORTED_COLUMNS).where(mine).order_by(Paper.id)
+                for rows in _batches(db, stmt):
+                    keys = rows[0]._fields
+                    member.write(b"".join(dumps(dict(zip(keys, row))) + b"\n" for row in rows))
+                    yield sink.drain()
+
+            if embeddings:
+                texts = select(Paper.paper_text).where(mine, Paper.paper_text.isnot(None)).order_by(Paper.id)
+                yield from _export_embeddings(archive, sink, db, _batches(db, texts, EMBED_BATCH_SIZE))
+
+            if pdfs:
+                store = get_blob_store()
+                stmt = select(Paper.pdf_sha256).where(mine, Paper.pdf_sha256.isnot(None)).distinct()
+                for rows in _batches(db, stmt):
+                    for (key,) in rows:
+                        if not store.exists(key):
+                            continue
+                        # Already compressed; zip64 in case of very large PDFs
+                        with store.open(key) as source, archive.open(
+                            zipfile.ZipInfo(f"pdfs/{key}.pdf"), "w", force_zip64=True
+                        ) as member:
+                            while True:
+                                block = source.read(1024 * 1024)
+                                if not block:
+                                    break
+                                member.write(block)
+                                yield sink.drain()
+        yield sink.drain()  # central directory
+    finally:
+        db.close()
+
+
+def _export_embeddings(archive: zipfile.ZipFile, sink: _Sink, db, batches) -> Iterator[bytes]:
+    part = 0
+    keys: List[str] = []
+    vectors: List[bytes] = []
+    dim = None
+
+    def write_part() -> None:
+        nonlocal part
+        matrix = np.frombuffer(b"".join(vectors), dtype=np.float32).reshape(len(keys), dim)
+        archive.writestr(f"embeddings/{part:05d}.txt", "\n".join(keys))
+        with archive.open(f"embeddings/{part:05d}.npy", "w") as member:
+            np.lib.format.write_array(member, matrix, allow_pickle=False)
+        part += 1
+        keys.clear()
+        vectors.clear()
+
+    for rows in batches:
+        wanted = list(dict.fromkeys(
+            chunk_key(chunk) for (text,) in rows for chunk in chunk_text(text, limit=MAX_CHUNKS)
+        ))
+        found = db.execute(
+            select(ChunkEmbedding.chunk_sha256, ChunkEmbedding.dim, ChunkEmbedding.embedding).where(
+                ChunkEmbedding.model == EMBED_MODEL,
+                ChunkEmbedding.chunk_sha256.in_(wanted),
+            )
+        ).all()
+        for key, row_dim, blob in found:
+            if keys and (row_dim != dim or len(keys) >= EMBED_PART_ROWS):
+                write_part()
+            dim = row_dim
+            keys.append(key)
+            vectors.append(blob)
+        yield sink.drain()
+    if keys:
+        write_part()
+        yield sink.drain()
+
+
+def _read_manifest(archive: zipfile.ZipFile) -> dict:
+    try:
+        manifest = json.loads(archive.read("manifest.json"))
+    except (KeyError, ValueError):
+        raise ArchiveError("Not a PaperNest library archive (missing manifest.json)")
+    if manifest.get("format") != FORMAT:
+        raise ArchiveError("Not a PaperNest library archive")
+    if manifest.get("version", 0) > VERSION:
+        raise ArchiveError(f"Archive version {manifest.get('version')} is newer than this server supports")
+    return manifest
+
+
+def import_library(file, user_id: int, db) -> Tuple[int, List[int], int]:
+    """
+    Add the papers of an exported archive (a seekable file) to the user's library.
+    Returns (papers imported, ids of those queued for embedding, PDFs imported): the
+    caller hands the ids to pipeline.submit_text() once committed. Raises ArchiveError
+    for invalid archives.
+    """
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise ArchiveError("Not a zip archive")
+    with archive:
+        _read_manifest(archive)
+        names = archive.namelist()
+
+        # Papers only link PDFs shipped in the archive (keys are hashed here, not trusted)
+        pdf_keys = set()
+        store = get_blob_store()
+        for name in names:
+            if name.startswith("pdfs/") and name.endswith(".pdf"):
+                try:
+                    with archive.open(name) as source:
+                        key, _ = store.put(source)
+                except BlobTooLarge as e:
+                    raise ArchiveError(f"{name} is {e}")
+                pdf_keys.add(key)
+
+        paper_count = 0
+        queued: List[int] = []
+        batch: List[Dict] = []
+
+        def flush() -> None:
+            nonlocal paper_count
+            paper_ids = db.scalars(insert(Paper).returning(Paper.id, sort_by_parameter_order=True), batch).all()
+            queued.extend(paper_id for paper_id, row in zip(paper_ids, batch)
+                          if row["processing_state"] == pipeline.QUEUED)
+            paper_count += len(batch)
+            batch.clear()
+
+        try:
+            with archive.open("papers.jsonl") as member:
+                for line_no, line in enumerate(io.TextIOWrapper(member, encoding="utf-8"), start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        paper = ArchivePaper.model_validate_json(line)
+                    except ValidationError as e:
+                        raise ArchiveError(f"Invalid paper on line {line_no} of papers.jsonl: {e}")
+                    batch.append(_paper_row(paper, user_id, pdf_keys))
+                    if len(batch) >= BATCH_SIZE:
+                        flush()
+        except KeyError:
+            raise ArchiveError("Archive has no papers.jsonl")
+        if batch:
+            flush()
+
+        # A large archive can take longer than a lease: renew them so no other worker
+        # takes these papers over before this one submits them
+        for start in range(0, len(queued), BATCH_SIZE):
+            db.execute(update(Paper).where(Paper.id.in_(queued[start:start + BATCH_SIZE]))
+                       .values(processing_heartbeat=datetime.now(timezone.utc)))
+        if paper_count:
+            touch_users(db, [user_id])
+        db.commit()
+    return paper_count, queued, len(pdf_keys)
+
+
+def _paper_row(paper: ArchivePaper, user_id: int, pdf_keys: set) -> dict:
+    row = paper.model_dump(exclude={"id"})
+    row["user_id"] = user_id
+    row["text_sha256"] = text_sha256(paper.paper_text) if paper.paper_text else None
+    row["created_at"] = paper.created_at or datetime.now(timezone.utc)
+    if paper.pdf_sha256 not in pdf_keys:
+        row["pdf_sha256"] = None
+    # Only the embedding stage: the summary comes with the paper
+    row.update(pipeline.queued(pipeline.EMBED) if paper.paper_text else _NOTHING_TO_PROCESS)
+    return row
+
+
+_NOTHING_TO_PROCESS = {
+    "processing_state": pipeline.READY, "processing_stages": None,
+    "processing_owner": None, "processing_heartbeat": None,
+}
+
@@ -0,0 +1,228 @@
+"""
+Content-addressed storage for original uploaded PDFs.
+
+Blobs are keyed by the SHA-256 of their bytes, so a PDF uploaded by several users is
+stored once. Writes are streamed: the hash is computed while the upload is copied in
+fixed-size chunks, and the blob only appears under its key once it is complete.
+Blobs larger than BLOB_MAX_MB (default 100) are refused with BlobTooLarge.
+
+Backends (BLOB_STORE):
+  local  files under BLOB_STORE_DIR (default "blobs"), served with sendfile / Range support
+  s3     any S3-compatible bucket (S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL; `pip install boto3`),
+         served through presigned URLs so the bucket answers Range requests itself
+"""
+import hashlib
+import os
+from abc import ABC, abstractmethod
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHUNK_SIZE = 1024 * 1024
+MAX_BLOB_BYTES = int(float(os.environ.get("BLOB_MAX_MB", "100")) * 2 ** 20)
+
+
+class BlobTooLarge(ValueError):
+    """The blob is larger than MAX_BLOB_BYTES; nothing was stored."""
+
+
+def _copy_hashing(source: BinaryIO, target: BinaryIO) -> Tuple[str, int]:
+    """Copy `source` to `target` in chunks; returns (sha256, size). Stops at MAX_BLOB_BYTES."""
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if size + len(chunk) > MAX_BLOB_BYTES:
+            raise BlobTooLarge(f"larger than the {MAX_BLOB_BYTES / 2 ** 20:g} MB limit")
+        digest.update(chunk)
+        target.write(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class BlobStore(ABC):
+    """Interface shared by the storage backends (S3-style: flat keys, whole-object writes)."""
+
+    @abstractmethod
+    def put(self, source: BinaryIO) -> Tuple[str, int]:
+        """Stream `source` into the store. Returns (sha256 key, size in bytes); raises BlobTooLarge."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Readable file object for the blob."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def keys(self) -> Iterator[str]:
+        ...
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path on this machine, when the backend keeps blobs on local disk."""
+        return None
+
+    def presigned_url(self, key: str, filename: Optional[str] = None, expires: int = 3600) -> Optional[str]:
+        """Time-limited direct download URL, when the backend supports one."""
+        return None
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        """A local file path holding the blob for the duration of the block."""
+        path = self.local_path(key)
+        if path is not None:
+            yield path
+            return
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as out, self.open(key) as blob:
+                shutil.copyfileobj(blob, out, CHUNK_SIZE)
+            yield path
+        finally:
+            os.unlink(path)
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files under `root`, fanned out as ab/cd/<sha256>."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._tmp = os.path.join(root, "tmp")
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, source: BinaryIO) -> Tuple[str, int]:
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                key, size = _copy_hashing(source, out)
+            path = self._path(key)
+            if os.path.exists(path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)  # atomic: readers never see a partial blob
+        except BaseException:  # too large, or a failed read: drop the partial file
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return key, size
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self._path(key))
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self) -> Iterator[str]:
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root and "tmp" in dirnames:
+                dirnames.remove("tmp")
+            for name in filenames:
+                if len(name) == 64:
+                    yield name
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+
+class S3BlobStore(BlobStore):
+    """Blobs as objects in an S3-compatible bucket (AWS, MinIO, R2, ...)."""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None):
+        try:
+            import boto3
+        except ImportError:
+            raise ImportError("Please install boto3: pip install boto3")
+        self.bucket = bucket
+        self.prefix = prefix
+        self._s3 = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def put(self, source: BinaryIO) -> Tuple[str, int]:
+        # The key is only known once everything is read, so spool to disk first
+        with tempfile.TemporaryFile() as spool:
+            key, size = _copy_hashing(source, spool)
+            if not self.exists(key):
+                spool.seek(0)
+                self._s3.upload_fileobj(spool, self.bucket, self._key(key))  # multipart for large files
+        return key, size
+
+    def exists(self, key: str) -> bool:
+        try:
+            self._s3.head_object(Bucket=self.bucket, Key=self._key(key))
+        except self._s3.exceptions.ClientError:
+            return False
+        return True
+
+    def size(self, key: str) -> int:
+        return self._s3.head_object(Bucket=self.bucket, Key=self._key(key))["ContentLength"]
+
+    def open(self, key: str) -> BinaryIO:
+        return self._s3.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+
+    def delete(self, key: str) -> None:
+        self._s3.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def keys(self) -> Iterator[str]:
+        paginator = self._s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix):]
+
+    def presigned_url(self, key: str, filename: Optional[str] = None, expires: int = 3600) -> Optional[str]:
+        params = {"Bucket": self.bucket, "Key": self._key(key), "ResponseContentType": "application/pdf"}
+        if filename:
+            params["ResponseContentDisposition"] = f'inline; filename="{filename}"'
+        return self._s3.generate_presigned_url("get_object", Params=params, ExpiresIn=expires)
+
+
+_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """Process-wide blob store configured from the environment."""
+    global _store
+    if _store is None:
+        backend = os.environ.get("BLOB_STORE", "local").lower()
+        if backend == "s3":
+            _store = S3BlobStore(
+                bucket=os.environ["S3_BUCKET"],
+                prefix=os.environ.get("S3_PREFIX", "pdfs/"),
+                endpoint_url=os.environ.get("S3_ENDPOINT_URL") or None,
+            )
+        elif backend == "local":
+            _store = LocalBlobStore(os.environ.get("BLOB_STORE_DIR", "blobs"))
+        else:
+            raise ValueError(f"Unknown BLOB_STORE '{backend}', expected 'local' or 's3'")
+    return _store
@@ -1,31 +1,44 @@
-import os
-from groq import Groq
+from typing import Optional
+
 from dotenv import load_dotenv
 
+from app.core.tracing import traced
+from app.core.routing import complete
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize Groq client
-# Ensure GROQ_API_KEY is set in environment variables
-# Helper to lazy-load Groq client
-def get_groq_client():
-    api_key = os.environ.get("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("GROQ_API_KEY environment variable not set")
-    return Groq(api_key=api_key)
-
+from app.core import insights as paper_insights
+from app.core.metrics import Counter
 from app.core.rag_utils import retrieve_context
 
-def chat_with_paper(paper_text: str, user_query: str) -> str:
+LOCAL_ANSWERS = Counter(
+    "papernest_chat_local_answers_total",
+    "Chat questions answered from precomputed insights, without an LLM call.",
+    ("kind",),
+)
+
+@traced("chat_with_paper")
+def chat_with_paper(paper_text: str, user_query: str, insights: Optional[dict] = None) -> str:
     """
     Chat with a paper using RAG and Groq API.
+    With the paper's insights (app/core/insights.py), questions about its structure
+    ("what are the sections?", "what does it cite?") are answered directly.
     """
     if not paper_text:
         return "Error: No paper content available to chat with."
 
+    if insights is not None:
+        kind = paper_insights.structural_question(user_query)
+        answer = paper_insights.answer(kind, insights) if kind else None
+        if answer is not None:
+            LOCAL_ANSWERS.inc(kind=kind)
+            return answer
+
     # Retrieve relevant context using RAG
     # We use a generous window (e.g., top 5 chunks) to give LLM enough info
-    context = retrieve_context(paper_text, user_query, top_k=7)
+    context = retrieve_context(paper_text, user_query, top_k=7,
+                               sections=insights["sections"] if insights else None)
     
     if not context:
         context = "No specific relevant context found in the paper. Answer based on general knowledge if possible, or state that the paper doesn't cover this."
@@ -41,25 +54,18 @@ def chat_with_paper(paper_text: str, user_query: str) -> str:
     If the answer is not in the context, say so.
     """
 
-    try:
-        client = get_groq_client()
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt,
-                },
-                {
-                    "role": "user",
-                    "content": user_query,
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-        )
-        return chat_completion.choices[0].message.content
-    except Exception as e:
-        return f"Error interacting with Groq API: {str(e)}"
+    return complete("chat", [
+        {
+            "role": "system",
+            "content": system_prompt,
+        },
+        {
+            "role": "user",
+            "content": user_query,
+        }
+    ], query=user_query).text
 
+@traced("summarize_with_groq")
 def summarize_with_groq(text: str) -> str:
     """
     Summarize text using Groq API.
@@ -72,17 +78,9 @@ def summarize_with_groq(text: str) -> str:
     {text[:25000]}
     """
     
-    try:
-        client = get_groq_client()
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-        )
-        return chat_completion.choices[0].message.content
-    except Exception as e:
-        return f"Error interacting with Groq API: {str(e)}"
+    return complete("summarize", [
+        {
+            "role": "user",
+            "content": prompt,
+        }
+    ]).text
@@ -0,0 +1,173 @@
+"""
+Response compression (brotli and gzip).
+
+The encoding is negotiated from Accept-Encoding (q-values honoured, server preference
+breaks ties). Only textual content types are compressed: PDFs are already compressed
+and must keep working with Range requests. Bodies under the size threshold are sent as
+is, and large ones are compressed in a worker thread so the event loop stays free.
+Streamed responses are compressed chunk by chunk, with a flush after each chunk so
+clients still get data as it is produced.
+
+Configuration:
+  RESPONSE_COMPRESSION    encodings in order of preference, e.g. "br,gzip" (default: br, then
+                          gzip; gzip only where brotli could not be installed); "off" disables compression
+  COMPRESSION_MIN_SIZE    smallest body to compress, in bytes (default 1024)
+  GZIP_LEVEL              1-9 (default 6)
+  BROTLI_QUALITY          0-11 (default 5)
+"""
+import os
+import zlib
+from typing import Dict, List, Optional
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/xml",
+                      "application/javascript", "image/svg+xml")
+THREAD_MIN_SIZE = 128 * 1024
+
+
+def _configured_encodings() -> List[str]:
+    default = "br,gzip" if brotli is not None else "gzip"
+    value = os.environ.get("RESPONSE_COMPRESSION", default).lower()
+    if value in ("", "off", "none", "false", "0"):
+        return []
+    encodings = [encoding.strip() for encoding in value.split(",") if encoding.strip()]
+    for encoding in encodings:
+        if encoding not in ("br", "gzip"):
+            raise ValueError(f"Unknown RESPONSE_COMPRESSION encoding '{encoding}', expected 'br' or 'gzip'")
+        if encoding == "br" and brotli is None:
+            raise ImportError("Please install brotli: pip install brotli")
+    return encodings
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    """{coding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._br = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self._br is not None:
+            out = self._br.process(data)
+            return out + (self._br.finish() if final else self._br.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, encodings: Optional[List[str]] = None,
+                 minimum_size: Optional[int] = None, gzip_level: Optional[int] = None,
+                 brotli_quality: Optional[int] = None):
+        self.app = app
+        self.encodings = _configured_encodings() if encodings is None else encodings
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+        self.gzip_level = gzip_level if gzip_level is not None else int(os.environ.get("GZIP_LEVEL", "6"))
+        self.brotli_quality = brotli_quality if brotli_quality is not None else int(os.environ.get("BROTLI_QUALITY", "5"))
+
+    def negotiate(self, accept_encoding: str) -> Optional[str]:
+        accepted = _accepted(accept_encoding)
+        best, best_q = None, 0.0
+        for encoding in self.encodings:  # server preference breaks ties
+            q = accepted.get(encoding, accepted.get("*", 0.0))
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = None
+        if scope["type"] == "http" and self.encodings:
+            encoding = self.negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(self, encoding, send))
+
+
+class _CompressingSend:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    def _compressible(self, headers: MutableHeaders, status: int, body: bytes, more_body: bool) -> bool:
+        content_type = headers.get("content-type", "").lower()
+        return (
+            status not in (204, 206, 304)
+            and "content-encoding" not in headers
+            and "content-range" not in headers
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+            and (more_body or len(body) >= self.middleware.minimum_size)
+        )
+
+    async def _compress(self, body: bytes, final: bool) -> bytes:
+        if len(body) >= THREAD_MIN_SIZE:
+            return await anyio.to_thread.run_sync(self.compressor.compress, body, final)
+        return self.compressor.compress(body, final)
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message  # held back until the first body chunk decides
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            if self.start is not None:
+                await self.send(self.start)
+                self.start = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            if not self._compressible(headers, start["status"], body, more_body):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            m = self.middleware
+            self.compressor = _Compressor(self.encoding, m.gzip_level, m.brotli_quality)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            body = await self._compress(body, final=not more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        body = await self._compress(body, final=not more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
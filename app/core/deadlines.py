@@ -0,0 +1,146 @@
+"""
+End-to-end request deadlines, and cancellation of LLM work nobody is waiting for.
+
+Endpoints that wait on an AI provider (chat, summarize) give the request a deadline:
+the client's X-Request-Timeout header (seconds), or REQUEST_DEADLINE_SECONDS (default
+120), capped at REQUEST_DEADLINE_MAX_SECONDS (default 300). run() binds it to the
+context the worker thread runs in, and every Provider.call made for the request
+(query embeddings during retrieval, completions, their retries and fallbacks) is
+limited to the time left. Once it has passed nothing new is started and the request
+fails with 504.
+
+While the work runs, run() also watches the connection. When the client goes away
+(a Streamlit page left, a proxy timeout), the deadline is cancelled: the provider call
+in flight is allowed to finish, but no further upstream call, retry or fallback is
+made. A result that does come back is still returned to the endpoint, so a summary
+paid for within the deadline is saved.
+"""
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional, TypeVar
+
+import anyio
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.metrics import Counter
+
+T = TypeVar("T")
+
+HEADER = "X-Request-Timeout"
+DEFAULT_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "120"))
+MAX_SECONDS = float(os.environ.get("REQUEST_DEADLINE_MAX_SECONDS", "300"))
+
+REQUESTS_ABANDONED = Counter(
+    "papernest_requests_abandoned_total",
+    "Requests whose client disconnected, or whose deadline passed, while AI work was running.",
+    ("endpoint", "reason"),
+)
+
+_current: ContextVar[Optional["Deadline"]] = ContextVar("request_deadline", default=None)
+
+
+class RequestAbandoned(Exception):
+    """The request's work was stopped before it finished."""
+    status_code = 504
+
+
+class DeadlineExceeded(RequestAbandoned):
+    """The request's deadline passed."""
+    status_code = 504
+
+
+class RequestCancelled(RequestAbandoned):
+    """The client disconnected."""
+    status_code = 499  # nginx's "client closed request"; nobody receives it
+
+
+class Deadline:
+    """Absolute deadline of one request, plus a flag set when its client disconnects."""
+
+    __slots__ = ("seconds", "expires_at", "_cancelled")
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def check(self) -> None:
+        """Raise if the request was cancelled or its deadline has passed."""
+        if self._cancelled.is_set():
+            raise RequestCancelled("client disconnected")
+        if time.monotonic() >= self.expires_at:
+            raise DeadlineExceeded(f"request deadline of {self.seconds:g}s exceeded")
+
+    def sleep(self, seconds: float) -> None:
+        """time.sleep() that wakes up (and raises) when the request is cancelled."""
+        if self._cancelled.wait(seconds):
+            raise RequestCancelled("client disconnected")
+
+
+def current() -> Optional[Deadline]:
+    """Deadline of the request being handled, if any (None in background jobs)."""
+    return _current.get()
+
+
+async def request_deadline(request: Request) -> Deadline:
+    """Dependency: the request's deadline, from the X-Request-Timeout header or the server default."""
+    value = request.headers.get(HEADER)
+    if value is None:
+        return Deadline(min(DEFAULT_SECONDS, MAX_SECONDS))
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = 0.0
+    if not seconds > 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{HEADER} must be a positive number of seconds"
+        )
+    return Deadline(min(seconds, MAX_SECONDS))
+
+
+async def _watch_disconnect(request: Request, deadline: Deadline, endpoint: str) -> None:
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            REQUESTS_ABANDONED.inc(endpoint=endpoint, reason="disconnect")
+            deadline.cancel()
+            return
+
+
+async def run(request: Request, deadline: Deadline, fn: Callable[..., T], *args) -> T:
+    """
+    Run `fn(*args)` in the threadpool under `deadline`, cancelling it if the client
+    disconnects. Waits for the worker thread, which stops at its next provider call.
+    """
+    endpoint = getattr(request.scope.get("route"), "path", request.url.path)
+    token = _current.set(deadline)  # copied into the worker thread's context
+    error = None
+    try:
+        async with anyio.create_task_group() as tasks:
+            tasks.start_soon(_watch_disconnect, request, deadline, endpoint)
+            try:
+                result = await run_in_threadpool(fn, *args)
+            except Exception as exc:
+                error = exc
+            tasks.cancel_scope.cancel()
+    finally:
+        _current.reset(token)
+    if error is not None:
+        if isinstance(error, DeadlineExceeded):
+            REQUESTS_ABANDONED.inc(endpoint=endpoint, reason="deadline")
+        raise error
+    return result
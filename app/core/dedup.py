@@ -0,0 +1,119 @@
+"""
+Content-hash deduplication for uploaded papers.
+
+Every paper records the SHA-256 of the PDF its text was extracted from and of its
+normalized text. A PDF seen before (by anyone) is not extracted again: its text and
+summary are copied from the existing paper, and since chunk embeddings are stored by
+chunk hash (see app/core/rag_utils.py) they are reused as well.
+
+Only papers whose text is still exactly what was extracted (content_sha256 is set;
+editing the text clears it) are used as a source, so one user's edits never leak
+into another user's library.
+"""
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.metrics import CACHE_HITS, CACHE_MISSES
+from app.models.paper import Paper
+
+
+HASH_BLOCK = 16384
+RECENT_DIGESTS = 8
+
+_recent_digests: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+_digest_lock = threading.Lock()
+
+
+def sha256_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def text_digest(text: str) -> str:
+    """
+    SHA-256 of the exact text as UTF-8. Long texts are hashed in blocks instead of
+    encoding a full copy, and remembered for the last few text objects: a chat turn
+    needs its paper's digest several times (insights, embedding cache, prefetch marker).
+    """
+    if len(text) <= HASH_BLOCK:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _digest_lock:
+        entry = _recent_digests.get(id(text))
+    if entry is not None and entry[0] is text:
+        return entry[1]
+    digest = hashlib.sha256()
+    for start in range(0, len(text), HASH_BLOCK):
+        digest.update(text[start:start + HASH_BLOCK].encode("utf-8"))
+    result = digest.hexdigest()
+    with _digest_lock:
+        _recent_digests[id(text)] = (text, result)
+        _recent_digests.move_to_end(id(text))
+        while len(_recent_digests) > RECENT_DIGESTS:
+            _recent_digests.popitem(last=False)
+    return result
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace, so cosmetic differences hash the same."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def text_sha256(text: Optional[str]) -> Optional[str]:
+    if not text:
+        return None
+    return sha256_bytes(normalize_text(text).encode("utf-8"))
+
+
+def fresh_summary(paper: Paper) -> Optional[str]:
+    """The paper's summary, unless its text changed since it was generated."""
+    return None if paper.summary_stale else paper.summary
+
+
+def find_extracted(db: Session, content_sha256: Optional[str] = None,
+                   text_hash: Optional[str] = None, user_id: Optional[int] = None,
+                   exclude_id: Optional[int] = None) -> Optional[Paper]:
+    """
+    An unedited paper with the given PDF hash (or text hash), preferring the user's own
+    copy and then one that already has an up-to-date summary. Counts as a "pdf_content" cache hit/miss.
+    """
+    query = db.query(Paper).filter(Paper.content_sha256.isnot(None), Paper.paper_text.isnot(None))
+    if content_sha256 is not None:
+        query = query.filter(Paper.content_sha256 == content_sha256)
+    elif text_hash is not None:
+        query = query.filter(Paper.text_sha256 == text_hash)
+    else:
+        return None
+    if exclude_id is not None:
+        query = query.filter(Paper.id != exclude_id)
+    order = [or_(Paper.summary.is_(None), Paper.summary_stale), Paper.id]
+    if user_id is not None:
+        order.insert(0, (Paper.user_id == user_id).desc())
+    paper = query.order_by(*order).first()
+    if paper is None:
+        CACHE_MISSES.inc(cache="pdf_content")
+    else:
+        CACHE_HITS.inc(cache="pdf_content")
+    return paper
+
+
+def known_extractions(db: Session, hashes: List[str]) -> Dict[str, Tuple[str, Optional[str]]]:
+    """
+    find_extracted() for many PDFs at once: {pdf sha256: (text, summary)} for those some
+    unedited paper was already extracted from. Counts "pdf_content" cache hits/misses.
+    """
+    known: Dict[str, Tuple[str, Optional[str]]] = {}
+    for start in range(0, len(hashes), 500):
+        rows = db.query(Paper.content_sha256, Paper.paper_text, Paper.summary, Paper.summary_stale).filter(
+            Paper.content_sha256.in_(hashes[start:start + 500]),
+            Paper.paper_text.isnot(None),
+        ).order_by(or_(Paper.summary.is_(None), Paper.summary_stale))
+        for content_hash, text, summary, stale in rows:
+            known.setdefault(content_hash, (text, None if stale else summary))
+    CACHE_HITS.inc(len(known), cache="pdf_content")
+    CACHE_MISSES.inc(len(set(hashes)) - len(known), cache="pdf_content")
+    return known
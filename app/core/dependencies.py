@@ -18,18 +18,11 @@ def get_current_user(
             detail="Not authenticated"
         )
     
-    user_id = get_session_user(session_id)
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired session"
-        )
-    
-    user = db.query(User).filter(User.id == user_id).first()
+    user = get_session_user(session_id, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
+            detail="Invalid or expired session"
         )
     
     return user
@@ -0,0 +1,267 @@
+"""
+Per-paper chunk embeddings in memory-mapped files.
+
+Each paper's matrix is written once per host to a file under EMBED_CACHE_DIR (by
+default next to the host cache, i.e. in /dev/shm) and mapped read-only by every worker
+that chats about the paper. The pages live in the OS page cache, so all worker
+processes share one copy instead of each holding its own. Nothing per paper is kept
+on the Python heap: no matrix and no chunk strings. Chunks are stored as
+(start, end) offsets into the paper text, which the caller has anyway.
+
+Rows are L2-normalized at write time, so similarity search is one matrix-vector
+product straight on the mapped array. With EMBED_CACHE_DTYPE=int8, rows are quantized
+symmetrically with one float32 scale per row. That is a quarter of the float32 size,
+at a small loss in ranking accuracy (see benchmarks/bench_embedding_cache.py).
+
+Files are bounded in total by EMBED_CACHE_MAX_MB (default 256); the least recently
+used files are deleted first. A mapping that is still open stays valid after its file
+is deleted. Each process keeps its EMBED_CACHE_MAPPED (default 256) most recently used
+mappings open, so a chat turn does not map the file again.
+
+Search scores go to a per-thread buffer that is reused across calls. With int8, rows
+are widened to float32 before the product, into a per-thread buffer the size of the
+matrix (4x its mapped size) that is likewise reused: it is not a temporary per search,
+but each searching thread keeps one as large as the largest int8 paper it has searched.
+
+A file that is truncated or otherwise does not match its header is a cache miss, and
+is deleted so the index is rebuilt.
+
+File layout: 16-byte header (magic, rows, cols, dtype), int64 chunk spans [rows, 2],
+float32 row scales [rows] (int8 only), then the matrix.
+"""
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core import hostcache
+from app.core.metrics import CACHE_HITS, CACHE_MISSES
+
+CACHE_DIR = os.environ.get("EMBED_CACHE_DIR") or os.path.join(hostcache.CACHE_DIR, "embeddings")
+MAX_BYTES = int(float(os.environ.get("EMBED_CACHE_MAX_MB", "256")) * 2 ** 20)
+DTYPE = os.environ.get("EMBED_CACHE_DTYPE", "float32").lower()
+if DTYPE not in ("float32", "int8"):
+    raise ValueError(f"EMBED_CACHE_DTYPE must be float32 or int8, not {DTYPE!r}")
+MAPPED_MAX = int(os.environ.get("EMBED_CACHE_MAPPED", "256"))
+TOUCH_INTERVAL = 60.0  # seconds between mtime updates (eviction recency) of a mapped file
+
+_MAGIC = b"PNE1"
+_HEADER = struct.Struct("<4sIIB3x")
+_DTYPES = {0: np.float32, 1: np.int8}
+_CODES = {"float32": 0, "int8": 1}
+
+_evict_lock = threading.Lock()
+_mapped: "OrderedDict[str, PaperIndex]" = OrderedDict()  # by file path
+_mapped_lock = threading.Lock()
+_scratch = threading.local()
+
+
+def _buffer(name: str, shape: Tuple[int, ...], dtype) -> np.ndarray:
+    """A per-thread scratch array of `shape`, reused across calls (contents undefined)."""
+    size = 1
+    for dim in shape:
+        size *= dim
+    buf = getattr(_scratch, name, None)
+    if buf is None or buf.size < size:
+        buf = np.empty(max(size, 1024), dtype=dtype)
+        setattr(_scratch, name, buf)
+    return buf[:size].reshape(shape)
+
+
+class PaperIndex:
+    """Normalized chunk embeddings of one paper (memory-mapped, or in memory if the cache is unavailable)."""
+
+    __slots__ = ("matrix", "scales", "spans", "touched")
+
+    def __init__(self, matrix: np.ndarray, scales: Optional[np.ndarray], spans: np.ndarray):
+        self.matrix = matrix
+        self.scales = scales
+        self.spans = spans
+        self.touched = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def search(self, query: np.ndarray, top_k: int, bias: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Row indices of the `top_k` chunks most similar to `query` (normalized, 1-D), best
+        first. `bias` is added to the cosine similarities.
+        """
+        rows = len(self.matrix)
+        top_k = min(top_k, rows)
+        if top_k <= 0:
+            return np.empty(0, dtype=np.intp)
+        query = np.asarray(query, dtype=np.float32)
+        scores = _buffer("scores", (rows,), np.float32)
+        if self.scales is None:
+            np.matmul(self.matrix, query, out=scores)
+        else:
+            widened = _buffer("widened", self.matrix.shape, np.float32)
+            np.copyto(widened, self.matrix, casting="unsafe")
+            np.matmul(widened, query, out=scores)
+            scores *= self.scales
+        if bias is not None:
+            scores += bias
+        if top_k < rows:
+            best = np.argpartition(scores, rows - top_k)[rows - top_k:]
+            return best[np.argsort(scores[best])[::-1]]
+        return np.argsort(scores)[::-1]
+
+    def chunk_texts(self, text: str, indices) -> List[str]:
+        return [text[start:end] for start, end in self.spans[indices].tolist()]
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize(matrix: np.ndarray):
+    """Symmetric per-row int8 quantization: returns (int8 matrix, float32 scales), matrix ≈ q * scales[:, None]."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def _path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{key}.{DTYPE}.emb")
+
+
+def _build(matrix: np.ndarray, spans: np.ndarray):
+    """(PaperIndex in memory, file bytes)."""
+    matrix = normalize(matrix)
+    spans = np.ascontiguousarray(spans, dtype=np.int64).reshape(-1, 2)
+    scales = None
+    if DTYPE == "int8":
+        matrix, scales = quantize(matrix)
+    parts = [_HEADER.pack(_MAGIC, matrix.shape[0], matrix.shape[1], _CODES[DTYPE]), spans.tobytes()]
+    if scales is not None:
+        parts.append(scales.tobytes())
+    parts.append(np.ascontiguousarray(matrix).tobytes())
+    return PaperIndex(matrix, scales, spans), b"".join(parts)
+
+
+def exists(key: str) -> bool:
+    return os.path.exists(_path(key))
+
+
+def _layout(buf: np.ndarray) -> Optional[Tuple[int, int, type]]:
+    """(rows, cols, dtype) from a file's header, or None unless the file is exactly that size."""
+    if len(buf) < _HEADER.size:
+        return None
+    magic, rows, cols, code = _HEADER.unpack(buf[:_HEADER.size].tobytes())
+    dtype = _DTYPES.get(code)
+    if magic != _MAGIC or dtype is None:
+        return None
+    row_bytes = 16 + cols * np.dtype(dtype).itemsize + (4 if dtype is np.int8 else 0)
+    if len(buf) != _HEADER.size + rows * row_bytes:
+        return None
+    return rows, cols, dtype
+
+
+def load(key: str) -> Optional[PaperIndex]:
+    """Map a cached paper index, or None."""
+    path = _path(key)
+    with _mapped_lock:
+        index = _mapped.get(path)
+        if index is not None:
+            _mapped.move_to_end(path)
+    if index is not None:
+        now = time.monotonic()
+        if now - index.touched > TOUCH_INTERVAL:
+            index.touched = now
+            try:
+                os.utime(path)
+            except OSError:
+                pass  # evicted; the mapping stays valid
+        CACHE_HITS.inc(cache="paper_embeddings")
+        return index
+    try:
+        buf = np.memmap(path, dtype=np.uint8, mode="r").view(np.ndarray)  # plain views index faster
+        os.utime(path)  # recency for eviction
+    except ValueError:  # an empty file cannot be mapped
+        buf = np.empty(0, dtype=np.uint8)
+    except OSError:
+        CACHE_MISSES.inc(cache="paper_embeddings")
+        return None
+    layout = _layout(buf)
+    if layout is None:
+        print(f"⚠️ Discarding corrupt embedding cache file {path}")
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        CACHE_MISSES.inc(cache="paper_embeddings")
+        return None
+    rows, cols, dtype = layout
+    offset = _HEADER.size
+    spans = buf[offset:offset + rows * 16].view(np.int64).reshape(rows, 2)
+    offset += rows * 16
+    scales = None
+    if dtype is np.int8:
+        scales = buf[offset:offset + rows * 4].view(np.float32)
+        offset += rows * 4
+    matrix = buf[offset:offset + rows * cols * np.dtype(dtype).itemsize].view(dtype).reshape(rows, cols)
+    CACHE_HITS.inc(cache="paper_embeddings")
+    index = PaperIndex(matrix, scales, spans)
+    with _mapped_lock:
+        _mapped[path] = index
+        while len(_mapped) > MAPPED_MAX:
+            _mapped.popitem(last=False)
+    return index
+
+
+def store(key: str, matrix: np.ndarray, spans: np.ndarray) -> PaperIndex:
+    """Write a paper's embeddings and map them back; falls back to an in-memory index on I/O errors."""
+    index, data = _build(matrix, spans)
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, _path(key))  # atomic: readers see the old file or the whole new one
+    except OSError as e:
+        print(f"⚠️ Embedding cache write failed ({e}), keeping the index in memory")
+        return index
+    _evict()
+    return load(key) or index
+
+
+def _evict() -> None:
+    """Delete the least recently used files until the cache is under 90% of MAX_BYTES."""
+    if not _evict_lock.acquire(blocking=False):
+        return  # another thread is already on it
+    try:
+        files = []
+        with os.scandir(CACHE_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith(".emb"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        if total <= MAX_BYTES:
+            return
+        target = int(MAX_BYTES * 0.9)
+        for _, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= target:
+                break
+    except OSError:
+        pass
+    finally:
+        _evict_lock.release()
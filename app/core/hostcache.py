@@ -0,0 +1,175 @@
+"""
+Cache shared by all worker processes on a host.
+
+Each worker has its own memory, so per-process caches (lru_cache, dicts) are cold in
+every worker and repeat the same work N times. This tier is a SQLite file in shared
+memory (/dev/shm when available, so reads never touch disk), which every process on
+the host can read and write concurrently (WAL mode). Entries carry an optional TTL.
+The total size is bounded: once it exceeds HOST_CACHE_MAX_MB, the least recently
+written entries are dropped.
+
+Being a cache, every failure is treated as a miss: callers always have a way to
+recompute the value.
+
+Configuration: HOST_CACHE_DIR (default /dev/shm/papernest when it has room, else the temp dir),
+HOST_CACHE_MAX_MB (default 256), HOST_CACHE=off to disable.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+import numpy as np
+
+from app.core.metrics import CACHE_HITS, CACHE_MISSES
+
+ENABLED = os.environ.get("HOST_CACHE", "on").lower() not in ("0", "off", "false", "no")
+MAX_BYTES = int(float(os.environ.get("HOST_CACHE_MAX_MB", "256")) * 2 ** 20)
+EVICT_CHECK_EVERY = 200  # writes between size checks
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    written_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_written_at ON cache (written_at);
+"""
+
+_local = threading.local()
+_writes = 0
+_writes_lock = threading.Lock()
+
+
+def _default_dir() -> str:
+    """/dev/shm if it is big enough (Docker gives containers only 64 MB by default)."""
+    try:
+        shm = os.statvfs("/dev/shm")
+        if os.access("/dev/shm", os.W_OK) and shm.f_bavail * shm.f_frsize > 2 * MAX_BYTES:
+            return "/dev/shm/papernest"
+    except OSError:
+        pass
+    return os.path.join(tempfile.gettempdir(), "papernest-cache")
+
+
+CACHE_DIR = os.environ.get("HOST_CACHE_DIR") or _default_dir()
+
+
+def _connection() -> Optional[sqlite3.Connection]:
+    """One connection per thread (and per process: never reused across a fork)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid():
+        return conn
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(CACHE_DIR, "cache.db"), timeout=1.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")  # a cache: losing writes on a crash is fine
+        conn.executescript(_SCHEMA)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Host cache unavailable ({e}), continuing without it")
+        return None
+    _local.conn, _local.pid = conn, os.getpid()
+    return conn
+
+
+def get(key: str, cache: str = "host") -> Optional[bytes]:
+    """Stored bytes for `key`, or None. Counted as a hit/miss of `cache` in /metrics."""
+    if not ENABLED:
+        return None
+    conn = _connection()
+    row = None
+    if conn is not None:
+        try:
+            row = conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        except sqlite3.Error:
+            row = None
+    if row is None:
+        CACHE_MISSES.inc(cache=cache)
+        return None
+    CACHE_HITS.inc(cache=cache)
+    return row[0]
+
+
+def set(key: str, value: bytes, ttl: Optional[float] = None) -> None:
+    global _writes
+    if not ENABLED or len(value) > MAX_BYTES // 4:
+        return
+    conn = _connection()
+    if conn is None:
+        return
+    now = time.time()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, size, expires_at, written_at) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value), now + ttl if ttl else None, now),
+        )
+    except sqlite3.Error:
+        return
+    with _writes_lock:
+        _writes += 1
+        check = _writes % EVICT_CHECK_EVERY == 0
+    if check:
+        _evict(conn)
+
+
+def delete(key: str) -> None:
+    conn = _connection() if ENABLED else None
+    if conn is not None:
+        try:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error:
+            pass
+
+
+def _evict(conn: sqlite3.Connection) -> None:
+    """Drop expired entries, then the oldest ones until the cache is back under 90% of MAX_BYTES."""
+    try:
+        conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= MAX_BYTES:
+            return
+        excess = total - int(MAX_BYTES * 0.9)
+        cutoff, freed = None, 0
+        for written_at, size in conn.execute("SELECT written_at, size FROM cache ORDER BY written_at"):
+            freed += size
+            cutoff = written_at
+            if freed >= excess:
+                break
+        if cutoff is not None:
+            conn.execute("DELETE FROM cache WHERE written_at <= ?", (cutoff,))
+    except sqlite3.Error:
+        pass
+
+
+# --- typed helpers ----------------------------------------------------------
+
+def get_json(key: str, cache: str = "host") -> Any:
+    raw = get(key, cache)
+    return json.loads(raw) if raw is not None else None
+
+
+def set_json(key: str, value: Any, ttl: Optional[float] = None) -> None:
+    set(key, json.dumps(value).encode("utf-8"), ttl)
+
+
+def get_array(key: str, cache: str = "host") -> Optional[np.ndarray]:
+    """A float32 matrix stored with set_array()."""
+    raw = get(key, cache)
+    if raw is None:
+        return None
+    rows, cols = np.frombuffer(raw[:8], dtype=np.uint32)
+    return np.frombuffer(raw, dtype=np.float32, offset=8).reshape(int(rows), int(cols))
+
+
+def set_array(key: str, matrix: np.ndarray, ttl: Optional[float] = None) -> None:
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    set(key, np.array(matrix.shape, dtype=np.uint32).tobytes() + matrix.tobytes(), ttl)
@@ -0,0 +1,121 @@
+"""
+Conditional GET for paper resources.
+
+Every user has a library version (users.library_version) that is bumped in the same
+transaction as any write to their papers, so it changes exactly when a GET /papers/
+response could. ETags are built from it, which lets If-None-Match be answered with a
+304 from the already-loaded User row, without querying or serializing any papers.
+
+Writes through the ORM (session.add / attribute changes / session.delete) are picked
+up by a flush hook below. Core UPDATE / INSERT / DELETE statements on papers must call
+touch_users() or touch_papers() in their transaction.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import event, select, update
+from sqlalchemy.sql import func
+
+from app.db.database import SessionLocal
+from app.models.paper import Paper
+from app.models.user import User
+
+# Clients revalidate on every use, and shared caches must not store per-user data
+CACHE_CONTROL = "private, no-cache"
+
+
+def touch_users(db, user_ids: Iterable[int]) -> None:
+    """Bump the library version of these users."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    db.execute(
+        update(User).where(User.id.in_(user_ids))
+        .values(library_version=User.library_version + 1, library_updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def touch_papers(db, *conditions) -> None:
+    """Bump the library version of every user owning a paper that matches `conditions`."""
+    owners = select(Paper.user_id).where(*conditions).distinct()
+    db.execute(
+        update(User).where(User.id.in_(owners))
+        .values(library_version=User.library_version + 1, library_updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _touch_flushed_papers(session, flush_context):
+    # new / dirty / deleted still describe what was just flushed
+    user_ids = {obj.user_id for obj in session.new if isinstance(obj, Paper)}
+    user_ids.update(obj.user_id for obj in session.deleted if isinstance(obj, Paper))
+    user_ids.update(
+        obj.user_id for obj in session.dirty
+        if isinstance(obj, Paper) and session.is_modified(obj, include_collections=False)
+    )
+    user_ids.discard(None)
+    if user_ids:
+        session.connection().execute(
+            update(User.__table__).where(User.__table__.c.id.in_(sorted(user_ids)))
+            .values(library_version=User.__table__.c.library_version + 1, library_updated_at=func.now())
+        )
+
+
+def library_etag(user: User, *parts) -> str:
+    """Weak ETag for a view of the user's library (extra `parts` tell views apart)."""
+    tag = ".".join(str(part) for part in (user.id, user.library_version or 0, *parts))
+    return f'W/"{tag}"'
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)  # SQLite stores UTC without an offset
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def http_date(value: Optional[datetime]) -> Optional[str]:
+    value = _as_utc(value)
+    return format_datetime(value, usegmt=True) if value is not None else None
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    True when the client's copy is current: If-None-Match matches `etag` or, when the
+    client sent no If-None-Match, nothing changed after If-Modified-Since.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = _as_utc(last_modified)
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return since is not None and last_modified <= _as_utc(since)
+    return False
+
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime] = None) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
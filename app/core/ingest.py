@@ -0,0 +1,175 @@
+"""
+Bulk import jobs, and the process pool PDF text extraction runs in (pypdf is CPU-bound).
+
+Rows are inserted up front by app/api/bulk.py with their PDFs already in the blob
+store, and processed by the upload pipeline (app/core/pipeline.py), so an import is
+resumed after a restart like any upload. A job only remembers which papers it
+created; its status is read from their processing_state, so every worker (and any
+worker after a restart) reports the same progress.
+
+Tuning: INGEST_EXTRACT_WORKERS (default: CPU count, 0 = extract in-thread).
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core import hostcache
+from app.core.insights import precompute as precompute_insights
+from app.core.metrics import Counter
+from app.core.providers import ProviderError
+from app.core.ratelimit import current_user_id
+from app.db.database import SessionLocal
+from app.models.paper import Paper
+
+EXTRACT_WORKERS = int(os.environ.get("INGEST_EXTRACT_WORKERS", os.cpu_count() or 1))
+MAX_JOBS_KEPT = 100
+JOB_TTL = 24 * 3600
+
+# processing_state -> item state reported by GET /papers/bulk/{job_id}
+ITEM_STATES = {
+    "queued": "queued",
+    "extracting": "extracting",
+    "chunking": "embedding",
+    "embedding": "embedding",
+    "summarizing": "summarizing",
+    "ready": "done",
+    "failed": "failed",
+}
+
+REINDEXED_CHUNKS = Counter(
+    "papernest_reindex_chunks_total",
+    "Chunks of edited papers, by whether their embedding was reused or recomputed.",
+    ("result",),
+)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    global _process_pool
+    if EXTRACT_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _process_pool is None:
+            # "spawn": forking a multi-threaded server process is not safe
+            _process_pool = ProcessPoolExecutor(
+                max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _process_pool
+
+
+def discard_process_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool (a worker died) so the next get_process_pool() starts a fresh one."""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False)
+
+
+class ImportJob:
+    """
+    One bulk import: the papers it created, as dicts with index, paper_id, title and
+    filename (BulkImportItemStatus without the state, which lives on the paper).
+    """
+
+    def __init__(self, user_id: int, items: List[dict]):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.items = items
+        self.created_at = time.time()
+
+    def status(self, db: Session) -> dict:
+        """Shaped like BulkImportJobResponse."""
+        paper_ids = [item["paper_id"] for item in self.items]
+        states = {}
+        for start in range(0, len(paper_ids), 500):
+            states.update((paper_id, (state, error)) for paper_id, state, error in db.query(
+                Paper.id, Paper.processing_state, Paper.processing_error
+            ).filter(Paper.id.in_(paper_ids[start:start + 500]), Paper.user_id == self.user_id))
+        items = []
+        for item in self.items:
+            state, error = states.get(item["paper_id"], ("failed", "Paper was deleted"))
+            items.append({**item, "state": ITEM_STATES.get(state, state), "error": error})
+        done = sum(1 for i in items if i["state"] == "done")
+        failed = sum(1 for i in items if i["state"] == "failed")
+        return {
+            "job_id": self.id,
+            "state": "completed" if done + failed == len(items) else "running",
+            "total": len(items),
+            "done": done,
+            "failed": failed,
+            "items": items,
+        }
+
+
+jobs: Dict[str, ImportJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def register_job(job: ImportJob) -> None:
+    """Remember the job here, and in the host cache for the other workers on the host."""
+    with _jobs_lock:
+        jobs[job.id] = job
+        # Forget the oldest jobs
+        for old in sorted(jobs.values(), key=lambda j: j.created_at)[:max(0, len(jobs) - MAX_JOBS_KEPT)]:
+            jobs.pop(old.id, None)
+    hostcache.set_json(f"import-job:{job.id}", {"user_id": job.user_id, "items": job.items}, ttl=JOB_TTL)
+
+
+def get_job(job_id: str, user_id: int) -> Optional[ImportJob]:
+    job = jobs.get(job_id)
+    if job is None:
+        snapshot = hostcache.get_json(f"import-job:{job_id}", cache="import_jobs")
+        if snapshot is None:
+            return None
+        job = ImportJob(snapshot["user_id"], snapshot["items"])
+        job.id = job_id
+    return job if job.user_id == user_id else None
+
+
+def get_job_status(db: Session, job_id: str, user_id: int) -> Optional[dict]:
+    job = get_job(job_id, user_id)
+    return job.status(db) if job is not None else None
+
+
+def reindex_text(text: Optional[str], user_id: int, label: str = "text") -> None:
+    """
+    Background re-index after paper_text is edited: chunks that survived the edit
+    keep their stored embeddings, only new or changed chunks are embedded.
+    """
+    from app.core.rag_utils import index_paper_text
+
+    if not text:
+        return
+    try:
+        precompute_insights(text)
+    except Exception as e:
+        print(f"⚠️ Insights for {label} failed: {e}")
+    current_user_id.set(user_id)
+    try:
+        total, embedded = index_paper_text(text)
+    except (ProviderError, ValueError, ImportError) as e:
+        # Not fatal: chat embeds whatever is still missing on first use
+        print(f"⚠️ Re-indexing {label} failed: {e}")
+        return
+    REINDEXED_CHUNKS.inc(total - embedded, result="reused")
+    REINDEXED_CHUNKS.inc(embedded, result="embedded")
+    print(f"♻️ Re-indexed {label}: {embedded}/{total} chunks embedded")
+
+
+def reindex_paper(paper_id: int, user_id: int) -> None:
+    """reindex_text() for the paper's current text (later edits supersede earlier ones)."""
+    db = SessionLocal()
+    try:
+        text = db.query(Paper.paper_text).filter(Paper.id == paper_id).scalar()
+    finally:
+        db.close()
+    reindex_text(text, user_id, label=f"paper {paper_id}")
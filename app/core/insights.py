@@ -0,0 +1,396 @@
+"""
+Paper insights computed at ingest, without any LLM call.
+
+- Section outline: numbered ("2.1 Training Details", "IV. RESULTS") and well-known
+  unnumbered ("Abstract", "Related Work") headings, with character offsets into the text.
+- References: the entries of the References / Bibliography section, split on "[n]",
+  "n." or author-year entry starts.
+- Keyphrases: TF-IDF over candidate phrases (runs of 1-3 non-stopwords). Document
+  frequencies come from every text processed so far (phrase_document_counts), so
+  phrases common to all papers ("neural network", "experimental results") rank below
+  ones specific to this paper.
+
+Insights are stored per exact text (TextInsights) and computed by the upload pipeline,
+bulk import and text edits; request handlers only read them (stored_insights) and
+queue precompute() for a text that has none yet. They are served by
+GET /papers/{id}/insights, answer structural chat questions ("what are the
+sections?", "what does it cite?") without an LLM call, and bias retrieval
+towards sections named in a question (see rag_utils.retrieve_context).
+"""
+import math
+import re
+import threading
+from collections import Counter as TermCounter
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.dedup import text_digest
+from app.core.metrics import stage, CACHE_HITS, CACHE_MISSES
+from app.db.database import SessionLocal, insert_ignore_conflicts, insert_or_increment
+from app.models.insights import PhraseDocumentCount, TextInsights
+
+VERSION = 1  # bump when extraction changes, so stored insights are recomputed
+
+MAX_KEYPHRASES = 15
+DF_CANDIDATES = 300    # most frequent candidate phrases per text that count towards document frequencies
+MAX_REFERENCES = 500
+SECTION_BOOST = 0.15   # retrieval score bonus for chunks inside a section named in the query
+
+_KNOWN_HEADINGS = {
+    "abstract", "introduction", "background", "related work", "related works", "prior work",
+    "preliminaries", "method", "methods", "methodology", "approach", "model", "proposed method",
+    "experiments", "experimental setup", "experimental results", "evaluation", "results",
+    "results and discussion", "analysis", "discussion", "limitations", "future work",
+    "conclusion", "conclusions", "conclusion and future work", "conclusions and future work",
+    "summary", "acknowledgments", "acknowledgements", "acknowledgment", "acknowledgement",
+    "references", "bibliography", "works cited", "appendix", "supplementary material",
+}
+_REFERENCE_HEADINGS = {"references", "bibliography", "works cited"}
+
+_NUMBERED = re.compile(r"^((?:\d{1,2}\.)*\d{1,2})\.?\s+([A-Z][^\n]{1,80})$")
+_ROMAN = re.compile(r"^([IVX]{1,5})\.\s+([A-Z][^\n]{1,80})$")
+_APPENDIX = re.compile(r"^(?:appendix\s+)?([A-H])(?:\.|\s)\s*([A-Z][^\n]{1,80})$", re.IGNORECASE)
+_ROMAN_VALUES = {"I": 1, "V": 5, "X": 10}
+
+_BRACKET_REF = re.compile(r"^\s*\[(\d{1,3})\]\s*")
+_NUMBERED_REF = re.compile(r"^\s*(\d{1,3})\.\s+(?=[A-Z])")
+_AUTHOR_START = re.compile(r"^[A-Z][A-Za-z'`\-]+(?:\s[A-Z][A-Za-z'`\-]+)?,\s+(?:[A-Z]\.|[A-Z][a-z]+)")
+_YEAR = re.compile(r"\b(19[5-9]\d|20\d\d)[a-z]?\b")
+
+_WORD = re.compile(r"[a-z][a-z0-9\-]*[a-z0-9]|[a-z]")
+_BREAK = re.compile(r"[^a-z0-9\-\s]+")
+_STOPWORDS = frozenset("""
+a about above after again against all also although among an and any are as at be because been before being
+below between both but by can could did do does doing done down during each either et al etc even ever every
+few for from further had has have having he her here hers him his how however i if in into is it its itself
+just least less let like made make many may me might more most much must my neither no nor not now of off
+often on once one only or other others otherwise our ours out over own per perhaps rather same several shall
+she should since so some such than that the their them themselves then there therefore these they this those
+though through thus to too toward towards under until up upon us use used uses using very via was we were what
+whatever when where whether which while who whom whose why will with within without would yet you your
+paper papers propose proposed show shown shows present presented work works approach approaches method methods
+result results table tables fig figure figures section sections eq equation example examples first second
+third new two three based given different well large small high low also respectively however furthermore
+moreover note see e.g i.e vs cf ii iii iv
+""".split())
+
+
+# --- sections ---------------------------------------------------------------
+
+def _roman(numeral: str) -> int:
+    values = [_ROMAN_VALUES[c] for c in numeral]
+    return sum(-v if i + 1 < len(values) and v < values[i + 1] else v for i, v in enumerate(values))
+
+
+def _title_ok(title: str) -> bool:
+    """Headings are short, mostly letters, and not sentences."""
+    words = title.split()
+    if not 1 <= len(words) <= 10 or title[-1] in ".,;:" or title.count(",") > 1:
+        return False
+    letters = sum(c.isalpha() for c in title)
+    return letters >= 0.7 * len(title.replace(" ", ""))
+
+
+def extract_sections(text: str) -> List[dict]:
+    """Section outline: [{number, title, level, start, end}], start/end being offsets into `text`."""
+    headings = []
+    last_top = 0
+    in_appendix = False
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        start, offset = offset, offset + len(line)
+        stripped = line.strip()
+        if not stripped or len(stripped) > 90:
+            continue
+        plain = re.sub(r"[\s:]+$", "", stripped).lower()
+        number, title, level = None, None, 1
+        match = _NUMBERED.match(stripped)
+        if match and _title_ok(match.group(2)):
+            parts = [int(p) for p in match.group(1).split(".")]
+            # Section numbers only move forward: rejects numbered list items, table rows, ...
+            if last_top <= parts[0] <= last_top + 2 and (len(parts) > 1 or parts[0] > last_top or not headings):
+                number, title, level = match.group(1), match.group(2).strip(), len(parts)
+                last_top = parts[0]
+        if title is None:
+            match = _ROMAN.match(stripped)
+            if match and _title_ok(match.group(2)):
+                value = _roman(match.group(1))
+                if last_top < value <= last_top + 2:
+                    number, title = match.group(1), match.group(2).strip()
+                    last_top = value
+        if title is None and in_appendix:
+            match = _APPENDIX.match(stripped)
+            if match and _title_ok(match.group(2)):
+                number, title = match.group(1).upper(), match.group(2).strip()
+        if title is None and (plain in _KNOWN_HEADINGS or plain.startswith("appendix")) and len(plain) <= 40:
+            title = re.sub(r"[\s:]+$", "", stripped)
+        if title is None:
+            continue
+        if title.isupper():
+            title = title.title()
+        if plain.startswith("appendix"):
+            in_appendix = True
+        headings.append({"number": number, "title": title, "level": level, "start": start})
+
+    sections = []
+    for i, heading in enumerate(headings):
+        end = len(text)
+        for following in headings[i + 1:]:
+            if following["level"] <= heading["level"]:
+                end = following["start"]
+                break
+        sections.append({**heading, "end": end})
+    return sections
+
+
+# --- references -------------------------------------------------------------
+
+def _reference_span(text: str, sections: List[dict]) -> Optional[tuple]:
+    for section in reversed(sections):
+        if section["title"].lower().rstrip(":") in _REFERENCE_HEADINGS:
+            # Up to the next heading of any level (appendices often follow)
+            later = [s["start"] for s in sections if s["start"] > section["start"]]
+            return section["start"], min(later) if later else len(text)
+    return None
+
+
+def _clean_reference(lines: List[str]) -> str:
+    joined = ""
+    for line in lines:
+        line = line.strip()
+        if joined.endswith("-") and line[:1].islower():
+            joined = joined[:-1] + line  # re-join words hyphenated at line ends
+        else:
+            joined = f"{joined} {line}" if joined else line
+    return " ".join(joined.split())[:1000]
+
+
+def extract_references(text: str, sections: Optional[List[dict]] = None) -> List[dict]:
+    """Bibliography entries: [{index, text, year}]."""
+    if sections is None:
+        sections = extract_sections(text)
+    span = _reference_span(text, sections)
+    if span is None:
+        return []
+    lines = text[span[0]:span[1]].splitlines()[1:]  # skip the heading itself
+    lines = [line for line in lines if line.strip() and not line.strip().isdigit()]  # page numbers
+    if not lines:
+        return []
+
+    brackets = sum(1 for line in lines if _BRACKET_REF.match(line))
+    numbered = sum(1 for line in lines if _NUMBERED_REF.match(line))
+    entries: List[List[str]] = []
+    for i, line in enumerate(lines):
+        if brackets >= 2:
+            starts = bool(_BRACKET_REF.match(line))
+        elif numbered >= 2:
+            starts = bool(_NUMBERED_REF.match(line))
+        else:
+            previous = lines[i - 1].rstrip() if i else ""
+            starts = not entries or (bool(_AUTHOR_START.match(line.strip())) and previous.endswith("."))
+        if starts or not entries:
+            entries.append([line])
+        else:
+            entries[-1].append(line)
+
+    references = []
+    for position, entry in enumerate(entries[:MAX_REFERENCES], start=1):
+        first = entry[0]
+        match = _BRACKET_REF.match(first) or _NUMBERED_REF.match(first)
+        index = int(match.group(1)) if match else position
+        if match:
+            entry = [first[match.end():], *entry[1:]]
+        cleaned = _clean_reference(entry)
+        if len(cleaned) < 10:
+            continue
+        year = _YEAR.search(cleaned)
+        references.append({"index": index, "text": cleaned, "year": int(year.group(1)) if year else None})
+    return references
+
+
+# --- keyphrases -------------------------------------------------------------
+
+def candidate_phrases(text: str) -> TermCounter:
+    """Frequencies of 1-3 word phrases that contain no stopword or punctuation."""
+    counts: TermCounter = TermCounter()
+    for fragment in _BREAK.split(text.lower()):
+        run: List[str] = []
+        for word in _WORD.findall(fragment) + [""]:
+            if word and word not in _STOPWORDS and not word.replace("-", "").isdigit() and len(word) > 2:
+                run.append(word)
+                continue
+            for n in (1, 2, 3):
+                for i in range(len(run) - n + 1):
+                    counts[" ".join(run[i:i + n])] += 1
+            run = []
+    return counts
+
+
+def rank_keyphrases(counts: TermCounter, document_counts: Dict[str, int], documents: int) -> List[dict]:
+    """TF-IDF ranking, longer phrases preferred, dropping phrases contained in a better one."""
+    scored = []
+    for phrase, tf in counts.items():
+        words = phrase.count(" ") + 1
+        if tf < 2 and words == 1:
+            continue
+        idf = math.log((1 + documents) / (1 + document_counts.get(phrase, 0))) + 1
+        scored.append(((1 + math.log(tf)) * idf * (1 + 0.5 * (words - 1)), phrase))
+    scored.sort(reverse=True)
+    chosen: List[dict] = []
+    for score, phrase in scored:
+        if any(f" {phrase} " in f" {kept['phrase']} " for kept in chosen):
+            continue
+        chosen.append({"phrase": phrase, "score": round(score, 3)})
+        if len(chosen) >= MAX_KEYPHRASES:
+            break
+    return chosen
+
+
+# --- storage ----------------------------------------------------------------
+
+_computing = set()  # digests precompute() is working on in this process
+_computing_lock = threading.Lock()
+
+
+def _as_dict(row: TextInsights) -> dict:
+    return {"sections": row.sections, "references": row.references, "keyphrases": row.keyphrases}
+
+
+def stored_insights(db: Session, text: str) -> Optional[dict]:
+    """Stored insights for `text`, or None when they are missing or outdated. Never computes."""
+    row = db.get(TextInsights, text_digest(text))
+    if row is None or row.version != VERSION:
+        CACHE_MISSES.inc(cache="insights")
+        return None
+    CACHE_HITS.inc(cache="insights")
+    return _as_dict(row)
+
+
+def compute_insights(db: Session, text: str) -> dict:
+    """
+    Insights for `text` ({sections, references, keyphrases}), computed and stored
+    if missing or outdated.
+    """
+    digest = text_digest(text)
+    row = db.get(TextInsights, digest)
+    if row is not None and row.version == VERSION:
+        CACHE_HITS.inc(cache="insights")
+        return _as_dict(row)
+    CACHE_MISSES.inc(cache="insights")
+
+    with stage("insights"):
+        sections = extract_sections(text)
+        references = extract_references(text, sections)
+        span = _reference_span(text, sections)
+        body = text[:span[0]] + text[span[1]:] if span else text  # citations would skew the terms
+        counts = candidate_phrases(body)
+        candidates = [phrase for phrase, _ in counts.most_common(DF_CANDIDATES)]
+        document_counts = dict(db.query(PhraseDocumentCount.phrase, PhraseDocumentCount.documents).filter(
+            PhraseDocumentCount.phrase.in_(candidates)
+        ).all()) if candidates else {}
+        documents = db.query(func.count(TextInsights.text_digest)).scalar() or 0
+        keyphrases = rank_keyphrases(counts, document_counts, documents)
+
+    insights = {"sections": sections, "references": references, "keyphrases": keyphrases}
+    if row is not None:
+        for name, value in insights.items():
+            setattr(row, name, value)
+        row.version = VERSION
+    else:
+        # Another worker may be processing the same text; only the first insert counts its phrases
+        inserted = db.execute(insert_ignore_conflicts(TextInsights.__table__),
+                              {"text_digest": digest, "version": VERSION, **insights}).rowcount
+        if inserted and candidates:
+            db.execute(insert_or_increment(PhraseDocumentCount, "phrase", "documents"),
+                       [{"phrase": phrase[:200], "documents": 1} for phrase in sorted(candidates)])
+    db.commit()
+    return insights
+
+
+def precompute(text: Optional[str]) -> None:
+    """
+    compute_insights() in its own session, for background ingest stages and background
+    tasks queued by requests. A text already being computed in this process is skipped.
+    """
+    if not text:
+        return
+    digest = text_digest(text)
+    with _computing_lock:
+        if digest in _computing:
+            return
+        _computing.add(digest)
+    db = SessionLocal()
+    try:
+        compute_insights(db, text)
+    finally:
+        db.close()
+        with _computing_lock:
+            _computing.discard(digest)
+
+
+# --- uses -------------------------------------------------------------------
+
+def section_bias(spans: np.ndarray, sections: List[dict], query: str) -> Optional[np.ndarray]:
+    """
+    Per-chunk retrieval bonus: chunks overlapping a section whose title the query
+    mentions ("what do the results show", "limitations") get up to SECTION_BOOST.
+    """
+    query_stems = {word[:5] for word in _WORD.findall(query.lower()) if len(word) > 3}
+    named = []
+    for section in sections:
+        words = [w for w in _WORD.findall(section["title"].lower()) if len(w) > 3 and w not in _STOPWORDS]
+        if not words and section["title"].lower() in _KNOWN_HEADINGS:
+            words = [section["title"].lower()]  # "Results", "Methods" are stopwords for keyphrases only
+        if words and all(word[:5] in query_stems for word in words):
+            named.append((section["start"], section["end"]))
+    if not named or not len(spans):
+        return None
+    starts, ends = spans[:, 0], spans[:, 1]
+    lengths = np.maximum(ends - starts, 1)
+    bias = np.zeros(len(spans), dtype=np.float32)
+    for start, end in named:
+        overlap = np.clip(np.minimum(ends, end) - np.maximum(starts, start), 0, None)
+        bias = np.maximum(bias, SECTION_BOOST * overlap / lengths)
+    return bias
+
+
+# Questions that filter or interpret rather than list go to the LLM
+_NOT_STRUCTURAL = re.compile(
+    r"\b(about|regarding|say|says|said|mean|means|explain|why|compare|discuss|describe|summari[sz]e"
+    r"|from|before|after|since|between|most|best|latest|oldest|important|relevant)\b"
+)
+_STRUCTURAL = [
+    ("sections", re.compile(r"\b(sections|outline|structure|table of contents|headings|chapters)\b")),
+    ("references", re.compile(r"\b(references|bibliography|citations|cite|cites|cited|works cited)\b")),
+    ("keyphrases", re.compile(r"\b(key ?words|key ?phrases|key terms|main topics|topics)\b")),
+]
+
+
+def structural_question(query: str) -> Optional[str]:
+    """'sections', 'references' or 'keyphrases' for short listing questions the insights answer outright."""
+    lowered = query.lower()
+    if len(lowered.split()) > 12 or _NOT_STRUCTURAL.search(lowered):
+        return None
+    if not re.match(r"\W*(what|which|list|show|give|how many|outline)\b", lowered):
+        return None
+    for kind, pattern in _STRUCTURAL:
+        if pattern.search(lowered):
+            return kind
+    return None
+
+
+def answer(kind: str, insights: dict) -> Optional[str]:
+    """Answer to a structural_question(), or None when the insights do not have it."""
+    if kind == "sections" and insights["sections"]:
+        lines = [("  " * (s["level"] - 1)) + (f"{s['number']} " if s["number"] else "") + s["title"]
+                 for s in insights["sections"]]
+        return "The paper is organized in these sections:\n" + "\n".join(lines)
+    if kind == "references" and insights["references"]:
+        lines = [f"[{r['index']}] {r['text']}" for r in insights["references"]]
+        return f"The paper cites {len(lines)} works:\n" + "\n".join(lines)
+    if kind == "keyphrases" and insights["keyphrases"]:
+        return "Key phrases of the paper: " + ", ".join(k["phrase"] for k in insights["keyphrases"])
+    return None
@@ -1,20 +1,23 @@
 import io
 from pypdf import PdfReader
-from fastapi import UploadFile
 
-async def extract_text_from_pdf(file: UploadFile) -> str:
+from app.core.blobstore import get_blob_store
+from app.core.metrics import stage
+from app.core.tracing import traced
+
+@traced("extract_text_from_pdf")
+def extract_text_from_bytes(content: bytes) -> str:
+    """
+    Extract text content from raw PDF bytes.
+    """
+    with stage("pdf_extract"):
+        reader = PdfReader(io.BytesIO(content))
+        return "".join((page.extract_text() or "") + "\n" for page in reader.pages)
+
+def extract_text_from_blob(key: str) -> str:
     """
-    Extract text content from an uploaded PDF file.
+    Extract text from a PDF in the blob store.
+    Top-level (picklable) so it can run in a process pool.
     """
-    content = await file.read()
-    pdf_file = io.BytesIO(content)
-    reader = PdfReader(pdf_file)
-    
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-        
-    # Reset file cursor for further usage if needed
-    await file.seek(0)
-    
-    return text
+    with get_blob_store().local_copy(key) as path, open(path, "rb") as fh:
+        return extract_text_from_bytes(fh.read())
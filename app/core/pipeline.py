@@ -0,0 +1,350 @@
+"""
+Background processing of uploaded and bulk-imported papers.
+
+upload_paper and bulk_import_papers store the PDFs and return straight away; each
+paper then moves through
+    extract -> chunk -> embed -> summarize
+with its progress in Paper.processing_state (insights, app/core/insights.py, are
+computed on the CPU right after extraction). Papers imported with their text start at
+the chunk stage. Uploads get every stage; a paper can be queued with fewer
+(processing_stages, e.g. bulk imports skip summarizing and only embed on request),
+which resume() honours too. Identical PDFs queued together are extracted once. Each stage has its own worker pool, so a
+slow provider (embedding, summarizing) never holds up extraction and vice versa, and
+each stage retries transient failures (provider timeouts / 429s / outages, I/O errors)
+with exponential backoff. Extraction failing marks the paper "failed"; embedding or
+summarizing failing still leaves it "ready" (chat embeds on demand) with the error in
+processing_error.
+
+Tuning: PIPELINE_EXTRACT_CONCURRENCY (default INGEST_EXTRACT_WORKERS, at least 2: one
+thread per PDF in the extraction process pool), PIPELINE_EMBED_CONCURRENCY (4),
+PIPELINE_SUMMARIZE_CONCURRENCY (2), PIPELINE_MAX_ATTEMPTS (3),
+PIPELINE_AUTO_SUMMARIZE (default true), PIPELINE_TEXT_BATCH_SIZE (25 papers with text
+per submit_text() task).
+
+A paper being processed is leased to the worker process doing it: processing_owner
+holds that process's id and processing_heartbeat is refreshed every
+PIPELINE_LEASE_SECONDS / 4 (default lease 120s) while it is in flight. Every worker
+runs resume() at startup and then once per heartbeat; it claims papers whose lease
+has expired (their worker crashed, was recycled or the server restarted) with a
+conditional UPDATE, so each is picked up by exactly one worker, and never while the
+worker processing it is alive.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Set, TypeVar
+
+from sqlalchemy import or_, update
+
+from app.core.dedup import find_extracted, fresh_summary, text_sha256
+from app.core.httpcache import touch_papers
+from app.core.ingest import EXTRACT_WORKERS, discard_process_pool, get_process_pool
+from app.core.insights import precompute as precompute_insights
+from app.core.metrics import Counter, stage
+from app.core.pdf_utils import extract_text_from_blob
+from app.core.providers import ProviderError, is_configured
+from app.core.ratelimit import current_user_id
+from app.db.database import SessionLocal
+from app.models.paper import Paper
+
+T = TypeVar("T")
+
+QUEUED = "queued"
+EXTRACTING = "extracting"
+CHUNKING = "chunking"
+EMBEDDING = "embedding"
+SUMMARIZING = "summarizing"
+READY = "ready"
+FAILED = "failed"
+
+# Optional stages (processing_stages); extraction and insights always run
+EMBED = "embed"
+SUMMARIZE = "summarize"
+
+CONCURRENCY = {
+    "extract": int(os.environ.get("PIPELINE_EXTRACT_CONCURRENCY", max(2, EXTRACT_WORKERS))),
+    "embed": int(os.environ.get("PIPELINE_EMBED_CONCURRENCY", "4")),
+    "summarize": int(os.environ.get("PIPELINE_SUMMARIZE_CONCURRENCY", "2")),
+}
+LEASE_SECONDS = float(os.environ.get("PIPELINE_LEASE_SECONDS", "120"))
+MAX_ATTEMPTS = int(os.environ.get("PIPELINE_MAX_ATTEMPTS", "3"))
+AUTO_SUMMARIZE = os.environ.get("PIPELINE_AUTO_SUMMARIZE", "true").lower() in ("1", "true", "yes")
+TEXT_BATCH_SIZE = int(os.environ.get("PIPELINE_TEXT_BATCH_SIZE", "25"))
+
+PIPELINE_RETRIES = Counter(
+    "papernest_pipeline_retries_total",
+    "Retried pipeline stages.",
+    ("stage",),
+)
+
+PIPELINE_OUTCOMES = Counter(
+    "papernest_pipeline_papers_total",
+    "Uploaded and bulk-imported papers by final processing state.",
+    ("state",),
+)
+
+_pools: Dict[str, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+_owner = (0, "")  # (pid, owner id) of this process
+_active: Set[int] = set()  # papers this process is processing
+_active_lock = threading.Lock()
+_heartbeat: Optional[threading.Thread] = None
+
+
+def owner_id() -> str:
+    """This process's processing_owner; a forked worker gets its own."""
+    global _owner
+    if _owner[0] != os.getpid():
+        _owner = (os.getpid(), uuid.uuid4().hex)
+    return _owner[1]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def queued(stages: Optional[str] = None) -> dict:
+    """
+    Column values for a paper queued (and so leased) by this worker, to run the
+    optional `stages`, comma-separated (default: all of them).
+    """
+    return {
+        "processing_state": QUEUED,
+        "processing_stages": stages,
+        "processing_owner": owner_id(),
+        "processing_heartbeat": _now(),
+    }
+
+
+def _wanted(stages: Optional[str]) -> Set[str]:
+    if stages is None:
+        return {EMBED, SUMMARIZE} if AUTO_SUMMARIZE else {EMBED}
+    return set(filter(None, stages.split(",")))
+
+
+def _pool(stage_name: str) -> ThreadPoolExecutor:
+    with _pools_lock:
+        if stage_name not in _pools:
+            _pools[stage_name] = ThreadPoolExecutor(
+                max_workers=CONCURRENCY[stage_name], thread_name_prefix=f"pipeline-{stage_name}"
+            )
+    return _pools[stage_name]
+
+
+def _set_state(paper_ids: List[int], state: str, error: Optional[str] = None, **values) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Paper).where(Paper.id.in_(paper_ids))
+            .values(processing_state=state, processing_error=error, processing_heartbeat=_now(), **values)
+        )
+        touch_papers(db, Paper.id.in_(paper_ids))
+        db.commit()
+    finally:
+        db.close()
+    if state in (READY, FAILED):
+        with _active_lock:
+            _active.difference_update(paper_ids)
+        PIPELINE_OUTCOMES.inc(len(paper_ids), state=state)
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, ProviderError):
+        return exc.retryable
+    return isinstance(exc, (OSError, BrokenProcessPool))
+
+
+def _attempt(stage_name: str, fn: Callable[[], T]) -> T:
+    """Run one stage, retrying transient failures with exponential backoff."""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            with stage(f"pipeline_{stage_name}"):
+                return fn()
+        except Exception as exc:
+            if attempt + 1 >= MAX_ATTEMPTS or not _retryable(exc):
+                raise
+            PIPELINE_RETRIES.inc(stage=stage_name)
+            time.sleep(min(30.0, 2.0 * (2 ** attempt)))
+    raise AssertionError("unreachable")
+
+
+def submit(paper_ids: List[int], user_id: int, pdf_key: str, stages: Optional[str] = None) -> None:
+    """
+    Queue papers (leased to this worker, see queued()) for processing. They share
+    the PDF `pdf_key`, which is extracted once for all of them.
+    """
+    with _active_lock:
+        _active.update(paper_ids)
+    _pool("extract").submit(_extract, paper_ids, user_id, pdf_key, stages)
+
+
+def submit_text(paper_ids: List[int], user_id: int, stages: Optional[str] = None) -> None:
+    """
+    Queue papers that already have their text (imported with it) for the stages after
+    extraction, as one task: their texts are loaded with one query and papers with the
+    same text are processed once. Callers with many papers submit TEXT_BATCH_SIZE at a time.
+    """
+    with _active_lock:
+        _active.update(paper_ids)
+    _pool("embed").submit(_index_stored, paper_ids, user_id, stages)
+
+
+def _index_stored(paper_ids: List[int], user_id: int, stages: Optional[str]) -> None:
+    db = SessionLocal()
+    try:
+        rows = db.query(Paper.id, Paper.paper_text).filter(Paper.id.in_(paper_ids)).order_by(Paper.id).all()
+    finally:
+        db.close()
+    by_text: Dict[Optional[str], List[int]] = {}
+    for paper_id, text in rows:
+        by_text.setdefault(text, []).append(paper_id)
+    for text, group in by_text.items():
+        _index(group, user_id, text, stages)
+
+
+def _extract_text(pdf_key: str) -> str:
+    pool = get_process_pool()  # pypdf is CPU-bound: keep it off the server's threads
+    if pool is None:
+        return extract_text_from_blob(pdf_key)
+    try:
+        return pool.submit(extract_text_from_blob, pdf_key).result()
+    except BrokenProcessPool:
+        discard_process_pool(pool)  # the retry gets a fresh pool
+        raise
+
+
+def _extract(paper_ids: List[int], user_id: int, pdf_key: str, stages: Optional[str]) -> None:
+    _set_state(paper_ids, EXTRACTING)
+    try:
+        text = _attempt("extract", lambda: _extract_text(pdf_key))
+    except Exception as exc:
+        _set_state(paper_ids, FAILED, f"Failed to process PDF: {exc}")
+        return
+    _set_state(paper_ids, CHUNKING, paper_text=text, text_sha256=text_sha256(text), content_sha256=pdf_key)
+    _pool("embed").submit(_index, paper_ids, user_id, text, stages)
+
+
+def _index(paper_ids: List[int], user_id: int, text: Optional[str], stages: Optional[str]) -> None:
+    from app.core.rag_utils import chunk_text, index_chunks, MAX_CHUNKS
+
+    current_user_id.set(user_id)  # charge provider usage to the uploader
+    errors: List[str] = []
+    try:
+        _attempt("insights", lambda: precompute_insights(text))
+    except Exception as exc:
+        errors.append(f"Insights failed: {exc}")
+    if text and EMBED in _wanted(stages) and is_configured("cohere"):
+        chunks = chunk_text(text, limit=MAX_CHUNKS)
+        _set_state(paper_ids, EMBEDDING)
+        try:
+            _attempt("embed", lambda: index_chunks(chunks))
+        except Exception as exc:
+            errors.append(f"Embedding failed: {exc}")
+    _pool("summarize").submit(_summarize, paper_ids, user_id, text, errors, stages)
+
+
+def _summarize(paper_ids: List[int], user_id: int, text: Optional[str], errors: List[str],
+               stages: Optional[str]) -> None:
+    from app.core.summarizer import summarize_text
+
+    current_user_id.set(user_id)
+    if not (text and SUMMARIZE in _wanted(stages) and (is_configured("groq") or is_configured("cohere"))):
+        _set_state(paper_ids, READY, "; ".join(errors) or None)
+        return
+    _set_state(paper_ids, SUMMARIZING, "; ".join(errors) or None)
+    db = SessionLocal()
+    try:
+        # Same text already summarized elsewhere (e.g. a re-saved copy of the PDF)
+        donor = find_extracted(db, text_hash=text_sha256(text), exclude_id=paper_ids[0])
+        summary = fresh_summary(donor) if donor is not None else None
+    finally:
+        db.close()
+    if summary is None:
+        try:
+            summary = _attempt("summarize", lambda: summarize_text(text))
+        except Exception as exc:
+            errors.append(f"Summarization failed: {exc}")
+            _set_state(paper_ids, READY, "; ".join(errors))
+            return
+    # If the text was edited meanwhile, the summary is stale from the start
+    text_hash = text_sha256(text)
+    _set_state(paper_ids, READY, "; ".join(errors) or None, summary=summary,
+               summary_stale=or_(Paper.text_sha256.is_(None), Paper.text_sha256 != text_hash))
+
+
+def resume() -> int:
+    """Re-queue papers whose processing was interrupted: those whose lease has expired."""
+    now = _now()
+    expired = or_(
+        Paper.processing_heartbeat.is_(None),
+        Paper.processing_heartbeat < now - timedelta(seconds=LEASE_SECONDS),
+    )
+    db = SessionLocal()
+    try:
+        rows = db.query(Paper.id, Paper.user_id, Paper.pdf_sha256, Paper.processing_stages).filter(
+            Paper.processing_state.notin_((READY, FAILED)),
+            or_(Paper.pdf_sha256.isnot(None), Paper.paper_text.isnot(None)),
+            expired,
+        ).all()
+        claimed = []
+        for paper_id, user_id, pdf_key, stages in rows:
+            # Another worker may have claimed it since the SELECT
+            result = db.execute(
+                update(Paper).where(Paper.id == paper_id, expired)
+                .values(processing_owner=owner_id(), processing_heartbeat=now)
+            )
+            db.commit()
+            if result.rowcount == 1:
+                claimed.append((paper_id, user_id, pdf_key, stages))
+    finally:
+        db.close()
+    for paper_id, user_id, pdf_key, stages in claimed:
+        if pdf_key is not None:
+            submit([paper_id], user_id, pdf_key, stages)
+        else:
+            submit_text([paper_id], user_id, stages)
+    return len(claimed)
+
+
+def _renew_leases() -> None:
+    with _active_lock:
+        paper_ids = list(_active)
+    if not paper_ids:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Paper).where(Paper.id.in_(paper_ids), Paper.processing_owner == owner_id())
+            .values(processing_heartbeat=_now())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _heartbeat_loop() -> None:
+    while True:
+        time.sleep(LEASE_SECONDS / 4)
+        try:
+            _renew_leases()
+            resumed = resume()
+        except Exception as exc:
+            print(f"⚠️ Pipeline heartbeat failed: {exc}")
+            continue
+        if resumed:
+            print(f"⏳ Took over processing of {resumed} papers from a stopped worker")
+
+
+def start() -> int:
+    """Resume interrupted papers and keep this worker's leases alive. Returns the number resumed."""
+    global _heartbeat
+    resumed = resume()
+    if _heartbeat is None or not _heartbeat.is_alive():
+        _heartbeat = threading.Thread(target=_heartbeat_loop, name="pipeline-heartbeat", daemon=True)
+        _heartbeat.start()
+    return resumed
@@ -0,0 +1,235 @@
+"""
+Speculative prefetch of paper embeddings and summaries.
+
+Users chat about the papers they are reading. Without prefetching, the first chat
+turn on a paper pays for building its index: chunk embeddings are fetched from the
+chunk store (or Cohere) and written to the embedding cache. The prefetcher does that
+work ahead of time, along with missing summaries, for papers that are likely to be
+opened next:
+  - a paper moved to READING or HIGH priority (PATCH /papers/{id}, PATCH /papers/bulk);
+  - when a user is active (lists their papers), their PREFETCH_PER_USER most recently
+    updated READING / HIGH papers, at most once per PREFETCH_ACTIVITY_INTERVAL seconds.
+
+Speculation is bounded in several ways:
+  - PREFETCH_CONCURRENCY background threads (default 2), and at most PREFETCH_MAX_QUEUED
+    papers waiting (default 100; further requests are dropped).
+  - A global daily budget of PREFETCH_DAILY_EMBEDDING_CALLS (default 200) and
+    PREFETCH_DAILY_LLM_TOKENS (default 100000). It is tracked with the rate limiter's
+    backend, so it is shared across workers when RATE_LIMIT_REDIS_URL is set.
+  - Work is charged to the paper's owner, and is skipped once they have used
+    PREFETCH_USER_BUDGET_SHARE (default 0.5) of either daily budget. Speculation never
+    uses up what the user needs for their own requests.
+PREFETCH=off disables it; PREFETCH_SUMMARIES=false only warms embeddings.
+
+Metrics: papernest_prefetch_tasks_total{kind, outcome}. When a chat's first turn
+finds an index the prefetcher built, it increments papernest_prefetch_used_total and
+adds the build time the user did not wait for to papernest_prefetch_saved_seconds_total.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import or_, update
+
+from app.core import embedcache, hostcache
+from app.core.dedup import find_extracted, fresh_summary
+from app.core.httpcache import touch_papers
+from app.core.metrics import Counter
+from app.core.providers import is_configured
+from app.core.rag_utils import EMBED_MODEL, chunk_key, paper_index
+from app.core.ratelimit import add_usage_today, current_user_id, daily_budgets, usage_today
+from app.db.database import SessionLocal
+from app.models.paper import Paper, PriorityEnum, StatusEnum
+
+ENABLED = os.environ.get("PREFETCH", "on").lower() not in ("0", "off", "false", "no")
+PREFETCH_SUMMARIES = os.environ.get("PREFETCH_SUMMARIES", "true").lower() in ("1", "true", "yes")
+CONCURRENCY = int(os.environ.get("PREFETCH_CONCURRENCY", "2"))
+MAX_QUEUED = int(os.environ.get("PREFETCH_MAX_QUEUED", "100"))
+PER_USER = int(os.environ.get("PREFETCH_PER_USER", "5"))
+ACTIVITY_INTERVAL = float(os.environ.get("PREFETCH_ACTIVITY_INTERVAL", "300"))
+USER_BUDGET_SHARE = float(os.environ.get("PREFETCH_USER_BUDGET_SHARE", "0.5"))
+DAILY_BUDGETS = {
+    "embedding_calls": int(os.environ.get("PREFETCH_DAILY_EMBEDDING_CALLS", "200")),
+    "llm_tokens": int(os.environ.get("PREFETCH_DAILY_LLM_TOKENS", "100000")),
+}
+MARKER_TTL = 7 * 24 * 3600
+
+PREFETCH_TASKS = Counter(
+    "papernest_prefetch_tasks_total",
+    "Speculative prefetch work by kind (embeddings, summary) and outcome.",
+    ("kind", "outcome"),
+)
+PREFETCH_USED = Counter(
+    "papernest_prefetch_used_total",
+    "Chat first turns that found a paper index built by the prefetcher.",
+)
+PREFETCH_SAVED = Counter(
+    "papernest_prefetch_saved_seconds_total",
+    "Index build time the prefetcher took off chat first turns.",
+)
+
+_pool: Optional[ThreadPoolExecutor] = None
+_queued: Set[int] = set()
+_last_activity: Dict[int, float] = {}
+_lock = threading.Lock()
+
+LIKELY_OPENED = or_(Paper.status == StatusEnum.READING, Paper.priority == PriorityEnum.HIGH)
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix="prefetch")
+    return _pool
+
+
+def schedule(paper_ids: Iterable[int]) -> None:
+    """Queue papers for warming (duplicates and overflow beyond PREFETCH_MAX_QUEUED are dropped)."""
+    if not ENABLED:
+        return
+    for paper_id in paper_ids:
+        with _lock:
+            if paper_id in _queued:
+                continue
+            if len(_queued) >= MAX_QUEUED:
+                PREFETCH_TASKS.inc(kind="paper", outcome="dropped")
+                continue
+            _queued.add(paper_id)
+        _executor().submit(_run, paper_id)
+
+
+def likely_opened(changes: dict) -> bool:
+    """Whether a paper update makes it a prefetch candidate."""
+    return changes.get("status") == StatusEnum.READING or changes.get("priority") == PriorityEnum.HIGH
+
+
+def on_activity(user_id: int) -> None:
+    """A user is active: warm their likely next papers (throttled per user)."""
+    if not ENABLED:
+        return
+    now = time.monotonic()
+    with _lock:
+        if now - _last_activity.get(user_id, float("-inf")) < ACTIVITY_INTERVAL:
+            return
+        _last_activity[user_id] = now
+    _executor().submit(_schedule_candidates, user_id)
+
+
+def _schedule_candidates(user_id: int) -> None:
+    db = SessionLocal()
+    try:
+        ids = [paper_id for (paper_id,) in db.query(Paper.id).filter(
+            Paper.user_id == user_id,
+            LIKELY_OPENED,
+            Paper.paper_text.isnot(None),
+        ).order_by(Paper.updated_at.desc().nullslast(), Paper.created_at.desc()).limit(PER_USER)]
+    finally:
+        db.close()
+    schedule(ids)
+
+
+def _over_budget(user_id: int, kind: str) -> bool:
+    if usage_today(f"prefetch:{kind}") >= DAILY_BUDGETS[kind]:
+        return True
+    return usage_today(f"{user_id}:{kind}") >= USER_BUDGET_SHARE * daily_budgets()[kind]
+
+
+def _charge(user_id: int, kind: str, before: int) -> None:
+    """Count what the user's usage grew by towards the global prefetch budget."""
+    spent = usage_today(f"{user_id}:{kind}") - before
+    if spent > 0:
+        add_usage_today(f"prefetch:{kind}", spent)
+
+
+def _marker(text: str) -> str:
+    return f"prefetched:{EMBED_MODEL}-{chunk_key(text)}"
+
+
+def record_use(text: str) -> None:
+    """Called on chat turns: credit the prefetcher if it built this paper's index."""
+    if not ENABLED:
+        return
+    marker = _marker(text)
+    built_in = hostcache.get(marker, cache="prefetch_markers")
+    if built_in is None:
+        return
+    hostcache.delete(marker)  # only the first turn counts
+    PREFETCH_USED.inc()
+    PREFETCH_SAVED.inc(float(built_in))
+
+
+def _run(paper_id: int) -> None:
+    try:
+        _warm(paper_id)
+    except Exception as e:
+        PREFETCH_TASKS.inc(kind="paper", outcome="failed")
+        print(f"⚠️ Prefetch of paper {paper_id} failed: {e}")
+    finally:
+        with _lock:
+            _queued.discard(paper_id)
+
+
+def _warm(paper_id: int) -> None:
+    db = SessionLocal()
+    try:
+        paper = db.query(Paper.user_id, Paper.paper_text, Paper.summary, Paper.summary_stale,
+                         Paper.text_sha256).filter(Paper.id == paper_id).first()
+    finally:
+        db.close()
+    if paper is None or not paper.paper_text:
+        return
+    user_id, text = paper.user_id, paper.paper_text
+    current_user_id.set(user_id)  # provider usage is charged to the paper's owner
+
+    # Embeddings: build the paper's index in the embedding cache
+    if embedcache.exists(f"{EMBED_MODEL}-{chunk_key(text)}"):
+        PREFETCH_TASKS.inc(kind="embeddings", outcome="cached")
+    elif not is_configured("cohere"):
+        PREFETCH_TASKS.inc(kind="embeddings", outcome="unavailable")
+    elif _over_budget(user_id, "embedding_calls"):
+        PREFETCH_TASKS.inc(kind="embeddings", outcome="over_budget")
+    else:
+        before = usage_today(f"{user_id}:embedding_calls")
+        started = time.perf_counter()
+        paper_index(text)
+        hostcache.set(_marker(text), str(time.perf_counter() - started).encode(), ttl=MARKER_TTL)
+        _charge(user_id, "embedding_calls", before)
+        PREFETCH_TASKS.inc(kind="embeddings", outcome="warmed")
+
+    # Summary: generate it if missing or outdated, so it is on screen when the paper is opened
+    if not PREFETCH_SUMMARIES or not paper.text_sha256 or (paper.summary and not paper.summary_stale):
+        return
+    if not (is_configured("groq") or is_configured("cohere")):
+        PREFETCH_TASKS.inc(kind="summary", outcome="unavailable")
+        return
+    if _over_budget(user_id, "llm_tokens"):
+        PREFETCH_TASKS.inc(kind="summary", outcome="over_budget")
+        return
+    _prefetch_summary(paper_id, user_id, text, paper.text_sha256)
+
+
+def _prefetch_summary(paper_id: int, user_id: int, text: str, text_hash: str) -> None:
+    from app.core.summarizer import summarize_text
+
+    db = SessionLocal()
+    try:
+        donor = find_extracted(db, text_hash=text_hash, exclude_id=paper_id)
+        summary = fresh_summary(donor) if donor is not None else None
+        if summary is None:
+            before = usage_today(f"{user_id}:llm_tokens")
+            summary = summarize_text(text)
+            _charge(user_id, "llm_tokens", before)
+        # Only if the text is still the one summarized
+        result = db.execute(
+            update(Paper).where(Paper.id == paper_id, Paper.text_sha256 == text_hash)
+            .values(summary=summary, summary_stale=False)
+        )
+        if result.rowcount:
+            touch_papers(db, Paper.id == paper_id)
+        db.commit()
+    finally:
+        db.close()
+    PREFETCH_TASKS.inc(kind="summary", outcome="warmed")
@@ -0,0 +1,351 @@
+"""
+Shared, resilient layer for external AI providers (Groq, Cohere).
+
+Every outbound call goes through a Provider, which gives it:
+  - a process-wide client with a pooled HTTP connection (built once, reused)
+  - a per-call deadline (the remaining budget is passed down as the HTTP timeout)
+  - jittered exponential-backoff retries on timeouts, 429s and 5xx responses
+  - a circuit breaker that fails fast while the provider is unhealthy
+  - a semaphore bounding in-flight requests so a degraded provider cannot
+    tie up every worker thread
+
+Failures surface as ProviderError subclasses, which app.main maps to HTTP 502/503/504.
+
+Calls made while handling a request with a deadline (app/core/deadlines.py) are also
+limited to the request's remaining time, and are not started (nor retried) once the
+request has been cancelled or its deadline has passed.
+
+Configuration (environment variables, per provider prefix GROQ_ / COHERE_):
+  <P>_BASE_URL, <P>_TIMEOUT_SECONDS, <P>_MAX_RETRIES, <P>_MAX_CONCURRENCY,
+  <P>_QUEUE_TIMEOUT_SECONDS, <P>_CIRCUIT_FAILURE_THRESHOLD, <P>_CIRCUIT_RESET_SECONDS
+"""
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+from dotenv import load_dotenv
+
+from app.core import deadlines
+from app.core.metrics import Counter, EXTERNAL_API_ERRORS
+
+load_dotenv()
+
+T = TypeVar("T")
+
+PROVIDER_RETRIES = Counter(
+    "papernest_external_api_retries_total",
+    "Retried calls to external AI providers.",
+    ("provider",),
+)
+
+PROVIDER_REJECTIONS = Counter(
+    "papernest_external_api_rejections_total",
+    "Calls rejected locally (circuit open or concurrency limit reached).",
+    ("provider", "reason"),
+)
+
+UPSTREAM_ABANDONED = Counter(
+    "papernest_upstream_calls_abandoned_total",
+    "Calls for abandoned requests: not started (skipped), or answered after the client left (late).",
+    ("provider", "outcome"),
+)
+
+
+class ProviderError(Exception):
+    """An external AI provider call failed."""
+    status_code = 502
+
+    def __init__(self, provider: str, message: str, retryable: bool = False):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        # True when the provider (not the request) was at fault, i.e. another model/provider may succeed
+        self.retryable = retryable
+
+
+class ProviderUnavailableError(ProviderError):
+    """Provider is failing fast (circuit open) or saturated (too many in-flight calls)."""
+    status_code = 503
+
+    def __init__(self, provider: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(provider, message, retryable=True)
+        self.retry_after = retry_after
+
+
+class ProviderTimeoutError(ProviderError):
+    """Provider did not answer within the call's deadline."""
+    status_code = 504
+
+    def __init__(self, provider: str, message: str):
+        super().__init__(provider, message, retryable=True)
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _is_timeout(exc: Exception) -> bool:
+    return "Timeout" in type(exc).__name__ or isinstance(exc, TimeoutError)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """Timeouts, connection failures, 429s and 5xx responses are worth retrying."""
+    status_code = getattr(exc, "status_code", None)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    name = type(exc).__name__
+    return _is_timeout(exc) or "Connection" in name or "Transport" in name
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+    Opens after `failure_threshold` consecutive failures, lets a single probe through
+    after `reset_timeout` seconds and closes again when it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def cancel_probe(self) -> None:
+        """Give back a half-open probe slot that was never used."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class Provider:
+    """Deadline, retry, circuit-breaker and concurrency policy for one provider."""
+
+    def __init__(self, name: str, timeout: float, max_retries: int, max_concurrency: int,
+                 failure_threshold: int, reset_timeout: float, queue_timeout: float = 5.0,
+                 backoff_base: float = 0.25, backoff_max: float = 4.0):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.queue_timeout = queue_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # One breaker per key (e.g. model), since providers rate-limit and fail per model
+        self._breakers = {"": CircuitBreaker(failure_threshold, reset_timeout)}
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    @classmethod
+    def from_env(cls, name: str, timeout: float, max_concurrency: int) -> "Provider":
+        prefix = name.upper()
+        return cls(
+            name=name,
+            timeout=_env_float(f"{prefix}_TIMEOUT_SECONDS", timeout),
+            max_retries=int(_env_float(f"{prefix}_MAX_RETRIES", 2)),
+            max_concurrency=int(_env_float(f"{prefix}_MAX_CONCURRENCY", max_concurrency)),
+            failure_threshold=int(_env_float(f"{prefix}_CIRCUIT_FAILURE_THRESHOLD", 5)),
+            reset_timeout=_env_float(f"{prefix}_CIRCUIT_RESET_SECONDS", 30),
+            queue_timeout=_env_float(f"{prefix}_QUEUE_TIMEOUT_SECONDS", 5),
+        )
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._breakers[""]
+
+    def breaker_for(self, key: str = "") -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers.setdefault(key, CircuitBreaker(self.failure_threshold, self.reset_timeout))
+        return breaker
+
+    def reset(self) -> None:
+        """Close every circuit breaker (used by tooling and benchmarks)."""
+        for breaker in self._breakers.values():
+            breaker.record_success()
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def call(self, fn: Callable[[float], T], timeout: Optional[float] = None, key: str = "") -> T:
+        """
+        Run `fn(timeout_seconds)` under this provider's policy.
+        `timeout` is the overall deadline for the call including retries
+        (defaults to the provider's configured timeout); `key` selects the
+        circuit breaker (e.g. the model name). Within a request that has a deadline,
+        the call is also bounded by the request's remaining time.
+        """
+        budget = timeout if timeout is not None else self.timeout
+        request = deadlines.current()
+        limited_by_request = False
+        if request is not None:
+            self._check_request(request)
+            # Timing out at the request's deadline says nothing about the provider's health
+            limited_by_request = request.remaining() < budget
+            budget = min(budget, request.remaining())
+        deadline = time.monotonic() + budget
+        breaker = self.breaker_for(key)
+
+        if not breaker.allow():
+            PROVIDER_REJECTIONS.inc(provider=self.name, reason="circuit_open")
+            raise ProviderUnavailableError(
+                self.name, f"circuit open after repeated failures {key}".rstrip(), retry_after=breaker.retry_after()
+            )
+
+        # Wait briefly for a free slot rather than queueing behind a hung provider
+        if not self._slots.acquire(timeout=max(0.0, min(self.queue_timeout, deadline - time.monotonic()))):
+            PROVIDER_REJECTIONS.inc(provider=self.name, reason="concurrency_limit")
+            breaker.cancel_probe()
+            raise ProviderUnavailableError(self.name, "too many in-flight requests", retry_after=1.0)
+
+        try:
+            attempt = 0
+            while True:
+                if request is not None:
+                    try:
+                        self._check_request(request)
+                    except deadlines.RequestAbandoned:
+                        breaker.cancel_probe()
+                        raise
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    breaker.record_failure()
+                    raise ProviderTimeoutError(self.name, "deadline exceeded")
+                try:
+                    result = fn(remaining)
+                except Exception as exc:
+                    EXTERNAL_API_ERRORS.inc(provider=self.name)
+                    if not _is_retryable(exc):
+                        # Client-side errors (bad request, auth) say nothing about provider health
+                        breaker.record_success()
+                        raise ProviderError(self.name, str(exc)) from exc
+                    if limited_by_request and _is_timeout(exc):
+                        breaker.cancel_probe()
+                        raise deadlines.DeadlineExceeded(f"request deadline of {request.seconds:g}s exceeded") from exc
+                    pause = self._backoff(attempt)
+                    if attempt >= self.max_retries or time.monotonic() + pause >= deadline:
+                        breaker.record_failure()
+                        if _is_timeout(exc):
+                            raise ProviderTimeoutError(self.name, str(exc)) from exc
+                        raise ProviderError(self.name, str(exc), retryable=True) from exc
+                    attempt += 1
+                    PROVIDER_RETRIES.inc(provider=self.name)
+                    if request is not None:
+                        try:
+                            request.sleep(pause)
+                        except deadlines.RequestCancelled:
+                            UPSTREAM_ABANDONED.inc(provider=self.name, outcome="skipped")
+                            breaker.cancel_probe()
+                            raise
+                    else:
+                        time.sleep(pause)
+                    continue
+                breaker.record_success()
+                if request is not None and request.cancelled:
+                    UPSTREAM_ABANDONED.inc(provider=self.name, outcome="late")
+                return result
+        finally:
+            self._slots.release()
+
+    def _check_request(self, request: "deadlines.Deadline") -> None:
+        try:
+            request.check()
+        except deadlines.RequestAbandoned:
+            UPSTREAM_ABANDONED.inc(provider=self.name, outcome="skipped")
+            raise
+
+
+groq_provider = Provider.from_env("groq", timeout=60.0, max_concurrency=8)
+cohere_provider = Provider.from_env("cohere", timeout=15.0, max_concurrency=8)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def is_configured(provider: str) -> bool:
+    """Whether credentials for `provider` are available."""
+    return bool(os.environ.get(f"{provider.upper()}_API_KEY"))
+
+
+def get_groq_client():
+    """Process-wide Groq client (pooled connections; retries handled by groq_provider)."""
+    client = _clients.get("groq")
+    if client is not None:
+        return client
+    from groq import Groq
+
+    api_key = os.environ.get("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("GROQ_API_KEY environment variable not set")
+    with _clients_lock:
+        if "groq" not in _clients:
+            _clients["groq"] = Groq(
+                api_key=api_key,
+                base_url=os.environ.get("GROQ_BASE_URL") or None,
+                timeout=groq_provider.timeout,
+                max_retries=0,
+            )
+    return _clients["groq"]
+
+
+def get_cohere_client():
+    """Process-wide Cohere client (pooled connections; retries handled by cohere_provider)."""
+    client = _clients.get("cohere")
+    if client is not None:
+        return client
+    try:
+        import cohere
+    except ImportError:
+        raise ImportError("Please install cohere: pip install cohere")
+
+    api_key = os.environ.get("COHERE_API_KEY")
+    if not api_key:
+        raise ValueError("COHERE_API_KEY environment variable not set")
+    with _clients_lock:
+        if "cohere" not in _clients:
+            _clients["cohere"] = cohere.Client(
+                api_key,
+                base_url=os.environ.get("COHERE_BASE_URL") or None,
+                timeout=cohere_provider.timeout,
+                max_retries=0,
+            )
+    return _clients["cohere"]
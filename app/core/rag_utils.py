@@ -1,98 +1,245 @@
-import os
+import re
+import zlib
+from itertools import islice
 import numpy as np
-from typing import List, Tuple
-from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 
+from app.core import embedcache, hostcache
+from app.core.dedup import text_digest
+from app.core.insights import section_bias
+from app.core.metrics import stage, CACHE_HITS, CACHE_MISSES, TOKENS_CONSUMED
+from app.core.tracing import traced
+from app.core.providers import get_cohere_client, cohere_provider
+from app.core.ratelimit import record_usage
+from app.db.database import SessionLocal, insert_ignore_conflicts
+from app.models.embedding import ChunkEmbedding
+
 # Load environment variables
 load_dotenv()
 
-def get_cohere_client():
-    """Get Cohere client for embeddings"""
+def _record_embed_usage(response) -> None:
+    """Count billed embedding tokens, if Cohere reported them."""
     try:
-        import cohere
-    except ImportError:
-        raise ImportError("Please install cohere: pip install cohere")
-    
-    api_key = os.environ.get("COHERE_API_KEY")
-    if not api_key:
-        raise ValueError("COHERE_API_KEY environment variable not set")
-    
-    return cohere.Client(api_key)
+        tokens = response.meta.billed_units.input_tokens
+    except AttributeError:
+        return
+    if tokens:
+        TOKENS_CONSUMED.inc(tokens, provider="cohere", kind="prompt")
+
+EMBED_MODEL = 'embed-english-light-v3.0'  # Lightweight, fast, free tier friendly
+
+# Limit to first 15 chunks (Cohere can handle more than local models)
+MAX_CHUNKS = 15
+
+# Query embeddings are kept in the host cache (shared by all workers) this long
+QUERY_EMBED_TTL = 24 * 3600
+
+def _embed(texts: List[str], input_type: str, stage_name: str) -> np.ndarray:
+    client = get_cohere_client()
+    with stage(stage_name):
+        response = cohere_provider.call(
+            lambda timeout: client.embed(
+                texts=texts,
+                model=EMBED_MODEL,
+                input_type=input_type,
+                request_options={"timeout_in_seconds": timeout, "max_retries": 0}
+            )
+        )
+    _record_embed_usage(response)
+    record_usage(embedding_calls=1)
+    return np.array(response.embeddings)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\S+\s*|\s+")
+# The lines of str.splitlines(keepends=True), without building the whole list
+_LINE = re.compile(r"[^\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]*(?:\r\n|[\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029])"
+                   r"|[^\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]+")
+
+def _text_units(text: str, max_size: int):
+    """Lines; long lines split into sentences, and long sentences into words."""
+    for match in _LINE.finditer(text):
+        line = match.group()
+        if len(line) <= max_size // 4:
+            yield line
+            continue
+        start = 0
+        for match in _SENTENCE_END.finditer(line):
+            yield from _split_words(line[start:match.end()], max_size)
+            start = match.end()
+        yield from _split_words(line[start:], max_size)
 
-def chunk_text(text: str, chunk_size: int = 2000, overlap: int = 200) -> List[str]:
+def _split_words(piece: str, max_size: int):
+    if len(piece) <= max_size // 4:
+        if piece:
+            yield piece
+        return
+    for match in _WORD.finditer(piece):
+        word = match.group()
+        for start in range(0, len(word), max_size):
+            yield word[start:start + max_size]
+
+def iter_chunk_spans(text: str, chunk_size: int = 2000, overlap: int = 200) -> Iterator[Tuple[int, int]]:
     """
-    Split text into chunks with overlap.
+    (start, end) offsets of the chunks of `text`, lazily: chunks of roughly `chunk_size`
+    characters, each starting with the last `overlap` characters of the previous one.
+
+    Boundaries are content-defined: a chunk ends (once at least half full) after a
+    line, sentence or word whose checksum hits a fixed pattern, rather than every
+    `chunk_size` characters. An edit therefore only changes the chunks around it
+    instead of shifting every boundary after it, so re-embedding an edited paper
+    only embeds the chunks that actually changed.
     """
     if not text:
-        return []
-    
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start = end - overlap
-    return chunks
-
-@lru_cache(maxsize=5)
-def generate_embeddings_cached(text_hash: int, text_content: str) -> Tuple[np.ndarray, List[str]]:
+        return
+    min_size, max_size = chunk_size // 2, chunk_size * 3 // 2
+    start = end = 0  # body of the current chunk: text[start:end]
+    tail = 0         # length of the overlap taken from the previous body
+    previous = b""
+    for unit in _text_units(text, max_size):
+        if end > start and end - start + len(unit) > max_size:
+            yield start - tail, end
+            tail = min(overlap, end - start)
+            start = end
+        end += len(unit)
+        # Checksum over this unit and the one before it; anchors with probability
+        # len(unit) / (chunk_size / 2), so chunks average about chunk_size
+        encoded = unit.encode("utf-8")
+        checksum = zlib.crc32(encoded, zlib.crc32(previous))
+        previous = encoded
+        if end - start >= min_size and checksum * (chunk_size // 2) < len(unit) << 32:
+            yield start - tail, end
+            tail = min(overlap, end - start)
+            start = end
+    if end > start:
+        yield start - tail, end
+
+def chunk_text(text: str, chunk_size: int = 2000, overlap: int = 200,
+               limit: Optional[int] = None) -> List[str]:
     """
-    Generate embeddings using Cohere API.
-    Cached by hash of the text to speed up multi-turn chat.
-    Returns (embeddings_matrix, chunks_list)
+    The first `limit` (default all) chunks of `text` (see iter_chunk_spans); the
+    rest of the text is not scanned.
     """
-    chunks = chunk_text(text_content)
-    # Limit to first 15 chunks (Cohere can handle more than local models)
-    chunks = chunks[:15]
-    
-    client = get_cohere_client()
-    
-    # Get embeddings from Cohere API
-    response = client.embed(
-        texts=chunks,
-        model='embed-english-light-v3.0',  # Lightweight, fast, free tier friendly
-        input_type='search_document'
-    )
-    
-    # Convert to numpy array
-    embeddings = np.array(response.embeddings)
-    
-    return embeddings, chunks
+    with stage("chunking"):
+        return [text[start:end] for start, end in islice(iter_chunk_spans(text, chunk_size, overlap), limit)]
+
+def chunk_key(chunk: str) -> str:
+    return text_digest(chunk)
 
-def retrieve_context(paper_text: str, query: str, top_k: int = 7) -> str:
+def _fetch_or_embed(chunks: List[str]) -> Tuple[List[str], Dict[str, np.ndarray], int]:
+    """
+    Embeddings for `chunks` from the persistent chunk_embeddings store; only chunks
+    never seen before (by any paper or user) are sent to Cohere.
+    Returns (chunk keys, {key: float32 vector}, number of chunks newly embedded).
+    """
+    keys = [chunk_key(c) for c in chunks]
+    db = SessionLocal()
+    try:
+        rows = db.query(ChunkEmbedding.chunk_sha256, ChunkEmbedding.embedding).filter(
+            ChunkEmbedding.model == EMBED_MODEL,
+            ChunkEmbedding.chunk_sha256.in_(set(keys))
+        ).all()
+        found = {key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows}
+        
+        missing = {}
+        for key, chunk in zip(keys, chunks):
+            if key not in found:
+                missing.setdefault(key, chunk)
+        if found:
+            CACHE_HITS.inc(len(found), cache="embedding_store")
+        if missing:
+            CACHE_MISSES.inc(len(missing), cache="embedding_store")
+            vectors = _embed(list(missing.values()), 'search_document', "document_embedding").astype(np.float32)
+            new_rows = []
+            for key, vector in zip(missing, vectors):
+                found[key] = vector
+                new_rows.append({
+                    "chunk_sha256": key, "model": EMBED_MODEL,
+                    "dim": vector.shape[0], "embedding": vector.tobytes(),
+                })
+            # Another worker may have stored the same chunk meanwhile; first write wins
+            db.execute(insert_ignore_conflicts(ChunkEmbedding), new_rows)
+            db.commit()
+    finally:
+        db.close()
+    return keys, found, len(missing)
+
+def embed_chunks(chunks: List[str]) -> np.ndarray:
+    """
+    Document embeddings for `chunks` as a float32 matrix, served from the
+    persistent store where possible.
+    """
+    keys, found, _ = _fetch_or_embed(chunks)
+    return np.vstack([found[k] for k in keys])
+
+def index_paper_text(text_content: str) -> Tuple[int, int]:
+    """
+    Precompute and store embeddings for a paper (used at ingest time and after text
+    edits, bypassing the embedding cache so bulk imports don't evict papers users are
+    chatting with). Only chunks not already in the store are embedded.
+    Returns (chunks in the paper, chunks newly embedded).
+    """
+    return index_chunks(chunk_text(text_content, limit=MAX_CHUNKS))
+
+def index_chunks(chunks: List[str]) -> Tuple[int, int]:
+    """index_paper_text() for already chunked text."""
+    if not chunks:
+        return 0, 0
+    _, _, embedded = _fetch_or_embed(chunks)
+    return len(chunks), embedded
+
+@traced("build_paper_index")  # span covers cache misses only; hits are counted in /metrics
+def _build_paper_index(text_content: str, key: str) -> embedcache.PaperIndex:
+    with stage("chunking"):
+        spans = list(islice(iter_chunk_spans(text_content), MAX_CHUNKS))
+    chunks = [text_content[start:end] for start, end in spans]
+    # Get embeddings from the store, or from Cohere API for unseen chunks
+    embeddings = embed_chunks(chunks)
+    return embedcache.store(key, embeddings, np.array(spans, dtype=np.int64).reshape(-1, 2))
+
+def paper_index(text_content: str) -> embedcache.PaperIndex:
+    """
+    Chunk embeddings of a paper: memory-mapped from the host's embedding cache
+    (app/core/embedcache.py), or built from the persistent chunk store / Cohere API
+    and written there for every worker to share.
+    """
+    key = f"{EMBED_MODEL}-{chunk_key(text_content)}"
+    return embedcache.load(key) or _build_paper_index(text_content, key)
+
+def embed_query(query: str) -> np.ndarray:
+    """L2-normalized query embedding (1 x dim, float32), shared between workers through the host cache."""
+    key = f"query-normalized:{EMBED_MODEL}:{chunk_key(query)}"
+    cached = hostcache.get_array(key, cache="query_embeddings")
+    if cached is not None:
+        return cached
+    vector = embedcache.normalize(_embed([query], 'search_query', "query_embedding"))
+    hostcache.set_array(key, vector, ttl=QUERY_EMBED_TTL)
+    return vector
+
+@traced("retrieve_context")
+def retrieve_context(paper_text: str, query: str, top_k: int = 7,
+                     sections: Optional[List[dict]] = None) -> str:
     """
     Retrieve relevant chunks for a query from the paper text using Cohere embeddings.
+    With the paper's section outline (app/core/insights.py), chunks in sections the
+    query names are preferred.
     """
     if not paper_text or not query:
         return ""
 
-    # Generate or get cached embeddings for document
-    embeddings, chunks = generate_embeddings_cached(hash(paper_text), paper_text)
+    # Mapped (or freshly computed) embeddings for the document
+    index = paper_index(paper_text)
     
     # Get query embedding
-    client = get_cohere_client()
-    query_response = client.embed(
-        texts=[query],
-        model='embed-english-light-v3.0',
-        input_type='search_query'
-    )
-    query_embedding = np.array(query_response.embeddings)
-    
-    # Calculate cosine similarity
-    # Normalize vectors
-    embeddings_norm = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
-    query_norm = query_embedding / np.linalg.norm(query_embedding, axis=1, keepdims=True)
+    query_embedding = embed_query(query)[0]
     
-    # Compute similarities
-    similarities = np.dot(embeddings_norm, query_norm.T).flatten()
-    
-    # Get top k indices
-    top_indices = np.argsort(similarities)[-top_k:][::-1]
+    with stage("similarity_search"):
+        # Cosine similarity: document rows and the query are stored normalized
+        bias = section_bias(index.spans, sections, query) if sections else None
+        top_indices = index.search(query_embedding, top_k, bias)
     
     # Construct context
-    context_chunks = [chunks[i] for i in top_indices]
+    context_chunks = index.chunk_texts(paper_text, top_indices)
     
     return "\n\n".join(context_chunks)
 
-
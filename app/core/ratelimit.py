@@ -0,0 +1,305 @@
+"""
+Per-user rate limiting and daily AI budgets.
+
+- Token buckets per (user, endpoint): RATE_LIMIT_<ENDPOINT>="<requests>/<second|minute|hour>",
+  e.g. RATE_LIMIT_CHAT="20/minute". Capacity (burst) equals <requests>.
+- Daily budgets per user (UTC day): DAILY_LLM_TOKEN_BUDGET and DAILY_EMBEDDING_CALL_BUDGET.
+  Usage is recorded by the routing / RAG layers against the user of the current request.
+
+State lives in process memory by default. Set RATE_LIMIT_REDIS_URL to share it across
+workers (requires `pip install redis`).
+"""
+import heapq
+import os
+import threading
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, status
+
+from app.core.dependencies import get_current_user
+from app.core.metrics import Counter
+from app.models.user import User
+
+load_dotenv()
+
+RATE_LIMITED = Counter(
+    "papernest_rate_limited_total",
+    "Requests rejected by per-user rate limits or daily budgets.",
+    ("endpoint", "reason"),
+)
+
+# User the current request is acting for; read when recording AI usage
+current_user_id: ContextVar[Optional[int]] = ContextVar("current_user_id", default=None)
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+DEFAULT_LIMITS = {
+    "chat": "20/minute",
+    "summarize": "10/minute",
+    "upload": "30/minute",
+    "bulk_import": "10/hour",
+    "export": "10/hour",
+}
+
+# Which daily budgets each endpoint draws on
+ENDPOINT_BUDGETS = {
+    "chat": ("llm_tokens", "embedding_calls"),
+    "summarize": ("llm_tokens",),
+    "upload": (),
+    "bulk_import": ("embedding_calls",),
+    "export": (),
+}
+
+
+def parse_rate(value: str) -> Tuple[float, float]:
+    """'20/minute' -> (capacity=20, refill_per_second=20/60)"""
+    count, _, period = value.partition("/")
+    seconds = _PERIODS.get(period.strip().lower())
+    if seconds is None:
+        raise ValueError(f"Invalid rate '{value}', expected '<n>/<second|minute|hour|day>'")
+    capacity = float(count)
+    return capacity, capacity / seconds
+
+
+def _rate_setting(endpoint: str) -> str:
+    return os.environ.get(f"RATE_LIMIT_{endpoint.upper()}", DEFAULT_LIMITS[endpoint])
+
+
+@lru_cache(maxsize=None)
+def _limit_for(endpoint: str) -> Tuple[float, float]:
+    return parse_rate(_rate_setting(endpoint))
+
+
+@lru_cache(maxsize=None)
+def daily_budgets() -> Dict[str, int]:
+    return {
+        "llm_tokens": int(os.environ.get("DAILY_LLM_TOKEN_BUDGET", "200000")),
+        "embedding_calls": int(os.environ.get("DAILY_EMBEDDING_CALL_BUDGET", "500")),
+    }
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def seconds_until_reset() -> int:
+    now = datetime.now(timezone.utc)
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(1, int((tomorrow - now).total_seconds()))
+
+
+class MemoryBackend:
+    """
+    Single-process limiter state. A bucket is dropped once it would have refilled to
+    capacity (like the Redis keys' EXPIRE), since a missing bucket reads as full: memory
+    grows with the users active within the refill period, not with all users ever seen.
+    """
+
+    def __init__(self):
+        # key -> (tokens, updated_at, full_at)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        # (full_at, key) min-heap; entries whose full_at no longer matches the bucket are stale
+        self._expiry: List[Tuple[float, str]] = []
+        self._usage: Dict[str, int] = {}
+        self._usage_day = _today()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        """Drop buckets that are full again, soonest full first (the lock is held)."""
+        while self._expiry and self._expiry[0][0] <= now:
+            full_at, key = heapq.heappop(self._expiry)
+            bucket = self._buckets.get(key)
+            if bucket is not None and bucket[2] == full_at:
+                del self._buckets[key]
+
+    def take(self, key: str, capacity: float, refill_rate: float) -> Tuple[bool, float, float]:
+        """Take one token. Returns (allowed, tokens_left, seconds_until_next_token)."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            full_at = now + (capacity - tokens) / refill_rate
+            self._buckets[key] = (tokens, now, full_at)
+            heapq.heappush(self._expiry, (full_at, key))
+            if len(self._expiry) > 2 * len(self._buckets) + 64:
+                # Busy keys leave a stale entry per request: rebuild from the live buckets
+                self._expiry = [(bucket[2], bucket_key) for bucket_key, bucket in self._buckets.items()]
+                heapq.heapify(self._expiry)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / refill_rate
+        return allowed, tokens, wait
+
+    def peek(self, key: str, capacity: float, refill_rate: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+        return min(capacity, tokens + (now - updated) * refill_rate)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _roll_day(self, day: str) -> None:
+        if day != self._usage_day:
+            self._usage.clear()
+            self._usage_day = day
+
+    def add_usage(self, key: str, amount: int, day: str) -> int:
+        with self._lock:
+            self._roll_day(day)
+            self._usage[key] = self._usage.get(key, 0) + amount
+            return self._usage[key]
+
+    def get_usage(self, key: str, day: str) -> int:
+        with self._lock:
+            self._roll_day(day)
+            return self._usage.get(key, 0)
+
+
+# Token bucket as one atomic Redis round-trip: KEYS[1]=bucket, ARGV=capacity, rate, now
+_REDIS_TAKE = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBackend:
+    """Limiter state shared by every worker through Redis."""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("Please install redis: pip install redis")
+        self._redis = redis.Redis.from_url(url)
+        self._take = self._redis.register_script(_REDIS_TAKE)
+
+    def take(self, key: str, capacity: float, refill_rate: float) -> Tuple[bool, float, float]:
+        allowed, tokens = self._take(keys=[f"papernest:rl:{key}"], args=[capacity, refill_rate, time.time()])
+        tokens = float(tokens)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / refill_rate
+        return bool(allowed), tokens, wait
+
+    def peek(self, key: str, capacity: float, refill_rate: float) -> float:
+        tokens, updated = self._redis.hmget(f"papernest:rl:{key}", "tokens", "updated")
+        if tokens is None:
+            return capacity
+        return min(capacity, float(tokens) + (time.time() - float(updated)) * refill_rate)
+
+    def add_usage(self, key: str, amount: int, day: str) -> int:
+        redis_key = f"papernest:usage:{day}:{key}"
+        pipe = self._redis.pipeline()
+        pipe.incrby(redis_key, amount)
+        pipe.expire(redis_key, 2 * 86400)
+        return int(pipe.execute()[0])
+
+    def get_usage(self, key: str, day: str) -> int:
+        return int(self._redis.get(f"papernest:usage:{day}:{key}") or 0)
+
+
+def _build_backend():
+    url = os.environ.get("RATE_LIMIT_REDIS_URL")
+    return RedisBackend(url) if url else MemoryBackend()
+
+
+backend = _build_backend()
+
+
+def check_rate_limit(user_id: int, endpoint: str) -> None:
+    """Consume one request token for (user, endpoint) and enforce its daily budgets. Raises 429."""
+    capacity, refill_rate = _limit_for(endpoint)
+    allowed, _, wait = backend.take(f"{user_id}:{endpoint}", capacity, refill_rate)
+    if not allowed:
+        RATE_LIMITED.inc(endpoint=endpoint, reason="rate")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded for {endpoint}: {_rate_setting(endpoint)}",
+            headers={"Retry-After": str(max(1, int(wait + 0.999)))},
+        )
+
+    budgets = daily_budgets()
+    day = _today()
+    for budget in ENDPOINT_BUDGETS.get(endpoint, ()):
+        if backend.get_usage(f"{user_id}:{budget}", day) >= budgets[budget]:
+            RATE_LIMITED.inc(endpoint=endpoint, reason=budget)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Daily {budget.replace('_', ' ')} budget of {budgets[budget]} exhausted",
+                headers={"Retry-After": str(seconds_until_reset())},
+            )
+
+
+def record_usage(llm_tokens: int = 0, embedding_calls: int = 0, user_id: Optional[int] = None) -> None:
+    """Charge AI usage to `user_id` (default: the user of the current request)."""
+    user_id = user_id if user_id is not None else current_user_id.get()
+    if user_id is None:
+        return
+    day = _today()
+    if llm_tokens:
+        backend.add_usage(f"{user_id}:llm_tokens", llm_tokens, day)
+    if embedding_calls:
+        backend.add_usage(f"{user_id}:embedding_calls", embedding_calls, day)
+
+
+def usage_today(key: str) -> int:
+    """Today's value of a usage counter, e.g. "<user_id>:llm_tokens"."""
+    return backend.get_usage(key, _today())
+
+
+def add_usage_today(key: str, amount: int) -> None:
+    backend.add_usage(key, amount, _today())
+
+
+def get_usage(user_id: int) -> dict:
+    """Today's usage, budgets and remaining rate-limit tokens for a user."""
+    day = _today()
+    budgets = daily_budgets()
+    limits = {}
+    for endpoint in DEFAULT_LIMITS:
+        capacity, refill_rate = _limit_for(endpoint)
+        limits[endpoint] = {
+            "capacity": int(capacity),
+            "remaining": int(backend.peek(f"{user_id}:{endpoint}", capacity, refill_rate)),
+        }
+    return {
+        "day": day,
+        "llm_tokens": backend.get_usage(f"{user_id}:llm_tokens", day),
+        "llm_token_budget": budgets["llm_tokens"],
+        "embedding_calls": backend.get_usage(f"{user_id}:embedding_calls", day),
+        "embedding_call_budget": budgets["embedding_calls"],
+        "rate_limits": limits,
+        "resets_in_seconds": seconds_until_reset(),
+    }
+
+
+def rate_limit(endpoint: str):
+    """
+    Dependency factory: authenticates, applies the (user, endpoint) limits and
+    binds the user to the request so AI usage is charged to them.
+    Async so the context variable is set in the request's own context.
+    """
+    async def dependency(current_user: User = Depends(get_current_user)) -> User:
+        check_rate_limit(current_user.id, endpoint)
+        current_user_id.set(current_user.id)
+        return current_user
+    return dependency
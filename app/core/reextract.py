@@ -0,0 +1,145 @@
+"""
+Maintenance command for stored PDFs.
+
+    python -m app.core.reextract                   # re-extract text from every stored PDF
+    python -m app.core.reextract --missing         # only papers whose extraction failed
+    python -m app.core.reextract --backfill-dir D  # store PDFs from D for papers uploaded before the blob store
+    python -m app.core.reextract --gc              # delete blobs no paper references
+
+Extraction runs in a process pool (--workers, default CPU count), one task per distinct
+PDF. Papers whose text was edited by the user are left alone.
+"""
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+from sqlalchemy import or_, update
+
+from app.core.blobstore import BlobTooLarge, get_blob_store
+from app.core.dedup import text_sha256
+from app.core.httpcache import touch_papers
+from app.core.pdf_utils import extract_text_from_blob
+from app.db.database import SessionLocal, add_missing_columns
+from app.models.paper import Paper
+from app.models.user import User  # registers the target of Paper.user
+
+
+def _targets(db, missing_only: bool) -> Dict[str, List[tuple]]:
+    """{pdf sha256: [(paper id, text_sha256), ...]} for papers to re-extract."""
+    query = db.query(Paper.id, Paper.pdf_sha256, Paper.text_sha256).filter(Paper.pdf_sha256.isnot(None))
+    if missing_only:
+        query = query.filter(Paper.paper_text.is_(None))
+    else:
+        # Unedited extractions (content hash still set) or failed ones (no text)
+        query = query.filter(or_(Paper.content_sha256.isnot(None), Paper.paper_text.is_(None)))
+    targets: Dict[str, List[tuple]] = {}
+    for paper_id, key, old_hash in query:
+        targets.setdefault(key, []).append((paper_id, old_hash))
+    return targets
+
+
+def reextract(missing_only: bool = False, workers: int = 0) -> None:
+    db = SessionLocal()
+    try:
+        targets = _targets(db, missing_only)
+        print(f"📄 Re-extracting {len(targets)} PDFs for {sum(map(len, targets.values()))} papers")
+        updated = failed = 0
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(extract_text_from_blob, key): key for key in targets}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    text = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ {key[:12]}: {e}")
+                    continue
+                new_hash = text_sha256(text)
+                row = {"paper_text": text, "text_sha256": new_hash, "content_sha256": key}
+                unchanged = [{"id": paper_id, **row} for paper_id, old_hash in targets[key] if old_hash == new_hash]
+                # A summary of the old text no longer describes the paper
+                changed = [{"id": paper_id, **row, "summary_stale": True}
+                           for paper_id, old_hash in targets[key] if old_hash != new_hash]
+                for batch in (unchanged, changed):
+                    if batch:
+                        db.execute(update(Paper), batch)
+                touch_papers(db, Paper.id.in_([paper_id for paper_id, _ in targets[key]]))
+                db.commit()
+                updated += len(targets[key])
+        print(f"✅ Updated {updated} papers ({failed} PDFs failed)")
+    finally:
+        db.close()
+
+
+def backfill(directory: str) -> None:
+    """Store PDFs from `directory` for papers that have their hash but no stored PDF."""
+    store = get_blob_store()
+    db = SessionLocal()
+    try:
+        stored = 0
+        for dirpath, _, filenames in os.walk(directory):
+            for name in filenames:
+                if not name.lower().endswith(".pdf"):
+                    continue
+                try:
+                    with open(os.path.join(dirpath, name), "rb") as fh:
+                        key, _ = store.put(fh)
+                except BlobTooLarge as e:
+                    print(f"❌ {name}: {e}")
+                    continue
+                result = db.execute(
+                    update(Paper)
+                    .where(Paper.content_sha256 == key, Paper.pdf_sha256.is_(None))
+                    .values(pdf_sha256=key)
+                )
+                if result.rowcount:
+                    touch_papers(db, Paper.pdf_sha256 == key)
+                    stored += 1
+                else:
+                    referenced = db.query(Paper.id).filter(Paper.pdf_sha256 == key).first()
+                    if referenced is None:
+                        store.delete(key)  # not one of ours
+        db.commit()
+        print(f"✅ Stored {stored} PDFs")
+    finally:
+        db.close()
+
+
+def collect_garbage() -> None:
+    """Delete blobs that no paper references any more (run when no uploads are in flight)."""
+    store = get_blob_store()
+    db = SessionLocal()
+    try:
+        referenced = {key for (key,) in db.query(Paper.pdf_sha256).filter(Paper.pdf_sha256.isnot(None)).distinct()}
+    finally:
+        db.close()
+    removed = 0
+    for key in list(store.keys()):
+        if key not in referenced:
+            store.delete(key)
+            removed += 1
+    print(f"🧹 Deleted {removed} unreferenced blobs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--missing", action="store_true", help="only papers without extracted text")
+    parser.add_argument("--workers", type=int, default=0, help="extraction processes (default: CPU count)")
+    parser.add_argument("--backfill-dir", help="store matching PDFs from this directory instead of re-extracting")
+    parser.add_argument("--gc", action="store_true", help="delete unreferenced blobs instead of re-extracting")
+    args = parser.parse_args()
+
+    add_missing_columns()
+    if args.backfill_dir:
+        backfill(args.backfill_dir)
+    elif args.gc:
+        collect_garbage()
+    else:
+        reextract(missing_only=args.missing, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
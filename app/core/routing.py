@@ -0,0 +1,241 @@
+"""
+Model routing for LLM calls.
+
+Each call is tagged with a task ("chat", "summarize") and routed to the first
+route whose conditions match the prompt. A route lists targets (provider + model)
+tried in order: if one is rate-limited, times out or is unavailable, the next
+one is used.
+
+The default policy sends one-line chat follow-ups to a small fast model and
+everything else to the large one. Override it with MODEL_ROUTING_POLICY, set to
+either a JSON document or a path to a JSON file with the same shape as
+DEFAULT_POLICY.
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from app.core.metrics import Counter, Histogram, stage, TOKENS_CONSUMED
+from app.core.ratelimit import record_usage
+from app.core.providers import (
+    ProviderError, is_configured, get_groq_client, get_cohere_client, groq_provider, cohere_provider,
+)
+
+load_dotenv()
+
+LARGE_MODEL = "llama-3.3-70b-versatile"
+SMALL_MODEL = "llama-3.1-8b-instant"
+
+DEFAULT_POLICY = {
+    "routes": [
+        {
+            "name": "chat-followup",
+            "task": "chat",
+            "max_query_tokens": 32,
+            "targets": [
+                {"provider": "groq", "model": SMALL_MODEL},
+                {"provider": "groq", "model": LARGE_MODEL},
+            ],
+        },
+        {
+            "name": "chat",
+            "task": "chat",
+            "targets": [
+                {"provider": "groq", "model": LARGE_MODEL},
+                {"provider": "groq", "model": SMALL_MODEL},
+                {"provider": "cohere", "model": "command-r"},
+            ],
+        },
+        {
+            "name": "summarize",
+            "task": "summarize",
+            "targets": [
+                {"provider": "groq", "model": LARGE_MODEL},
+                {"provider": "cohere", "model": "command-r"},
+            ],
+        },
+    ],
+    # USD per million (input, output) tokens, used for cost accounting only
+    "costs": {
+        LARGE_MODEL: [0.59, 0.79],
+        SMALL_MODEL: [0.05, 0.08],
+        "command-r": [0.15, 0.60],
+    },
+}
+
+ROUTE_LATENCY = Histogram(
+    "papernest_llm_route_duration_seconds",
+    "LLM completion latency by route and serving model.",
+    ("route", "provider", "model"),
+)
+
+ROUTE_COST = Counter(
+    "papernest_llm_cost_usd_total",
+    "Estimated LLM spend by route and serving model.",
+    ("route", "model"),
+)
+
+ROUTE_FALLBACKS = Counter(
+    "papernest_llm_fallbacks_total",
+    "Completions that fell back from a route's preferred target.",
+    ("route", "from_model"),
+)
+
+
+class RouteTarget(BaseModel):
+    provider: str
+    model: str
+
+
+class Route(BaseModel):
+    name: str
+    task: str
+    max_prompt_tokens: Optional[int] = None
+    max_query_tokens: Optional[int] = None
+    targets: List[RouteTarget]
+
+    def matches(self, task: str, prompt_tokens: int, query_tokens: int) -> bool:
+        if self.task != task:
+            return False
+        if self.max_prompt_tokens is not None and prompt_tokens > self.max_prompt_tokens:
+            return False
+        if self.max_query_tokens is not None and query_tokens > self.max_query_tokens:
+            return False
+        return True
+
+
+class RoutingPolicy(BaseModel):
+    routes: List[Route]
+    costs: Dict[str, Tuple[float, float]] = {}
+
+    def select(self, task: str, prompt_tokens: int, query_tokens: int) -> Route:
+        for route in self.routes:
+            if route.matches(task, prompt_tokens, query_tokens):
+                return route
+        raise ValueError(f"No model route configured for task '{task}'")
+
+    def cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
+        input_price, output_price = self.costs.get(model, (0.0, 0.0))
+        return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class Completion(BaseModel):
+    text: str
+    route: str
+    provider: str
+    model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    latency_seconds: float = 0.0
+    fallbacks: int = 0
+
+
+def load_policy(source: Optional[str] = None) -> RoutingPolicy:
+    """Load the routing policy from JSON text, a JSON file path, or the default."""
+    source = source if source is not None else os.environ.get("MODEL_ROUTING_POLICY")
+    if not source:
+        return RoutingPolicy.model_validate(DEFAULT_POLICY)
+    if not source.lstrip().startswith("{"):
+        with open(source) as fh:
+            source = fh.read()
+    return RoutingPolicy.model_validate(json.loads(source))
+
+
+policy = load_policy()
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for routing decisions."""
+    return len(text) // 4
+
+
+def _complete_groq(model: str, messages: list) -> Tuple[str, int, int]:
+    client = get_groq_client()
+    with stage("groq_completion"):
+        completion = groq_provider.call(
+            lambda timeout: client.chat.completions.create(messages=messages, model=model, timeout=timeout),
+            key=model,
+        )
+    usage = getattr(completion, "usage", None)
+    input_tokens = (usage.prompt_tokens or 0) if usage is not None else 0
+    output_tokens = (usage.completion_tokens or 0) if usage is not None else 0
+    return completion.choices[0].message.content, input_tokens, output_tokens
+
+
+def _complete_cohere(model: str, messages: list) -> Tuple[str, int, int]:
+    client = get_cohere_client()
+    preamble = "\n".join(m["content"] for m in messages if m["role"] == "system") or None
+    message = "\n".join(m["content"] for m in messages if m["role"] != "system")
+    with stage("cohere_completion"):
+        response = cohere_provider.call(
+            lambda timeout: client.chat(
+                message=message,
+                preamble=preamble,
+                model=model,
+                request_options={"timeout_in_seconds": timeout, "max_retries": 0},
+            ),
+            key=model,
+        )
+    billed = getattr(getattr(response, "meta", None), "billed_units", None)
+    input_tokens = int(getattr(billed, "input_tokens", 0) or 0)
+    output_tokens = int(getattr(billed, "output_tokens", 0) or 0)
+    return response.text, input_tokens, output_tokens
+
+
+_BACKENDS = {
+    "groq": _complete_groq,
+    "cohere": _complete_cohere,
+}
+
+
+def complete(task: str, messages: list, query: Optional[str] = None,
+             routing_policy: Optional[RoutingPolicy] = None) -> Completion:
+    """
+    Route a completion to a model for `task`, falling back down the route's
+    targets on rate limits, timeouts and provider outages.
+    `query` is the user's own text (as opposed to retrieved context), if any.
+    Raises the last ProviderError when every target fails.
+    """
+    routing_policy = routing_policy or policy
+    prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+    query_tokens = estimate_tokens(query) if query is not None else prompt_tokens
+    route = routing_policy.select(task, prompt_tokens, query_tokens)
+
+    # Skip fallbacks to providers we have no credentials for
+    targets = [t for t in route.targets if is_configured(t.provider)] or route.targets
+
+    last_error: Optional[ProviderError] = None
+    start = time.perf_counter()  # latency includes time lost to failed targets
+    for attempt, target in enumerate(targets):
+        backend = _BACKENDS.get(target.provider)
+        if backend is None:
+            raise ValueError(f"Unknown LLM provider '{target.provider}' in route '{route.name}'")
+        try:
+            text, input_tokens, output_tokens = backend(target.model, messages)
+        except ProviderError as exc:
+            if not exc.retryable:
+                raise
+            last_error = exc
+            ROUTE_FALLBACKS.inc(route=route.name, from_model=target.model)
+            continue
+        elapsed = time.perf_counter() - start
+
+        cost = routing_policy.cost(target.model, input_tokens, output_tokens)
+        ROUTE_LATENCY.observe(elapsed, route=route.name, provider=target.provider, model=target.model)
+        ROUTE_COST.inc(cost, route=route.name, model=target.model)
+        TOKENS_CONSUMED.inc(input_tokens, provider=target.provider, kind="prompt")
+        TOKENS_CONSUMED.inc(output_tokens, provider=target.provider, kind="completion")
+        record_usage(llm_tokens=input_tokens + output_tokens)
+        return Completion(
+            text=text, route=route.name, provider=target.provider, model=target.model,
+            input_tokens=input_tokens, output_tokens=output_tokens, cost_usd=cost,
+            latency_seconds=elapsed, fallbacks=attempt,
+        )
+    if last_error is None:
+        raise ValueError(f"Model route '{route.name}' has no targets")
+    raise last_error
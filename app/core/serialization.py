@@ -0,0 +1,44 @@
+"""
+Fast JSON responses for large payloads (paper lists carry full paper_text and summary).
+
+The default FastAPI path loads ORM objects, validates each into a response model and
+then serializes it. For rows we wrote ourselves that validation is redundant, so hot
+read endpoints select plain columns and serialize them directly with FastJSONResponse:
+orjson (in requirements.txt), or pydantic-core's JSON encoder where orjson could not
+be installed. Both handle datetimes and enums natively.
+"""
+from typing import Any, List, Sequence
+
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return to_json(content)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def columns_for(schema: type[BaseModel], model) -> List:
+    """The model's columns for each field of a response schema, in field order."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def rows_as_dicts(rows: Sequence) -> List[dict]:
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]  # several times faster than Row._asdict()
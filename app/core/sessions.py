@@ -1,17 +1,30 @@
-# Centralized in-memory session storage
-sessions = {}
+# Session storage, in the database so that every worker process sees every login
+import secrets
+from typing import Optional
 
-def create_session(user_id: int) -> str:
+from sqlalchemy.orm import Session
+
+from app.models.session import UserSession
+from app.models.user import User
+
+def create_session(user_id: int, db: Session) -> str:
     """Create new session, return session_id"""
-    import secrets
     session_id = secrets.token_urlsafe(32)
-    sessions[session_id] = user_id
+    db.add(UserSession(id=session_id, user_id=user_id))
+    db.commit()
     return session_id
 
-def get_session_user(session_id: str) -> int:
-    """Get user_id from session, returns None if not found"""
-    return sessions.get(session_id)
+def get_session_user(session_id: str, db: Session) -> Optional[User]:
+    """Get the session's user (one query), returns None if not found"""
+    return (
+        db.query(User)
+        .join(UserSession, UserSession.user_id == User.id)
+        .filter(UserSession.id == session_id)
+        .first()
+    )
 
-def delete_session(session_id: str) -> bool:
+def delete_session(session_id: str, db: Session) -> bool:
     """Delete session, returns True if existed"""
-    return sessions.pop(session_id, None) is not None
+    deleted = db.query(UserSession).filter(UserSession.id == session_id).delete()
+    db.commit()
+    return deleted > 0
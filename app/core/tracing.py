@@ -0,0 +1,298 @@
+"""
+Request tracing and opt-in slow-request profiling.
+
+Tracing uses OpenTelemetry when it is installed and TRACING_EXPORTER is set:
+  - TRACING_EXPORTER=file   -> JSON lines appended to TRACING_FILE (default: traces.jsonl)
+  - TRACING_EXPORTER=otlp   -> OTLP/HTTP to OTEL_EXPORTER_OTLP_ENDPOINT (collector)
+  - TRACING_EXPORTER=console
+Otherwise every span is a no-op, so instrumented code costs next to nothing.
+
+Profiling is enabled by PROFILE_SLOW_REQUESTS_MS. A background thread samples all
+thread stacks every PROFILE_INTERVAL_MS while requests are in flight; any request
+slower than the threshold gets its samples written to PROFILE_DIR in collapsed-stack
+format (flamegraph.pl / speedscope / inferno ready), from a writer thread.
+
+Attribution: event-loop samples are kept only when the request's own asyncio task was
+running, so concurrent async requests do not show up in each other's profiles. Work
+in other threads (the threadpool running sync endpoints, pipeline and prefetch workers)
+cannot be tied to a request; it is included under a "[thread <name>]" root frame and,
+with requests running concurrently, may belong to any of them.
+"""
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SERVICE_NAME = "papernest-backend"
+
+_tracer = None
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exc):
+        pass
+
+    def update_name(self, name):
+        pass
+
+    def end(self):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _build_exporter(kind: str):
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()  # honours OTEL_EXPORTER_OTLP_ENDPOINT
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    if kind == "file":
+        out = open(os.environ.get("TRACING_FILE", "traces.jsonl"), "a", buffering=1)
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    return ConsoleSpanExporter()
+
+
+def setup_tracing() -> None:
+    """Configure the OpenTelemetry tracer from the environment (idempotent)."""
+    global _tracer
+    kind = os.environ.get("TRACING_EXPORTER", "").lower()
+    if _tracer is not None or not kind:
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        print("⚠️ TRACING_EXPORTER is set but OpenTelemetry is not installed: "
+              "pip install opentelemetry-sdk opentelemetry-exporter-otlp-proto-http")
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(_build_exporter(kind)))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer(SERVICE_NAME)
+    print(f"🔭 Tracing enabled (exporter: {kind})")
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Context manager creating a child span of the current trace."""
+    if _tracer is None:
+        yield _NOOP_SPAN
+        return
+    with _tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+def traced(name: Optional[str] = None):
+    """Decorator wrapping a sync or async function in a span."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_engine(engine) -> None:
+    """Emit a span for every SQL statement executed on the engine."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _tracer is None:
+            return
+        operation = statement.split(None, 1)[0].upper() if statement else "SQL"
+        conn.info.setdefault("trace_spans", []).append(
+            _tracer.start_span(f"db.{operation.lower()}", attributes={
+                "db.system": engine.dialect.name,
+                "db.statement": statement,
+            })
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            spans.pop().end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("trace_spans") if conn is not None else None
+        if spans:
+            current = spans.pop()
+            current.record_exception(exception_context.original_exception)
+            current.end()
+
+
+# --- Slow request profiler ---
+
+class SlowRequestProfiler:
+    """Samples thread stacks while requests are in flight and dumps slow ones."""
+
+    def __init__(self, threshold_ms: float, interval_ms: float = 5.0, output_dir: str = "profiles"):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.output_dir = output_dir
+        # (timestamp, owner, folded_stack); owner is id() of the asyncio task running on
+        # an event loop thread, or the thread's name; bounded to roughly a minute of samples
+        self._samples = deque(maxlen=int(60 / self.interval) * 8)
+        self._loops = {}  # thread id -> event loop running requests on it
+        self._active = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+            self._thread.start()
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-request-writer")
+
+    def _run(self):
+        own_id = threading.get_ident()  # the writer thread is skipped by name
+        while True:
+            if self._active == 0:
+                self._wakeup.wait()
+                self._wakeup.clear()
+            now = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or names.get(thread_id, "").startswith("slow-request-"):
+                    continue
+                folded = _fold(frame)
+                if not folded:
+                    continue
+                loop = self._loops.get(thread_id)
+                if loop is not None:
+                    task = asyncio.current_task(loop)
+                    owner = id(task) if task is not None else None
+                else:
+                    owner = names.get(thread_id, str(thread_id))
+                self._samples.append((now, owner, folded))
+            time.sleep(self.interval)
+
+    def request_started(self) -> Optional[int]:
+        """Called from the request's task; returns the token to pass to request_finished()."""
+        task = asyncio.current_task()
+        with self._lock:
+            self._ensure_started()
+            self._loops[threading.get_ident()] = asyncio.get_running_loop()
+            self._active += 1
+        self._wakeup.set()
+        return id(task) if task is not None else None
+
+    def request_finished(self, started: float, label: str, token: Optional[int] = None):
+        finished = time.perf_counter()
+        with self._lock:
+            self._active -= 1
+        if finished - started >= self.threshold:
+            # Off the event loop: scanning the samples and writing the file take a while
+            self._writer.submit(self._dump, started, finished, label, token)
+
+    def _dump(self, started: float, finished: float, label: str, token: Optional[int]):
+        tally = _Tally()
+        for ts, owner, stack in list(self._samples):
+            if not started <= ts <= finished:
+                continue
+            if isinstance(owner, str):
+                tally[f"[thread {owner}];{stack}"] += 1
+            elif token is not None and owner == token:
+                tally[stack] += 1
+        if not tally:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{int((finished - started) * 1000)}ms-{label}.folded"
+        with open(os.path.join(self.output_dir, filename), "w") as fh:
+            for stack, count in tally.most_common():
+                fh.write(f"{stack} {count}\n")
+
+
+# Leaf frames of threads that are idle rather than doing work for a request
+_IDLE_LEAVES = {("threading.py", "wait"), ("queue.py", "get"), ("selectors.py", "select")}
+
+
+def _fold(frame) -> str:
+    code = frame.f_code
+    if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+        return ""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def _build_profiler() -> Optional[SlowRequestProfiler]:
+    threshold = os.environ.get("PROFILE_SLOW_REQUESTS_MS")
+    if not threshold:
+        return None
+    return SlowRequestProfiler(
+        threshold_ms=float(threshold),
+        interval_ms=float(os.environ.get("PROFILE_INTERVAL_MS", "5")),
+        output_dir=os.environ.get("PROFILE_DIR", "profiles"),
+    )
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware opening a server span per request and driving the profiler."""
+
+    def __init__(self, app):
+        self.app = app
+        self.profiler = _build_profiler()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (_tracer is None and self.profiler is None):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        token = self.profiler.request_started() if self.profiler is not None else None
+
+        method = scope.get("method", "")
+        route = "unmatched"
+        try:
+            with span(f"{method} {scope.get('path', '')}", **{"http.method": method}) as current:
+                async def send_wrapper(message):
+                    if message["type"] == "http.response.start":
+                        current.set_attribute("http.status_code", message["status"])
+                    await send(message)
+
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    route = getattr(scope.get("route"), "path", "unmatched")
+                    current.update_name(f"{method} {route}")
+                    current.set_attribute("http.route", route)
+        finally:
+            if self.profiler is not None:
+                label = f"{method}{route}".replace("/", "_").replace("{", "").replace("}", "")
+                self.profiler.request_finished(started, label, token)
@@ -1,5 +1,6 @@
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -23,9 +24,83 @@ else:
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Emit a span per SQL statement when tracing is enabled
+from app.core.tracing import instrument_engine
+
+instrument_engine(engine)
+
+# Time every commit (including its flush) as the "db_commit" stage
+from app.core.metrics import STAGE_LATENCY
+
+@event.listens_for(SessionLocal, "before_commit")
+def _start_commit_timer(session):
+    session.info["commit_started"] = time.perf_counter()
+
+@event.listens_for(SessionLocal, "after_commit")
+def _record_commit_time(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage="db_commit")
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_commit_timer(session, previous_transaction):
+    session.info.pop("commit_started", None)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def insert_ignore_conflicts(model):
+    """INSERT statement for `model` that skips rows whose primary key already exists."""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy import insert
+        return insert(model).prefix_with("IGNORE")  # MySQL / MariaDB
+    return insert(model).on_conflict_do_nothing()
+
+def insert_or_increment(model, key: str, column: str):
+    """INSERT statement for `model` that adds 1 to `column` instead when the `key` row exists."""
+    counter = getattr(model.__table__.c, column)
+    if engine.dialect.name in ("postgresql", "sqlite"):
+        if engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(model).on_conflict_do_update(index_elements=[key], set_={column: counter + 1})
+    from sqlalchemy.dialects.mysql import insert
+    return insert(model).on_duplicate_key_update({column: counter + 1})
+
+def add_missing_columns():
+    """
+    create_all() only creates missing tables. Add columns (and their indexes) that were
+    introduced after a table was created, so existing databases keep working without a migration.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    if isinstance(default, str):
+                        default = "'" + default.replace("'", "''") + "'"
+                    else:
+                        default = default.compile(dialect=engine.dialect)
+                    ddl += f" DEFAULT {default}"
+                conn.execute(text(ddl))
+                print(f"🛠️ Added column {table.name}.{column.name}")
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
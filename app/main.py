@@ -1,21 +1,34 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 import psutil
 from sqlalchemy import text
 
-from app.db.database import engine, Base
+from app.db.database import engine, Base, add_missing_columns
+from app.api import bulk as bulk_router
+from app.api import library as library_router
 from app.api import papers as papers_router
 from app.api import auth as auth_router
+from app.api import usage as usage_router
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import MetricsMiddleware, render_latest, CONTENT_TYPE_LATEST
+from app.core.tracing import TracingMiddleware, setup_tracing
+from app.core.providers import ProviderError, ProviderUnavailableError
+from app.core import deadlines, pipeline
 
-# Create tables
+# Create tables (and columns added since they were created)
 Base.metadata.create_all(bind=engine)
+add_missing_columns()
 
 app = FastAPI(title="PaperNest API", version="1.0.0")
 
 @app.on_event("startup")
 async def startup_event():
     print("🚀 PaperNest Backend Starting up... (Version: LazyLoad+SecurePassword)")
+    resumed = pipeline.start()
+    if resumed:
+        print(f"⏳ Resumed processing of {resumed} uploaded papers")
 
 
 # CORS
@@ -27,6 +40,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip / brotli for JSON responses above COMPRESSION_MIN_SIZE (see app/core/compression.py)
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency histograms (exposed at /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Request spans + opt-in slow request profiler (see app/core/tracing.py)
+setup_tracing()
+app.add_middleware(TracingMiddleware)
+
 # Custom OpenAPI schema to add X-Session-ID security
 def custom_openapi():
     if app.openapi_schema:
@@ -53,9 +76,29 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
+@app.exception_handler(ProviderError)
+async def provider_error_handler(request: Request, exc: ProviderError):
+    """Upstream AI provider failures -> 502 (error), 503 (unavailable) or 504 (timeout)"""
+    headers = {}
+    if isinstance(exc, ProviderUnavailableError) and exc.retry_after:
+        headers["Retry-After"] = str(max(1, int(exc.retry_after + 0.5)))
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": f"AI provider error: {exc}"},
+        headers=headers,
+    )
+
+@app.exception_handler(deadlines.RequestAbandoned)
+async def request_abandoned_handler(request: Request, exc: deadlines.RequestAbandoned):
+    """Deadline passed -> 504; client disconnected -> 499 (only logged, nobody receives it)"""
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
 # Routers
 app.include_router(auth_router.router)
+app.include_router(bulk_router.router)  # before papers: /papers/bulk must not match /papers/{paper_id}
+app.include_router(library_router.router)  # likewise /papers/export and /papers/import
 app.include_router(papers_router.router)
+app.include_router(usage_router.router)
 
 @app.get("/")
 def home():
@@ -81,3 +124,9 @@ def health():
         "memory_total_mb": memory.total / (1024 * 1024),
         "memory_percent": memory.percent
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus-style metrics: request latency, per-stage timers, cache and API counters"""
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
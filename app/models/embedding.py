@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, LargeBinary, DateTime
+from sqlalchemy.sql import func
+
+from app.db.database import Base
+
+class ChunkEmbedding(Base):
+    """
+    Persistent embedding store, keyed by the SHA-256 of a chunk's text.
+    Shared by every paper (and user) containing the same chunk.
+    """
+    __tablename__ = "chunk_embeddings"
+    
+    chunk_sha256 = Column(String(64), primary_key=True)
+    model = Column(String, primary_key=True)
+    dim = Column(Integer, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)  # float32 bytes
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
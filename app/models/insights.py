@@ -0,0 +1,27 @@
+from sqlalchemy import Column, String, Integer, DateTime, JSON
+from sqlalchemy.sql import func
+
+from app.db.database import Base
+
+class TextInsights(Base):
+    """
+    Structural insights computed from a paper's text at ingest (app/core/insights.py):
+    section outline, references and keyphrases. Keyed by the SHA-256 of the exact text
+    (section offsets refer to it) and shared by every paper with that text.
+    """
+    __tablename__ = "text_insights"
+    
+    text_digest = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False)  # insights.VERSION that computed the row
+    sections = Column(JSON, nullable=False)    # [{number, title, level, start, end}]
+    references = Column(JSON, nullable=False)  # [{index, text, year}]
+    keyphrases = Column(JSON, nullable=False)  # [{phrase, score}]
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class PhraseDocumentCount(Base):
+    """Number of texts each candidate keyphrase occurs in: the IDF half of TF-IDF."""
+    __tablename__ = "phrase_document_counts"
+    
+    phrase = Column(String(200), primary_key=True)
+    documents = Column(Integer, nullable=False, default=0)
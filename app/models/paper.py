@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Enum, DateTime, ForeignKey, Text, Boolean, false
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -29,6 +29,21 @@ class Paper(Base):
     # NEW: Add these two columns
     paper_text = Column(Text, nullable=True)  # Store paper content
     summary = Column(Text, nullable=True)     # Store AI summary
+    summary_stale = Column(Boolean, nullable=False, default=False, server_default=false())  # Text edited since
+
+    # Dedup keys: SHA-256 of the PDF the text was extracted from (cleared when the text
+    # is edited) and of the normalized text
+    content_sha256 = Column(String(64), nullable=True, index=True)
+    text_sha256 = Column(String(64), nullable=True, index=True)
+    # Background processing of uploads (app/core/pipeline.py)
+    processing_state = Column(String(20), nullable=False, default="ready", server_default="ready")
+    processing_error = Column(Text, nullable=True)
+    processing_stages = Column(String(32), nullable=True)  # Optional stages to run, NULL = all
+    processing_owner = Column(String(32), nullable=True)  # pipeline.owner_id() of the worker processing it
+    processing_heartbeat = Column(DateTime(timezone=True), nullable=True)  # Lease, renewed while in flight
+
+    # Original PDF in the blob store (app/core/blobstore.py), kept when the text is edited
+    pdf_sha256 = Column(String(64), nullable=True, index=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy.sql import func
+
+from app.db.database import Base
+
+class UserSession(Base):
+    """
+    Login sessions, stored in the database so that every worker process
+    (and every host) behind the load balancer accepts the same session ID.
+    """
+    __tablename__ = "sessions"
+
+    id = Column(String(64), primary_key=True)  # the X-Session-ID token
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, DateTime, Integer, String
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -10,4 +10,8 @@ class User(Base):
     username = Column(String, unique=True, nullable=False, index=True)
     hashed_password = Column(String, nullable=False)
 
-    papers = relationship("Paper", back_populates="user")
\ No newline at end of file
+    # Bumped with every change to the user's papers; ETags for GET /papers (app/core/httpcache.py)
+    library_version = Column(Integer, nullable=False, default=0, server_default="0")
+    library_updated_at = Column(DateTime(timezone=True), nullable=True)
+
+    papers = relationship("Paper", back_populates="user")
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from app.models.paper import StatusEnum, PriorityEnum
 
 class PaperCreate(BaseModel):
@@ -29,6 +29,11 @@ class PaperResponse(BaseModel):
     user_id: int
     paper_text: Optional[str]  # NEW
     summary: Optional[str]     # NEW
+    summary_stale: bool = False  # paper_text changed after the summary was generated
+    content_sha256: Optional[str] = None
+    pdf_sha256: Optional[str] = None  # Set when the original PDF is stored (GET /papers/{id}/pdf)
+    processing_state: str = "ready"  # queued / extracting / chunking / embedding / summarizing / ready / failed
+    processing_error: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime]
     
@@ -39,3 +44,89 @@ class PaperResponse(BaseModel):
 class SummarizationResponse(BaseModel):
     paper_id: int
     summary: str
+
+# Precomputed insights (app/core/insights.py); start/end are offsets into paper_text
+class PaperSection(BaseModel):
+    number: Optional[str] = None
+    title: str
+    level: int
+    start: int
+    end: int
+
+class PaperReference(BaseModel):
+    index: int
+    text: str
+    year: Optional[int] = None
+
+class Keyphrase(BaseModel):
+    phrase: str
+    score: float
+
+class PaperInsightsResponse(BaseModel):
+    paper_id: int
+    sections: List[PaperSection]
+    references: List[PaperReference]
+    keyphrases: List[Keyphrase]
+
+# Bulk import: one metadata line (JSONL) per paper
+class BulkImportItem(BaseModel):
+    filename: Optional[str] = None  # PDF this metadata belongs to (uploaded file or zip member)
+    title: Optional[str] = None     # Defaults to the file name
+    authors: Optional[str] = None
+    status: Optional[StatusEnum] = None
+    priority: Optional[PriorityEnum] = None
+    categories: Optional[str] = None
+    paper_text: Optional[str] = None  # For metadata-only imports (no PDF)
+
+class BulkImportItemStatus(BaseModel):
+    index: int
+    paper_id: Optional[int]
+    title: str
+    filename: Optional[str] = None
+    state: str  # queued / extracting / embedding / summarizing / done / failed
+    error: Optional[str] = None
+
+class BulkImportJobResponse(BaseModel):
+    job_id: str
+    state: str  # running / completed
+    total: int
+    done: int
+    failed: int
+    items: List[BulkImportItemStatus]
+
+# Bulk update / delete: which of the user's papers to touch
+class PaperBulkFilter(BaseModel):
+    ids: Optional[List[int]] = None
+    status: Optional[StatusEnum] = None
+    priority: Optional[PriorityEnum] = None
+    category: Optional[str] = None  # Matches papers whose categories contain this text
+
+class PaperBulkUpdate(BaseModel):
+    where: PaperBulkFilter
+    changes: PaperUpdate
+
+class PaperBulkDelete(BaseModel):
+    where: PaperBulkFilter
+
+class BulkOperationResponse(BaseModel):
+    affected: int
+
+# Library archives (GET /papers/export, POST /papers/import): one line of papers.jsonl
+class ArchivePaper(BaseModel):
+    id: Optional[int] = None  # In the exporting library; informational
+    title: str
+    authors: Optional[str] = None
+    status: StatusEnum = StatusEnum.TO_READ
+    priority: PriorityEnum = PriorityEnum.MEDIUM
+    categories: Optional[str] = None
+    paper_text: Optional[str] = None
+    summary: Optional[str] = None
+    summary_stale: bool = False
+    pdf_sha256: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class LibraryImportResponse(BaseModel):
+    papers: int
+    queued: int  # Papers queued for embedding (archived embeddings are never imported)
+    pdfs: int
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Dict
+
+class RateLimitStatus(BaseModel):
+    capacity: int
+    remaining: int
+
+class UsageResponse(BaseModel):
+    day: str
+    llm_tokens: int
+    llm_token_budget: int
+    embedding_calls: int
+    embedding_call_budget: int
+    rate_limits: Dict[str, RateLimitStatus]
+    resets_in_seconds: int
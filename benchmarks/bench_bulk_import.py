@@ -0,0 +1,85 @@
+"""
+Benchmark bulk import (POST /papers/bulk) against one POST /papers/upload per paper.
+
+    python benchmarks/bench_bulk_import.py [--papers 1000] [--pages 8] [--embed]
+
+Runs the app in-process on a throwaway SQLite database (or DATABASE_URL if set).
+With --embed, embeddings are computed against the local fake Cohere server.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORT = int(os.environ.get("FAKE_PROVIDER_PORT", "9103"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.update({
+    "COHERE_API_KEY": "fake", "COHERE_BASE_URL": f"http://127.0.0.1:{PORT}",
+    "RATE_LIMIT_UPLOAD": "1000000/second", "RATE_LIMIT_BULK_IMPORT": "1000000/second",
+    "DAILY_EMBEDDING_CALL_BUDGET": "100000000",
+})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--embed", action="store_true")
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from benchmarks.fake_provider import serve
+    from benchmarks.pdfgen import make_pdf
+    from app.main import app
+
+    serve(port=PORT, latency_ms=50)
+    client = TestClient(app)
+    client.post("/auth/register", json={"email": "bench@example.com", "username": "bench", "password": "bench"})
+    session_id = client.post("/auth/login", json={"username": "bench", "password": "bench"}).json()["session_id"]
+    headers = {"X-Session-ID": session_id}
+
+    pdfs = [make_pdf(pages=args.pages, words_per_page=400, seed=i) for i in range(args.papers)]
+    print(f"{args.papers} PDFs x {args.pages} pages, {sum(map(len, pdfs)) / 1e6:.1f} MB total")
+
+    if not args.skip_sequential:
+        start = time.perf_counter()
+        for i, pdf in enumerate(pdfs):
+            resp = client.post("/papers/upload", headers=headers,
+                               files={"file": (f"paper-{i}.pdf", pdf, "application/pdf")},
+                               data={"title": f"Sequential {i}"})
+            assert resp.status_code == 201, resp.text
+        sequential = time.perf_counter() - start
+        print(f"sequential /papers/upload: {sequential:7.2f} s  ({args.papers / sequential:6.1f} papers/s)")
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zf:
+        for i, pdf in enumerate(pdfs):
+            zf.writestr(f"paper-{i}.pdf", pdf)
+
+    start = time.perf_counter()
+    resp = client.post("/papers/bulk", headers=headers,
+                       files={"files": ("papers.zip", archive.getvalue(), "application/zip")},
+                       data={"embed": str(args.embed).lower()})
+    accepted = time.perf_counter() - start
+    assert resp.status_code == 202, resp.text
+    job_id = resp.json()["job_id"]
+    # Papers are processed by the pipeline's worker pools after the request returns
+    while True:
+        job = client.get(f"/papers/bulk/{job_id}", headers=headers).json()
+        if job["state"] == "completed":
+            break
+        time.sleep(0.2)
+    bulk = time.perf_counter() - start
+    print(f"bulk /papers/bulk (zip):   {bulk:7.2f} s  ({args.papers / bulk:6.1f} papers/s), "
+          f"rows inserted in {accepted:.2f} s, done={job['done']} failed={job['failed']}"
+          f"{' (with embeddings)' if args.embed else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark PATCH/DELETE /papers/bulk against one PATCH/DELETE /papers/{id} per paper.
+
+    python benchmarks/bench_bulk_ops.py [--papers 200]
+
+Runs the app in-process on a throwaway SQLite database (or DATABASE_URL if set).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ["RATE_LIMIT_BULK_IMPORT"] = "1000000/second"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", type=int, default=200)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    client.post("/auth/register", json={"email": "bench@example.com", "username": "bench", "password": "bench"})
+    session_id = client.post("/auth/login", json={"username": "bench", "password": "bench"}).json()["session_id"]
+    headers = {"X-Session-ID": session_id}
+
+    def create(prefix):
+        metadata = "\n".join(json.dumps({"title": f"{prefix} {i}"}) for i in range(args.papers))
+        job = client.post("/papers/bulk", headers=headers,
+                          files={"metadata": ("metadata.jsonl", metadata.encode(), "application/x-ndjson")}).json()
+        return [item["paper_id"] for item in job["items"]]
+
+    def timed(label, fn):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<32} {elapsed * 1000:9.1f} ms  ({elapsed * 1000 / args.papers:6.2f} ms/paper)")
+        return elapsed
+
+    print(f"{args.papers} papers")
+    ids = create("Individual")
+
+    def patch_each():
+        for paper_id in ids:
+            assert client.patch(f"/papers/{paper_id}", headers=headers, json={"status": "READING"}).status_code == 200
+
+    def delete_each():
+        for paper_id in ids:
+            assert client.delete(f"/papers/{paper_id}", headers=headers).status_code == 204
+
+    individual_patch = timed("PATCH /papers/{id} x N", patch_each)
+    individual_delete = timed("DELETE /papers/{id} x N", delete_each)
+
+    ids = create("Bulk")
+
+    def patch_bulk():
+        resp = client.patch("/papers/bulk", headers=headers,
+                            json={"where": {"ids": ids}, "changes": {"status": "READING"}})
+        assert resp.json()["affected"] == len(ids), resp.text
+
+    def delete_bulk():
+        resp = client.request("DELETE", "/papers/bulk", headers=headers, json={"where": {"ids": ids}})
+        assert resp.json()["affected"] == len(ids), resp.text
+
+    bulk_patch = timed("PATCH /papers/bulk", patch_bulk)
+    bulk_delete = timed("DELETE /papers/bulk", delete_bulk)
+    print(f"speedup: update {individual_patch / bulk_patch:.0f}x, delete {individual_delete / bulk_delete:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Bytes and CPU per interactive Streamlit session, with and without conditional GETs.
+
+    python benchmarks/bench_conditional_get.py [--papers 50] [--reruns 200] [--edit-every 10]
+
+Every Streamlit rerun (i.e. every widget interaction) fetches GET /papers/ twice (the
+"My Papers" and "Chat" tabs); every --edit-every reruns the user edits a paper. The
+plain client downloads the full list each time; the conditional client revalidates
+its cached copy with If-None-Match as streamlit_app.py does.
+
+Runs the app in-process on a throwaway SQLite database (or DATABASE_URL if set), so the
+CPU figure (process time) covers the server and the test client.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ["RATE_LIMIT_BULK_IMPORT"] = "1000000/second"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", type=int, default=50)
+    parser.add_argument("--reruns", type=int, default=200)
+    parser.add_argument("--edit-every", type=int, default=10)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    client.post("/auth/register", json={"email": "bench@example.com", "username": "bench", "password": "bench"})
+    session_id = client.post("/auth/login", json={"username": "bench", "password": "bench"}).json()["session_id"]
+    headers = {"X-Session-ID": session_id}
+
+    rng = random.Random(0)
+    words = "attention model training dataset results network embedding retrieval evaluation method".split()
+    texts = [" ".join(rng.choice(words) for _ in range(3000)) for _ in range(args.papers)]  # ~20 KB each
+    metadata = "\n".join(json.dumps({"title": f"Paper {i}", "paper_text": text}) for i, text in enumerate(texts))
+    job = client.post("/papers/bulk", headers=headers,
+                      files={"metadata": ("metadata.jsonl", metadata.encode(), "application/x-ndjson")}).json()
+    ids = [item["paper_id"] for item in job["items"]]
+
+    def session(conditional):
+        cache = {}
+        received = not_modified = 0
+        start_cpu, start = time.process_time(), time.perf_counter()
+        for rerun in range(args.reruns):
+            if args.edit_every and rerun % args.edit_every == args.edit_every - 1:
+                status = "READING" if (rerun // args.edit_every) % 2 else "DONE"
+                client.patch(f"/papers/{ids[rerun % len(ids)]}", headers=headers, json={"status": status})
+            for _ in range(2):
+                request_headers = dict(headers)
+                if conditional and "etag" in cache:
+                    request_headers["If-None-Match"] = cache["etag"]
+                resp = client.get("/papers/", headers=request_headers)
+                received += len(resp.content)
+                if resp.status_code == 304:
+                    not_modified += 1
+                    papers = cache["papers"]
+                else:
+                    papers = resp.json()
+                    if conditional:
+                        cache = {"etag": resp.headers["ETag"], "papers": papers}
+                assert len(papers) == args.papers
+        return received, time.process_time() - start_cpu, time.perf_counter() - start, not_modified
+
+    print(f"{args.papers} papers, {args.reruns} reruns, an edit every {args.edit_every} reruns")
+    results = {}
+    for label, conditional in (("plain GET", False), ("conditional GET", True)):
+        received, cpu, wall, hits = session(conditional)
+        results[label] = (received, cpu)
+        print(f"{label:<16} {received / 1024:10.0f} KiB  {cpu * 1000:8.0f} ms CPU  "
+              f"{wall * 1000:8.0f} ms wall  ({hits} x 304)")
+    (plain_bytes, plain_cpu), (cond_bytes, cond_cpu) = results.values()
+    print(f"reduction: bytes {100 * (1 - cond_bytes / plain_bytes):.0f}%, CPU {100 * (1 - cond_cpu / plain_cpu):.0f}%")
+
+
+if __name__ == "__main__":
+    main()
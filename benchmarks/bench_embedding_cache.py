@@ -0,0 +1,128 @@
+"""
+Memory per cached paper and retrieval accuracy of the embedding cache.
+
+    python benchmarks/bench_embedding_cache.py [--papers 200] [--chunks 15] [--dim 384] [--queries 2000]
+
+Memory: RSS growth of this process per cached paper for
+  - the previous lru_cache entry: paper text (the cache key), the float64 matrix built
+    from Cohere's list of floats, and the list of chunk strings;
+  - a memory-mapped float32 / int8 file from app/core/embedcache.py, after one search.
+Mapped pages are page cache, shared by every worker on the host, so the host-wide cost
+is the file size once instead of the RSS once per worker.
+
+Accuracy: embeddings are synthetic (a topic vector per paper plus per-chunk noise,
+giving the 0.4-0.8 cosine similarities seen between chunks of one paper), and queries
+are noisy copies of a random chunk. Reported is the overlap of the top-7 chunks with
+exact float64 search (recall@7) and how often the best chunk is the same (top-1).
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+
+import numpy as np
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["EMBED_CACHE_DIR"] = tempfile.mkdtemp(prefix="papernest-embed-")
+os.environ["EMBED_CACHE_MAX_MB"] = "100000"
+
+from benchmarks.bench_serialization import fake_text  # noqa: E402
+from app.core import embedcache  # noqa: E402
+
+TOP_K = 7
+
+
+def rss() -> int:
+    gc.collect()
+    return psutil.Process().memory_info().rss
+
+
+def synthetic_paper(rng: np.random.Generator, chunks: int, dim: int) -> np.ndarray:
+    topic = rng.standard_normal(dim)
+    return (topic + 0.8 * rng.standard_normal((chunks, dim))).astype(np.float32)
+
+
+def old_entry(text: str, matrix: np.ndarray, chunk_size: int):
+    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    return text, np.array(matrix.tolist()), chunks  # Cohere returns lists of Python floats
+
+
+def memory(args, papers, texts):
+    results = {}
+    before = rss()
+    kept = [old_entry(text, matrix, 2000) for text, matrix in zip(texts, papers)]
+    results["lru_cache (float64 + text)"] = (rss() - before) / len(papers)
+    del kept
+    query = embedcache.normalize(np.ones((1, args.dim)))[0]
+    for dtype in ("float32", "int8"):
+        embedcache.DTYPE = dtype
+        for i, matrix in enumerate(papers):
+            embedcache.store(f"paper{i}", matrix, np.zeros((len(matrix), 2), dtype=np.int64))
+        embedcache._mapped.clear()  # measure a worker that maps files another one wrote
+        gc.collect()
+        before = rss()
+        kept = [embedcache.load(f"paper{i}") for i in range(len(papers))]
+        for index in kept:
+            index.search(query, TOP_K)
+        file_bytes = os.path.getsize(embedcache._path("paper0"))
+        results[f"mmap {dtype}"] = (rss() - before) / len(papers), file_bytes
+        del kept
+    return results
+
+
+def accuracy(args, papers, rng):
+    exact_results, stats = [], {"float32": [0, 0], "int8": [0, 0]}
+    queries = []
+    for _ in range(args.queries):
+        p = int(rng.integers(len(papers)))
+        matrix = papers[p]
+        query = matrix[int(rng.integers(len(matrix)))] + 1.5 * rng.standard_normal(args.dim)
+        queries.append((p, query / np.linalg.norm(query)))
+    for p, query in queries:
+        matrix = papers[p].astype(np.float64)
+        exact = matrix / np.linalg.norm(matrix, axis=1, keepdims=True) @ query
+        exact_results.append(np.argsort(exact)[-TOP_K:][::-1])
+    for dtype in stats:
+        embedcache.DTYPE = dtype
+        indexes = [embedcache._build(matrix, np.zeros((len(matrix), 2)))[0] for matrix in papers]
+        for (p, query), truth in zip(queries, exact_results):
+            found = indexes[p].search(query.astype(np.float32), TOP_K)
+            stats[dtype][0] += len(set(found.tolist()) & set(truth.tolist())) / TOP_K
+            stats[dtype][1] += found[0] == truth[0]
+    return {dtype: (recall / len(queries), top1 / len(queries)) for dtype, (recall, top1) in stats.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=15)
+    parser.add_argument("--dim", type=int, default=384, help="embed-english-light-v3.0 has 384 dimensions")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    text_rng = random.Random(args.seed)
+    papers = [synthetic_paper(rng, args.chunks, args.dim) for _ in range(args.papers)]
+    texts = [fake_text(text_rng, words=5000) for _ in range(args.papers)]
+
+    print(f"{args.papers} papers x {args.chunks} chunks x {args.dim} dims")
+    memory_results = memory(args, papers, texts)
+    baseline = memory_results["lru_cache (float64 + text)"]
+    print(f"\n{'cache entry':<28} {'RSS/paper':>10} {'file':>9} {'vs lru':>7}")
+    for label, value in memory_results.items():
+        per_paper, file_bytes = value if isinstance(value, tuple) else (value, None)
+        file_kb = f"{file_bytes / 1024:.1f} KB" if file_bytes else "-"
+        print(f"{label:<28} {per_paper / 1024:>7.1f} KB {file_kb:>9} {baseline / max(per_paper, 1):>6.1f}x")
+
+    print(f"\n{'search':<10} {'recall@7':>9} {'top-1':>7}   (vs exact float64, {args.queries} queries)")
+    for dtype, (recall, top1) in accuracy(args, papers, rng).items():
+        print(f"{dtype:<10} {recall:>9.4f} {top1:>7.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Memory of a library export / import as the library grows.
+
+    python benchmarks/bench_export.py [--papers 1000,10000] [--words 3000] [--no-embeddings]
+
+Fills a throwaway SQLite database (or DATABASE_URL if set) with papers of about
+`--words` words, a summary, and chunk embeddings for every paper (384 dims, as
+embed-english-light-v3.0), then for each library size:
+  - streams GET /papers/export's archive (app/core/archive.py) to a file;
+  - imports that archive into a second account.
+Each step runs in a fresh process; reported are its time and peak RSS growth, plus the
+archive size. Flat peak RSS across sizes means memory does not depend on the library size.
+For comparison, "load all" is the peak RSS growth of loading the library's rows at once
+(what paging GET /papers/ into one export would hold).
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import psutil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+workdir = os.environ.setdefault("BENCH_EXPORT_DIR", tempfile.mkdtemp(prefix="papernest-export-"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir}/bench.db")
+os.environ.setdefault("BLOB_STORE_DIR", os.path.join(workdir, "blobs"))
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.db.database import Base, SessionLocal, engine, insert_ignore_conflicts  # noqa: E402
+from app.core import archive  # noqa: E402
+from app.core.dedup import text_sha256  # noqa: E402
+from app.core.rag_utils import EMBED_MODEL, MAX_CHUNKS, chunk_key, chunk_text  # noqa: E402
+from app.core.security import hash_password  # noqa: E402
+from app.models.embedding import ChunkEmbedding  # noqa: E402
+from app.models.paper import Paper  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+DIM = 384
+
+
+def run_step(step: str, user_id: int, path: str, embeddings: bool) -> dict:
+    """Run one step in a fresh process: (seconds, peak RSS growth in MB, step result)."""
+    command = [sys.executable, __file__, "--step", step, "--user", str(user_id), "--archive", path]
+    if not embeddings:
+        command.append("--no-embeddings")
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def step_main(args):
+    """Child process of run_step()."""
+    db = SessionLocal()
+    db.execute(select(User.id)).all()  # connect before the baseline
+    base = psutil.Process().memory_info().rss
+    started = time.perf_counter()
+    result = None
+    if args.step == "load":
+        result = len(db.execute(select(Paper).where(Paper.user_id == args.user)).scalars().all())
+    elif args.step == "export":
+        with open(args.archive, "wb") as out:
+            for chunk in archive.export_library(args.user, embeddings=not args.no_embeddings):
+                out.write(chunk)
+    else:
+        with open(args.archive, "rb") as source:
+            result = archive.import_library(source, args.user, db)[0]
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB on Linux
+    print(json.dumps({"seconds": elapsed, "peak_mb": max(peak - base, 0) / 2 ** 20, "result": result}))
+
+
+def add_user(db, name: str) -> int:
+    user = User(email=f"{name}@example.com", username=name, hashed_password=hash_password("bench"))
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def paragraphs(rng: random.Random, vocabulary, words: int) -> str:
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 30))
+        sentences.append(" ".join(rng.choices(vocabulary, k=length)).capitalize() + ".")
+        sentences.append("\n" if rng.random() < 0.15 else " ")
+        words -= length
+    return "".join(sentences)
+
+
+def fill(db, user_id: int, count: int, words: int, embeddings: bool, rng: random.Random):
+    vocabulary = ["".join(rng.choice("aeioubdgklmnprst") for _ in range(rng.randint(2, 9))) for _ in range(5000)]
+    np_rng = np.random.default_rng(rng.randint(0, 2 ** 31))
+    for start in range(0, count, 200):
+        papers, vectors = [], {}
+        for i in range(start, min(count, start + 200)):
+            text = paragraphs(rng, vocabulary, words)
+            papers.append({"title": f"Paper {i}", "user_id": user_id, "paper_text": text,
+                           "summary": " ".join(rng.choices(vocabulary, k=150)), "text_sha256": text_sha256(text)})
+            if embeddings:
+                for chunk in chunk_text(text, limit=MAX_CHUNKS):
+                    vectors[chunk_key(chunk)] = np_rng.standard_normal(DIM).astype(np.float32).tobytes()
+        db.execute(insert(Paper), papers)
+        if vectors:
+            db.execute(insert_ignore_conflicts(ChunkEmbedding), [
+                {"chunk_sha256": key, "model": EMBED_MODEL, "dim": DIM, "embedding": blob}
+                for key, blob in vectors.items()
+            ])
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", default="1000,10000", help="library sizes, comma-separated")
+    parser.add_argument("--words", type=int, default=3000)
+    parser.add_argument("--no-embeddings", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--step", help=argparse.SUPPRESS)
+    parser.add_argument("--user", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--archive", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.step:
+        return step_main(args)
+    embeddings = not args.no_embeddings
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(args.seed)
+    sizes = sorted(int(size) for size in args.papers.split(","))
+
+    print(f"{'papers':>7} {'step':<10} {'time':>8} {'archive':>10} {'peak RSS +':>11}")
+    db = SessionLocal()
+    owner = add_user(db, "owner")
+    filled = 0
+    for size in sizes:
+        fill(db, owner, size - filled, args.words, embeddings, rng)
+        filled = size
+        path = os.path.join(workdir, f"export-{size}.zip")
+
+        load = run_step("load", owner, path, embeddings)
+        print(f"{size:>7} {'load all':<10} {load['seconds']:>7.1f}s {'':>10} {load['peak_mb']:>8.1f} MB")
+        export = run_step("export", owner, path, embeddings)
+        archive_mb = os.path.getsize(path) / 2 ** 20
+        print(f"{size:>7} {'export':<10} {export['seconds']:>7.1f}s {archive_mb:>7.1f} MB {export['peak_mb']:>8.1f} MB")
+        imported = run_step("import", add_user(db, f"importer{size}"), path, embeddings)
+        assert imported["result"] == size, (imported, size)
+        print(f"{size:>7} {'import':<10} {imported['seconds']:>7.1f}s {'':>10} {imported['peak_mb']:>8.1f} MB")
+        os.remove(path)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Time and memory allocated per chat turn by the local part of RAG retrieval.
+
+    python benchmarks/bench_rag_query.py [--words 12000] [--number 2000]
+
+Measures retrieve_context() with the paper's embeddings in the embedding cache and the
+query embedding in the host cache (the steady state of a conversation), so no Cohere
+call is made. Each turn gets the paper text as a new string object, as loaded from the
+database. For comparison, "previous" replays the loop as it was before: hashing a
+UTF-8 copy of the text, mapping the file again, normalizing the query into a new array,
+scoring into a new array (int8 rows widened into a float32 copy first) and a full argsort.
+
+Reported per call: time (timeit, best of 3) and peak memory allocated on top of what
+was live before the call (tracemalloc; NumPy buffers included). Chunking is measured
+for the whole text and for the first MAX_CHUNKS chunks, which is all indexing needs.
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+workdir = tempfile.mkdtemp(prefix="papernest-rag-")
+os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+os.environ["HOST_CACHE_DIR"] = os.path.join(workdir, "host")
+os.environ["EMBED_CACHE_DIR"] = os.path.join(workdir, "embeddings")
+
+from app.db.database import Base, engine  # noqa: E402
+from app.models import embedding, insights, paper, session, user  # noqa: E402,F401
+from app.core import embedcache, rag_utils  # noqa: E402
+
+DIM = 384
+QUERY = "What training data and evaluation metrics does the method use?"
+
+
+def paragraphs(rng: random.Random, words: int) -> str:
+    vocabulary = ["".join(rng.choice("aeioubdgklmnprst") for _ in range(rng.randint(2, 9))) for _ in range(5000)]
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 30))
+        sentences.append(" ".join(rng.choices(vocabulary, k=length)).capitalize() + ".")
+        sentences.append("\n" if rng.random() < 0.15 else " ")
+        words -= length
+    return "".join(sentences)
+
+
+def previous_turn(text: str, query: str, top_k: int = 7) -> str:
+    """retrieve_context() before the allocation work, cache hits only."""
+    key = f"{rag_utils.EMBED_MODEL}-{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+    path = embedcache._path(key)
+    buf = np.memmap(path, dtype=np.uint8, mode="r")
+    os.utime(path)
+    _, rows, cols, code = embedcache._HEADER.unpack(buf[:embedcache._HEADER.size].tobytes())
+    dtype = embedcache._DTYPES[code]
+    offset = embedcache._HEADER.size
+    spans = buf[offset:offset + rows * 16].view(np.int64).reshape(rows, 2)
+    offset += rows * 16
+    scales = None
+    if dtype is np.int8:
+        scales = buf[offset:offset + rows * 4].view(np.float32)
+        offset += rows * 4
+    matrix = buf[offset:offset + rows * cols * np.dtype(dtype).itemsize].view(dtype).reshape(rows, cols)
+
+    raw = rag_utils.hostcache.get_array(f"query:{rag_utils.EMBED_MODEL}:{rag_utils.chunk_key(query)}")[0]
+    query_norm = raw / np.linalg.norm(raw)
+    scores = matrix @ query_norm
+    if scales is not None:
+        scores *= scales
+    top = np.argsort(scores)[-top_k:][::-1]
+    return "\n\n".join([text[start:end] for start, end in spans[top].tolist()])
+
+
+def measure(fn, number: int):
+    """(microseconds per call, peak KB allocated during one call)."""
+    fn()
+    seconds = min(timeit.repeat(fn, number=number, repeat=3)) / number
+    tracemalloc.start()
+    fn()
+    before = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return seconds * 1e6, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=12000, help="paper length (12000 words is about 80 KB)")
+    parser.add_argument("--number", type=int, default=2000, help="calls per timing")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    text = paragraphs(random.Random(1), args.words)
+    # A new str per turn, cycling through more than dedup.RECENT_DIGESTS of them
+    copies = [(text + " ")[:-1] for _ in range(16)]
+    turn = iter(range(10 ** 9))
+
+    def fresh_text() -> str:
+        return copies[next(turn) % len(copies)]
+
+    np_rng = np.random.default_rng(1)
+    rag_utils._embed = lambda texts, input_type, stage_name: np_rng.standard_normal((len(texts), DIM))
+    raw = np_rng.standard_normal((1, DIM)).astype(np.float32)
+    rag_utils.hostcache.set_array(f"query:{rag_utils.EMBED_MODEL}:{rag_utils.chunk_key(QUERY)}", raw)
+
+    print(f"paper: {len(text) / 1024:.0f} KB, {len(rag_utils.chunk_text(text, limit=rag_utils.MAX_CHUNKS))} "
+          f"indexed chunks, {DIM} dims")
+    print(f"\n{'':<34} {'time':>10} {'peak alloc':>11}")
+    for dtype in ("float32", "int8"):
+        embedcache.DTYPE = dtype
+        rag_utils.paper_index(text)  # cache the index file
+        rag_utils.embed_query(QUERY)  # and the (normalized) query embedding
+        for label, fn in (
+            (f"previous turn ({dtype})", lambda: previous_turn(fresh_text(), QUERY)),
+            (f"retrieve_context ({dtype})", lambda: rag_utils.retrieve_context(fresh_text(), QUERY)),
+        ):
+            micros, peak_kb = measure(fn, args.number)
+            print(f"{label:<34} {micros:>7.1f} us {peak_kb:>8.1f} KB")
+
+        index = rag_utils.paper_index(text)
+        query = rag_utils.embed_query(QUERY)[0]
+        micros, peak_kb = measure(lambda: index.search(query, 7), args.number * 5)
+        print(f"{'  search only':<34} {micros:>7.1f} us {peak_kb:>8.1f} KB")
+
+    print()
+    number = max(args.number // 100, 5)
+    for label, fn in (
+        ("chunk_text (all chunks)", lambda: rag_utils.chunk_text(text)[:rag_utils.MAX_CHUNKS]),
+        ("chunk_text (limit=MAX_CHUNKS)", lambda: rag_utils.chunk_text(text, limit=rag_utils.MAX_CHUNKS)),
+    ):
+        micros, peak_kb = measure(fn, number)
+        print(f"{label:<34} {micros / 1000:>7.2f} ms {peak_kb:>8.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Measure the hot-path overhead of the per-user rate limiter (app/core/ratelimit.py).
+
+    python benchmarks/bench_ratelimit.py [--users 1000] [--iterations 200000]
+
+Reports the cost of one check_rate_limit() call (token bucket + daily budget
+lookups) and one record_usage() call for the in-memory backend, and for Redis
+when RATE_LIMIT_REDIS_URL is set.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+# Generous limits so the benchmark measures the allowed path
+os.environ.setdefault("RATE_LIMIT_CHAT", "1000000000/second")
+
+from app.core import ratelimit  # noqa: E402
+
+
+def bench(label: str, users: int, iterations: int):
+    user_ids = [random.randrange(users) for _ in range(iterations)]
+    it = iter(user_ids)
+    check = timeit.timeit(lambda: ratelimit.check_rate_limit(next(it), "chat"), number=iterations)
+    it = iter(user_ids)
+    record = timeit.timeit(lambda: ratelimit.record_usage(llm_tokens=100, user_id=next(it)), number=iterations)
+    print(f"{label:<8} check_rate_limit: {check / iterations * 1e6:7.2f} us/call   "
+          f"record_usage: {record / iterations * 1e6:7.2f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    ratelimit.backend = ratelimit.MemoryBackend()
+    bench("memory", args.users, args.iterations)
+
+    url = os.environ.get("RATE_LIMIT_REDIS_URL")
+    if url:
+        ratelimit.backend = ratelimit.RedisBackend(url)
+        bench("redis", args.users, max(1, args.iterations // 20))
+    print("For scale: a chat turn spends ~1-10 s in embedding + LLM calls.")
+
+
+if __name__ == "__main__":
+    main()
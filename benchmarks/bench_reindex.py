@@ -0,0 +1,83 @@
+"""
+Embedding work saved by chunk-level re-indexing on typical small edits of paper_text.
+
+    python benchmarks/bench_reindex.py [--pages 12] [--trials 20]
+
+For each edit, counts the chunks whose hash changed (i.e. that need a new embedding)
+with the content-defined chunker in app/core/rag_utils.py, against fixed-size windows
+(the previous chunker), where any insertion or deletion shifts every later boundary.
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+
+def fixed_windows(text, chunk_size=2000, overlap=200):
+    chunks, start = [], 0
+    while start < len(text):
+        chunks.append(text[start:start + chunk_size])
+        start += chunk_size - overlap
+    return chunks
+
+
+def fix_typo(text, rng):
+    i = rng.randrange(len(text) - 1)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def insert_sentence(text, rng):
+    i = text.find("\n", rng.randrange(len(text))) + 1
+    return text[:i] + "We additionally evaluate the method on a held-out benchmark.\n" + text[i:]
+
+
+def delete_paragraph(text, rng):
+    start = text.find("\n", rng.randrange(len(text) // 2)) + 1
+    end = text.find("\n", start + 300) + 1 or len(text)
+    return text[:start] + text[end:]
+
+
+def append_notes(text, rng):
+    return text + "\nNotes: revisit the ablation in section 4 and compare with the baseline.\n"
+
+
+EDITS = [fix_typo, insert_sentence, delete_paragraph, append_notes]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--trials", type=int, default=20)
+    args = parser.parse_args()
+
+    from app.core.pdf_utils import extract_text_from_bytes
+    from app.core.rag_utils import chunk_text, chunk_key
+    from benchmarks.pdfgen import make_pdf
+
+    rng = random.Random(0)
+    print(f"{'edit':<18} {'chunks':>7} {'fixed windows':>14} {'content-defined':>16}")
+    totals = {"fixed": 0, "cdc": 0, "chunks": 0}
+    for edit in EDITS:
+        changed = {"fixed": 0, "cdc": 0}
+        chunks = 0
+        for trial in range(args.trials):
+            text = extract_text_from_bytes(make_pdf(args.pages, 400, seed=trial))
+            edited = edit(text, rng)
+            for name, chunker in (("fixed", fixed_windows), ("cdc", chunk_text)):
+                before = {chunk_key(c) for c in chunker(text)}
+                changed[name] += sum(1 for c in chunker(edited) if chunk_key(c) not in before)
+            chunks += len(chunk_text(edited))
+        print(f"{edit.__name__:<18} {chunks / args.trials:7.1f} {changed['fixed'] / args.trials:14.1f} "
+              f"{changed['cdc'] / args.trials:16.1f}")
+        totals["fixed"] += changed["fixed"]
+        totals["cdc"] += changed["cdc"]
+        totals["chunks"] += chunks
+    print(f"chunk embeddings saved vs. full re-embed: {1 - totals['cdc'] / totals['chunks']:.0%} "
+          f"(fixed windows: {1 - totals['fixed'] / totals['chunks']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
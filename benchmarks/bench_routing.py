@@ -0,0 +1,107 @@
+"""
+Benchmark model routing (app/core/routing.py) against the fake provider.
+
+Replays a mixed workload -- short chat follow-ups, full chat questions with
+retrieved context, and paper summaries -- through the configured routing policy
+and through a static "large model for everything" policy, then reports latency
+and estimated cost per route. A second pass rate-limits the small model to show
+fallbacks.
+
+    python benchmarks/bench_routing.py [--requests 200] [--concurrency 8]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORT = int(os.environ.get("FAKE_PROVIDER_PORT", "9102"))
+BASE_URL = f"http://127.0.0.1:{PORT}"
+os.environ.update({
+    "GROQ_API_KEY": "fake", "COHERE_API_KEY": "fake",
+    "GROQ_BASE_URL": BASE_URL, "COHERE_BASE_URL": BASE_URL,
+    "GROQ_MAX_CONCURRENCY": "32", "COHERE_MAX_CONCURRENCY": "32",
+})
+
+from benchmarks.fake_provider import serve  # noqa: E402
+from app.core import routing  # noqa: E402
+from app.core.providers import groq_provider  # noqa: E402
+
+# Rough latency profile: the large model is several times slower per call
+MODEL_LATENCY_MS = {routing.LARGE_MODEL: 600, routing.SMALL_MODEL: 120, "command-r": 400}
+
+CONTEXT = "Retrieved paper context about transformers and attention. " * 250   # ~3.5k tokens
+PAPER = "Full paper text about diffusion models and sampling. " * 450          # ~6k tokens
+
+WORKLOAD = [
+    ("chat", "What does 'SOTA' mean here?", 0.5),
+    ("chat", "Can you walk me through how the proposed method differs from the baseline "
+             "architecture, which datasets they evaluated on and what the main limitations "
+             "reported in the discussion section are?", 0.3),
+    ("summarize", None, 0.2),
+]
+
+
+def control(**settings):
+    req = urllib.request.Request(f"{BASE_URL}/_control", data=json.dumps(settings).encode(), method="POST")
+    urllib.request.urlopen(req).read()
+
+
+def build_request():
+    roll, acc = random.random(), 0.0
+    for task, query, weight in WORKLOAD:
+        acc += weight
+        if roll <= acc:
+            break
+    if task == "summarize":
+        return task, [{"role": "user", "content": f"Summarize:\n{PAPER}"}], None
+    return task, [{"role": "system", "content": CONTEXT}, {"role": "user", "content": query}], query
+
+
+def run(label: str, policy: routing.RoutingPolicy, requests: int, concurrency: int):
+    random.seed(1234)
+    groq_provider.reset()
+    jobs = [build_request() for _ in range(requests)]
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda job: routing.complete(job[0], job[1], query=job[2], routing_policy=policy), jobs))
+
+    print(f"\n== {label} ==")
+    print(f"{'route':<16}{'model':<26}{'n':>5}{'p50 ms':>9}{'p95 ms':>9}{'cost $/1k req':>15}{'fallbacks':>11}")
+    groups = {}
+    for r in results:
+        groups.setdefault((r.route, r.model), []).append(r)
+    for (route, model), items in sorted(groups.items()):
+        lat = sorted(i.latency_seconds * 1000 for i in items)
+        cost = sum(i.cost_usd for i in items) / len(items) * 1000
+        print(f"{route:<16}{model:<26}{len(items):>5}{lat[len(lat) // 2]:>9.0f}"
+              f"{lat[int(len(lat) * 0.95) - 1]:>9.0f}{cost:>15.4f}{sum(i.fallbacks for i in items):>11}")
+    total_cost = sum(r.cost_usd for r in results)
+    mean_latency = sum(r.latency_seconds for r in results) / len(results) * 1000
+    print(f"total: {len(results)} requests, mean latency {mean_latency:.0f} ms, est. cost ${total_cost:.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    serve(port=PORT, model_latency_ms=MODEL_LATENCY_MS, completion_tokens=150)
+    static = routing.RoutingPolicy.model_validate({
+        "routes": [{"name": task, "task": task, "targets": [{"provider": "groq", "model": routing.LARGE_MODEL}]}
+                   for task in ("chat", "summarize")],
+        "costs": routing.DEFAULT_POLICY["costs"],
+    })
+    run("static: large model for everything", static, args.requests, args.concurrency)
+    run("routed: configured policy", routing.policy, args.requests, args.concurrency)
+
+    control(model_rate_limit_rate={routing.SMALL_MODEL: 1.0})
+    run("routed, small model rate-limited (fallback)", routing.policy, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Serialization time and wire bytes for 1-, 100- and 1000-paper responses.
+
+    python benchmarks/bench_serialization.py [--sizes 1,100,1000] [--repeat 5]
+
+Serialization compares the previous path (load ORM objects, validate each into
+PaperResponse, dump JSON) with the current one (select the PaperResponse columns and
+dump the rows with FastJSONResponse). Wire bytes are those GET /papers/ puts on the
+wire per Accept-Encoding. Runs in-process on a throwaway SQLite database (or DATABASE_URL).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ["RATE_LIMIT_BULK_IMPORT"] = "1000000/second"
+
+
+def fake_text(rng, words=3000):
+    """Text with a realistic vocabulary size, so compression ratios are not flattering."""
+    syllables = ["ka", "to", "ri", "ne", "mo", "sa", "lu", "pe", "di", "vo", "ga", "chi", "ber", "ton", "al"]
+    vocabulary = ["".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(5000)]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1,100,1000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    from fastapi.testclient import TestClient
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+    from app.main import app
+    from app.api.papers import PAPER_COLUMNS
+    from app.core import compression, serialization
+    from app.db.database import SessionLocal
+    from app.models.paper import Paper
+    from app.schemas.paper import PaperResponse
+
+    client = TestClient(app)
+    client.post("/auth/register", json={"email": "bench@example.com", "username": "bench", "password": "bench"})
+    session_id = client.post("/auth/login", json={"username": "bench", "password": "bench"}).json()["session_id"]
+    headers = {"X-Session-ID": session_id}
+
+    rng = random.Random(0)
+    metadata = "\n".join(
+        json.dumps({"title": f"Paper {i}", "authors": "A. Author, B. Author", "paper_text": fake_text(rng)})
+        for i in range(max(sizes))
+    )
+    client.post("/papers/bulk", headers=headers,
+                files={"metadata": ("metadata.jsonl", metadata.encode(), "application/x-ndjson")})
+    db = SessionLocal()
+    db.execute(Paper.__table__.update().values(summary=fake_text(rng, 250)))
+    db.commit()
+    user_id = db.scalar(select(Paper.user_id).limit(1))
+    db.close()
+
+    adapter = TypeAdapter(List[PaperResponse])
+
+    # A fresh session per call, as per request (no warm identity map)
+    def validated(limit):
+        with SessionLocal() as session:
+            papers = session.query(Paper).filter(Paper.user_id == user_id).limit(limit).all()
+            return adapter.dump_json(adapter.validate_python(papers))
+
+    def direct(limit):
+        with SessionLocal() as session:
+            rows = session.execute(select(*PAPER_COLUMNS).where(Paper.user_id == user_id).limit(limit)).all()
+            return serialization.dumps(serialization.rows_as_dicts(rows))
+
+    encoder = "orjson" if serialization.orjson is not None else "pydantic-core"
+    print(f"serialization (query + encode, best of {args.repeat}; direct path uses {encoder})")
+    print(f"{'papers':>7} {'validated':>12} {'direct':>12} {'speedup':>8}")
+    for size in sizes:
+        assert json.loads(validated(size)) == json.loads(direct(size))
+        slow = best_of(args.repeat, lambda: validated(size))
+        fast = best_of(args.repeat, lambda: direct(size))
+        print(f"{size:>7} {slow * 1000:10.2f}ms {fast * 1000:10.2f}ms {slow / fast:7.1f}x")
+
+    encodings = ["identity", "gzip"] + (["br"] if compression.brotli is not None else [])
+    print("\nwire bytes for GET /papers/?limit=N")
+    print(f"{'papers':>7} " + " ".join(f"{encoding:>14}" for encoding in encodings))
+    for size in sizes:
+        cells = []
+        for encoding in encodings:
+            resp = client.get(f"/papers/?limit={size}", headers={**headers, "Accept-Encoding": encoding})
+            assert len(resp.json()) == size
+            wire = resp.num_bytes_downloaded
+            cells.append(f"{wire / 1024:11.1f}KiB")
+            if encoding == "identity":
+                identity = wire
+            else:
+                cells[-1] = f"{wire / 1024:7.1f}KiB {100 * wire / identity:3.0f}%"
+        print(f"{size:>7} " + " ".join(f"{cell:>14}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+API time per Streamlit interaction: the old client calls against api_client.PaperNestClient.
+
+    python benchmarks/bench_streamlit_client.py [--papers 30] [--interactions 100] [--edit-every 10]
+                                                [--think 0.5] [--latency-ms 0]
+
+Starts the API with uvicorn on a throwaway SQLite database and replays a session in
+which every interaction reruns the page. The old client made a fresh requests.get per
+call: the papers list once per tab, plus one GET /usage/me to be comparable. The new
+client shares a pooled session, fetches both concurrently and caches reads. Every
+--edit-every interactions the user edits a paper (a mutation, which expires the cache).
+--think is the pause between interactions, which decides how often reads come from the
+cache. --latency-ms delays each request on the server, standing in for a remote API.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, timeout=30.0):
+    import requests
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+# Delays every request, so the run resembles a client talking to a remote API
+LATENCY_APP = """
+import asyncio, os
+from app.main import app
+delay = float(os.environ["BENCH_LATENCY_MS"]) / 1000
+@app.middleware("http")
+async def _latency(request, call_next):
+    await asyncio.sleep(delay)
+    return await call_next(request)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--papers", type=int, default=30)
+    parser.add_argument("--interactions", type=int, default=100)
+    parser.add_argument("--edit-every", type=int, default=10)
+    parser.add_argument("--think", type=float, default=0.5, help="seconds between interactions")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import requests
+    from api_client import PaperNestClient, make_session
+
+    workdir = tempfile.mkdtemp()
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{workdir}/bench.db", BENCH_LATENCY_MS=str(args.latency_ms),
+               PYTHONPATH=os.pathsep.join([ROOT, workdir]))
+    with open(os.path.join(workdir, "bench_app.py"), "w") as fh:
+        fh.write(LATENCY_APP)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench_app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_for(base + "/health")
+        requests.post(base + "/auth/register", json={"email": "b@example.com", "username": "bench", "password": "bench"})
+        session_id = requests.post(base + "/auth/login", json={"username": "bench", "password": "bench"}).json()["session_id"]
+        headers = {"X-Session-ID": session_id}
+        ids = [requests.post(base + "/papers/", headers=headers,
+                             json={"title": f"Paper {i}", "paper_text": "lorem ipsum dolor " * 1000}).json()["id"]
+               for i in range(args.papers)]
+
+        def edit(patch, n):
+            patch(f"/papers/{ids[n % len(ids)]}", json={"status": "READING" if (n // args.edit_every) % 2 else "DONE"})
+
+        def old_render():
+            requests.get(base + "/papers/", headers=headers)  # "My Papers" tab
+            requests.get(base + "/usage/me", headers=headers)
+            requests.get(base + "/papers/", headers=headers)  # "Chat" tab
+
+        client = PaperNestClient(base, session=make_session())
+        client.set_session(session_id)
+
+        def new_render():
+            client.get_many(["/papers/", "/usage/me"])
+
+        def replay(render, patch):
+            timings = []
+            for n in range(args.interactions):
+                if args.edit_every and n % args.edit_every == args.edit_every - 1:
+                    edit(patch, n)
+                start = time.perf_counter()
+                render()
+                timings.append(time.perf_counter() - start)
+                time.sleep(args.think)
+            return timings
+
+        def old_patch(path, json):
+            requests.patch(base + path, headers=headers, json=json)
+
+        print(f"{args.papers} papers, {args.interactions} interactions, {args.think}s think time, "
+              f"{args.latency_ms:.0f} ms server latency, an edit every {args.edit_every}")
+        results = {}
+        for label, render, patch in (("requests.get", old_render, old_patch),
+                                     ("PaperNestClient", new_render, client.patch)):
+            timings = replay(render, patch)
+            results[label] = statistics.mean(timings)
+            p95 = sorted(timings)[int(0.95 * (len(timings) - 1))]
+            print(f"{label:<16} mean {statistics.mean(timings) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms per render")
+        old, new = results.values()
+        print(f"speedup: {old / new:.1f}x")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Exercise the provider layer (app/core/providers.py) against the fake provider
+under injected latency and failures, and report how it behaves.
+
+    python benchmarks/check_resilience.py
+
+Scenarios: healthy, flaky (retries), hanging (deadlines), outage (circuit breaker)
+and saturation (concurrency limit).
+"""
+import json
+import os
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORT = int(os.environ.get("FAKE_PROVIDER_PORT", "9101"))
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+os.environ.update({
+    "GROQ_API_KEY": "fake", "COHERE_API_KEY": "fake",
+    "GROQ_BASE_URL": BASE_URL, "COHERE_BASE_URL": BASE_URL,
+    "GROQ_TIMEOUT_SECONDS": "2", "GROQ_MAX_RETRIES": "3", "GROQ_MAX_CONCURRENCY": "4",
+    "GROQ_QUEUE_TIMEOUT_SECONDS": "0.5",
+    "GROQ_CIRCUIT_FAILURE_THRESHOLD": "5", "GROQ_CIRCUIT_RESET_SECONDS": "2",
+})
+
+from benchmarks.fake_provider import serve  # noqa: E402
+from app.core.providers import groq_provider, ProviderError  # noqa: E402
+from app.core.routing import LARGE_MODEL, _complete_groq  # noqa: E402
+
+
+def control(**settings) -> dict:
+    req = urllib.request.Request(f"{BASE_URL}/_control", data=json.dumps(settings).encode(), method="POST")
+    with urllib.request.urlopen(req) as resp:
+        return json.load(resp)
+
+
+def server_stats() -> dict:
+    with urllib.request.urlopen(f"{BASE_URL}/_stats") as resp:
+        return json.load(resp)
+
+
+def one_call():
+    start = time.perf_counter()
+    try:
+        # Single target on purpose: model fallback is covered by bench_routing.py
+        _complete_groq(LARGE_MODEL, [{"role": "user", "content": "Summarize: some paper text"}])
+        outcome = "ok"
+    except ProviderError as exc:
+        outcome = type(exc).__name__
+    return outcome, time.perf_counter() - start
+
+
+def run(name: str, calls: int, concurrency: int, **faults):
+    groq_provider.reset()
+    settings = dict(latency_ms=20, jitter_ms=0, failure_rate=0, rate_limit_rate=0, hang_rate=0, hang_seconds=30)
+    settings.update(faults)
+    control(reset_stats=True, **settings)
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda _: one_call(), range(calls)))
+    outcomes = {}
+    for outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    latencies = sorted(elapsed for _, elapsed in results)
+    upstream = server_stats()
+    print(f"{name:<12} outcomes={outcomes} "
+          f"p50={latencies[len(latencies) // 2] * 1000:.0f}ms max={latencies[-1] * 1000:.0f}ms "
+          f"upstream_calls={upstream['requests']} max_in_flight={upstream['max_in_flight']} "
+          f"breaker={groq_provider.breaker_for(LARGE_MODEL).state}")
+
+
+def main():
+    serve(port=PORT)
+    run("healthy", calls=40, concurrency=4)
+    run("flaky", calls=40, concurrency=4, failure_rate=0.3)
+    run("rate-limited", calls=40, concurrency=4, rate_limit_rate=0.3)
+    run("hanging", calls=8, concurrency=4, hang_rate=1.0, hang_seconds=10)
+    run("outage", calls=40, concurrency=4, failure_rate=1.0)
+    run("saturated", calls=40, concurrency=16, latency_ms=400)
+
+
+if __name__ == "__main__":
+    main()
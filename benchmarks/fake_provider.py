@@ -0,0 +1,229 @@
+"""
+Local fake Groq + Cohere server with injectable latency and failures.
+
+Implements just enough of both APIs for the app's clients:
+  POST /openai/v1/chat/completions   (Groq, OpenAI-compatible)
+  POST /v1/embed                     (Cohere v1 embed)
+  POST /v1/chat                      (Cohere v1 chat, used as a fallback provider)
+  GET/POST /_control                 (read / change fault injection at runtime)
+  GET /_stats                        (request counters)
+
+Usage:
+    python benchmarks/fake_provider.py --port 9100 --latency-ms 200 --failure-rate 0.1
+
+Then point the app at it:
+    GROQ_BASE_URL=http://127.0.0.1:9100 COHERE_BASE_URL=http://127.0.0.1:9100 \
+    GROQ_API_KEY=fake COHERE_API_KEY=fake uvicorn app.main:app
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIM = 384
+
+config = {
+    "latency_ms": 0.0,        # base latency added to every call
+    "jitter_ms": 0.0,         # uniform extra latency in [0, jitter_ms]
+    "failure_rate": 0.0,      # fraction of calls answered with `failure_status`
+    "failure_status": 503,
+    "rate_limit_rate": 0.0,   # fraction of calls answered with 429
+    "hang_rate": 0.0,         # fraction of calls that sleep `hang_seconds` (client timeouts)
+    "hang_seconds": 30.0,
+    "tokens_per_ms": 0.0,     # if > 0, completion latency also scales with completion size
+    "completion_tokens": 64,  # size of every fake completion
+    "model_latency_ms": {},   # extra latency per model, e.g. {"llama-3.3-70b-versatile": 800}
+    "model_rate_limit_rate": {},  # extra 429 probability per model
+}
+stats = {"requests": 0, "failures": 0, "rate_limited": 0, "hung": 0, "in_flight": 0, "max_in_flight": 0,
+         "by_model": {}}
+_lock = threading.Lock()
+
+
+def fake_embedding(text: str):
+    """Deterministic bag-of-hashed-words vector so similarity search behaves sensibly."""
+    vec = [0.0] * EMBEDDING_DIM
+    for word in text.lower().split():
+        digest = hashlib.blake2b(word.encode(), digest_size=4).digest()
+        vec[int.from_bytes(digest, "little") % EMBEDDING_DIM] += 1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _inject_faults(self, model: str = "") -> bool:
+        """Apply latency / failures. Returns True if a response was already sent."""
+        with _lock:
+            stats["requests"] += 1
+            if model:
+                stats["by_model"][model] = stats["by_model"].get(model, 0) + 1
+        extra_ms = config["model_latency_ms"].get(model, 0)
+        time.sleep((config["latency_ms"] + extra_ms + random.uniform(0, config["jitter_ms"])) / 1000.0)
+        roll = random.random()
+        if roll < config["hang_rate"]:
+            with _lock:
+                stats["hung"] += 1
+            time.sleep(config["hang_seconds"])
+        roll = random.random()
+        rate_limit_rate = config["rate_limit_rate"] + config["model_rate_limit_rate"].get(model, 0)
+        if roll < rate_limit_rate:
+            with _lock:
+                stats["rate_limited"] += 1
+            self._send(429, {"message": "rate limited (injected)"}, {"Retry-After": "1"})
+            return True
+        if roll < rate_limit_rate + config["failure_rate"]:
+            with _lock:
+                stats["failures"] += 1
+            self._send(int(config["failure_status"]), {"message": "injected failure"})
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path == "/_control":
+            self._send(200, config)
+        elif self.path == "/_stats":
+            with _lock:
+                self._send(200, json.loads(json.dumps(stats)))
+        else:
+            self._send(404, {"message": "not found"})
+
+    def do_POST(self):
+        if self.path == "/_control":
+            body = self._read_json()
+            if body.pop("reset_stats", False):
+                with _lock:
+                    stats.update({"requests": 0, "failures": 0, "rate_limited": 0, "hung": 0,
+                                  "max_in_flight": stats["in_flight"], "by_model": {}})
+            config.update({k: v for k, v in body.items() if k in config})
+            self._send(200, config)
+            return
+        handlers = {"/v1/embed": self._embed, "/v1/chat": self._cohere_chat}
+        handler = self._chat_completion if self.path.endswith("/chat/completions") else handlers.get(self.path)
+        if handler is None:
+            self._send(404, {"message": "not found"})
+            return
+        with _lock:
+            stats["in_flight"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            handler(self._read_json())
+        finally:
+            with _lock:
+                stats["in_flight"] -= 1
+
+    def _completion_latency(self):
+        if config["tokens_per_ms"] > 0:
+            time.sleep(config["completion_tokens"] / config["tokens_per_ms"] / 1000.0)
+
+    def _chat_completion(self, body: dict):
+        model = body.get("model", "")
+        if self._inject_faults(model):
+            return
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+        self._completion_latency()
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = int(config["completion_tokens"])
+        self._send(200, {
+            "id": f"chatcmpl-{random.getrandbits(48):x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "Fake answer. " * (completion_tokens // 3)},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def _cohere_chat(self, body: dict):
+        model = body.get("model", "")
+        if self._inject_faults(model):
+            return
+        self._completion_latency()
+        completion_tokens = int(config["completion_tokens"])
+        self._send(200, {
+            "response_id": f"{random.getrandbits(48):x}",
+            "generation_id": f"{random.getrandbits(48):x}",
+            "text": "Fake answer. " * (completion_tokens // 3),
+            "finish_reason": "COMPLETE",
+            "meta": {"billed_units": {
+                "input_tokens": count_tokens((body.get("message") or "") + (body.get("preamble") or "")),
+                "output_tokens": completion_tokens,
+            }},
+        })
+
+    def _embed(self, body: dict):
+        if self._inject_faults(body.get("model", "")):
+            return
+        texts = body.get("texts") or []
+        self._send(200, {
+            "id": f"{random.getrandbits(48):x}",
+            "response_type": "embeddings_floats",
+            "embeddings": [fake_embedding(t) for t in texts],
+            "texts": texts,
+            "meta": {"api_version": {"version": "1"},
+                     "billed_units": {"input_tokens": sum(count_tokens(t) for t in texts)}},
+        })
+
+
+def serve(host: str = "127.0.0.1", port: int = 9100, **overrides) -> ThreadingHTTPServer:
+    """Start the fake provider in a background thread (for benchmark scripts)."""
+    config.update({k: v for k, v in overrides.items() if k in config})
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-provider", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    for key, value in config.items():
+        kind = json.loads if isinstance(value, dict) else type(value)
+        parser.add_argument(f"--{key.replace('_', '-')}", type=kind, default=value)
+    args = parser.parse_args()
+    config.update({k: getattr(args, k) for k in config})
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    print(f"Fake Groq/Cohere provider on http://{args.host}:{args.port} with {config}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
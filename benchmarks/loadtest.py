@@ -0,0 +1,459 @@
+"""
+Load test for the whole API against a local database and stubbed AI providers.
+
+    python benchmarks/loadtest.py                                  # all scenarios, fresh SQLite
+    python benchmarks/loadtest.py --concurrency 16 --requests 400 --provider-latency-ms 300
+    python benchmarks/loadtest.py --database-url postgresql://...  # an (empty) Postgres database
+    python benchmarks/loadtest.py --output run.json --save-baseline benchmarks/baseline.json
+    python benchmarks/loadtest.py --baseline benchmarks/baseline.json   # exit 1 on regressions
+    python benchmarks/loadtest.py --workers 4 --database-url postgresql://...  # gunicorn, 4 workers
+
+Starts the fake Groq/Cohere server (benchmarks/fake_provider.py) and the API under
+uvicorn in a subprocess (gunicorn.conf.py with --workers N), seeds --users users with --papers papers each, then runs each
+scenario in turn with --concurrency client threads:
+
+  register_login  POST /auth/register + POST /auth/login for new users
+  list            GET /papers/
+  detail          GET /papers/{id}
+  upload          POST /papers/upload with generated PDFs of each --pdf-pages size
+  summarize       POST /papers/{id}/summarize
+  chat            POST /papers/{id}/chat
+  abandon         chat and summarize from clients that give up after --abandon-after-ms
+                  (a user leaving the page, a proxy timeout)
+
+Per endpoint it reports throughput, p50/p95/p99 latency, errors and the peak RSS of
+the server (including its worker processes) while that scenario ran. For abandon,
+requests count as errors only if they were answered, and it also reports the calls
+the fake provider received per request, counted until the server has settled; work
+cancelled on disconnect (app/core/deadlines.py) keeps that close to the one call in
+flight when the client left. Results are
+written as JSON; with --baseline each endpoint is compared and throughput drops or
+p95 increases beyond --tolerance are reported as regressions.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import psutil  # noqa: E402
+import requests  # noqa: E402
+
+from benchmarks.fake_provider import serve  # noqa: E402
+from benchmarks.pdfgen import make_pdf  # noqa: E402
+
+SCENARIOS = ("register_login", "list", "detail", "upload", "summarize", "chat", "abandon")
+WORDS = ("model training data results method network layer retrieval gradient loss benchmark "
+         "encoder decoder latency experiment ablation analysis baseline accuracy dataset").split()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def paper_text(rng: random.Random, words: int = 1500) -> str:
+    # Unique per paper, so summaries are not served from the dedup cache
+    return f"Paper {rng.getrandbits(64):x}. " + " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+class RssSampler:
+    """Samples the RSS of a process tree in the background and keeps the peak since reset()."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _rss(self) -> int:
+        total = 0
+        for proc in [self.process, *self.process.children(recursive=True)]:
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.peak = max(self.peak, self._rss())
+            except psutil.Error:
+                pass
+            self._stop.wait(self.interval)
+
+    def reset(self) -> None:
+        self.peak = self._rss()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[Tuple[float, bool]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((seconds, ok))
+
+
+def timed(recorder: Recorder, endpoint: str, call: Callable[[], requests.Response], ok_status=(200,)):
+    start = time.perf_counter()
+    try:
+        resp = call()
+        ok = resp.status_code in ok_status
+    except requests.RequestException:
+        resp, ok = None, False
+    recorder.record(endpoint, time.perf_counter() - start, ok)
+    return resp
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.base = None
+        self.rng = random.Random(args.seed)
+        self.run_id = f"{int(time.time())}{random.getrandbits(16):x}"
+        self.users: List[dict] = []  # {"headers", "paper_ids"}
+        self._local = threading.local()
+        self._counter = itertools.count()
+
+    def http(self) -> requests.Session:
+        # One keep-alive session per client thread
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    # --- setup ------------------------------------------------------------
+
+    def register_and_login(self, recorder: Optional[Recorder] = None) -> dict:
+        n = next(self._counter)
+        username = f"load{self.run_id}u{n}"
+        credentials = {"username": username, "password": "loadtest-password"}
+        http = self.http()
+        register = lambda: http.post(f"{self.base}/auth/register", timeout=60,
+                                     json={"email": f"{username}@example.com", **credentials})
+        login = lambda: http.post(f"{self.base}/auth/login", json=credentials, timeout=60)
+        if recorder is None:
+            register()
+            resp = login()
+        else:
+            timed(recorder, "POST /auth/register", register, ok_status=(201,))
+            resp = timed(recorder, "POST /auth/login", login)
+        if resp is None or resp.status_code != 200:
+            raise RuntimeError(f"Login failed: {resp.text if resp is not None else 'no response'}")
+        return {"headers": {"X-Session-ID": resp.json()["session_id"]}, "paper_ids": []}
+
+    def seed(self) -> None:
+        for _ in range(self.args.users):
+            user = self.register_and_login()
+            for i in range(self.args.papers):
+                resp = self.http().post(f"{self.base}/papers/", headers=user["headers"], timeout=60, json={
+                    "title": f"Seed paper {i}", "authors": "Load Test", "paper_text": paper_text(self.rng),
+                })
+                resp.raise_for_status()
+                user["paper_ids"].append(resp.json()["id"])
+            self.users.append(user)
+
+    # --- scenarios --------------------------------------------------------
+
+    def _pick(self, rng: random.Random) -> Tuple[dict, int]:
+        user = rng.choice(self.users)
+        return user, rng.choice(user["paper_ids"])
+
+    def op_register_login(self, recorder, rng, i):
+        self.register_and_login(recorder)
+
+    def op_list(self, recorder, rng, i):
+        user = rng.choice(self.users)
+        timed(recorder, "GET /papers/", lambda: self.http().get(f"{self.base}/papers/", headers=user["headers"], timeout=60))
+
+    def op_detail(self, recorder, rng, i):
+        user, paper_id = self._pick(rng)
+        timed(recorder, "GET /papers/{id}",
+              lambda: self.http().get(f"{self.base}/papers/{paper_id}", headers=user["headers"], timeout=60))
+
+    def op_upload(self, recorder, rng, i):
+        user = rng.choice(self.users)
+        pages = self.args.pdf_pages[i % len(self.args.pdf_pages)]
+        pdf = self.pdfs[pages][i // len(self.args.pdf_pages) % len(self.pdfs[pages])]
+        timed(recorder, f"POST /papers/upload ({pages}p)", lambda: self.http().post(
+            f"{self.base}/papers/upload", headers=user["headers"], timeout=120,
+            files={"file": (f"load-{i}.pdf", pdf, "application/pdf")},
+            data={"title": f"Uploaded {i}", "authors": "Load Test"},
+        ), ok_status=(200, 201))
+
+    def op_summarize(self, recorder, rng, i):
+        user, paper_id = self._pick(rng)
+        timed(recorder, "POST /papers/{id}/summarize",
+              lambda: self.http().post(f"{self.base}/papers/{paper_id}/summarize", headers=user["headers"], timeout=120))
+
+    def op_chat(self, recorder, rng, i):
+        user, paper_id = self._pick(rng)
+        question = f"What does the paper say about {rng.choice(WORDS)}?"
+        timed(recorder, "POST /papers/{id}/chat", lambda: self.http().post(
+            f"{self.base}/papers/{paper_id}/chat", headers=user["headers"], timeout=120, data={"query": question}))
+
+    def op_abandon(self, recorder, rng, i):
+        user, paper_id = self._pick(rng)
+        timeout = (3.05, self.args.abandon_after_ms / 1000)
+        if i % 2:
+            endpoint, path, data = "POST /papers/{id}/summarize (abandoned)", f"/papers/{paper_id}/summarize", None
+        else:
+            question = f"What does the paper say about {rng.choice(WORDS)}?"
+            endpoint, path, data = "POST /papers/{id}/chat (abandoned)", f"/papers/{paper_id}/chat", {"query": question}
+        start = time.perf_counter()
+        try:
+            self.http().post(f"{self.base}{path}", headers=user["headers"], timeout=timeout, data=data)
+            ok = False  # answered before the client gave up: nothing was abandoned
+        except requests.Timeout:
+            ok = True
+        except requests.RequestException:
+            ok = False
+        recorder.record(endpoint, time.perf_counter() - start, ok)
+
+    def upstream_calls(self) -> int:
+        return requests.get(f"{self.provider_url}/_stats", timeout=5).json()["requests"]
+
+    def settle(self, quiet: float = 3.0, timeout: float = 300.0) -> None:
+        """Wait until the fake provider has had no call in flight and no new call for `quiet` seconds."""
+        deadline = time.monotonic() + timeout
+        last, since = None, time.monotonic()
+        while time.monotonic() < deadline:
+            stats = requests.get(f"{self.provider_url}/_stats", timeout=5).json()
+            if stats["requests"] != last or stats["in_flight"]:
+                last, since = stats["requests"], time.monotonic()
+            elif time.monotonic() - since >= quiet:
+                return
+            time.sleep(0.25)
+
+    def run_scenario(self, name: str, sampler: RssSampler) -> Dict[str, dict]:
+        op = getattr(self, f"op_{name}")
+        recorder = Recorder()
+        total = self.args.requests
+        rngs = [random.Random(self.args.seed * 1000 + i) for i in range(total)]
+        sampler.reset()
+        calls_before = self.upstream_calls()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            list(pool.map(lambda i: op(recorder, rngs[i], i), range(total)))
+        wall = time.perf_counter() - start
+        peak_rss = sampler.peak
+        upstream = None
+        if name == "abandon":
+            # Let the server finish (or drop) the work of the requests that were given up
+            self.settle()
+            upstream = round((self.upstream_calls() - calls_before) / total, 2)
+        results = {}
+        for endpoint, samples in recorder.samples.items():
+            latencies = sorted(seconds for seconds, _ in samples)
+            results[endpoint] = {
+                "scenario": name,
+                "requests": len(samples),
+                "errors": sum(1 for _, ok in samples if not ok),
+                "throughput_rps": round(len(samples) / wall, 2),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                "peak_rss_mb": round(peak_rss / 2 ** 20, 1),
+            }
+            if upstream is not None:
+                results[endpoint]["upstream_calls_per_request"] = upstream
+        return results
+
+    # --- driver -----------------------------------------------------------
+
+    def server_env(self, provider_url: str, workdir: str) -> dict:
+        unlimited = "1000000/second"
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_URL": self.args.database_url or f"sqlite:///{workdir}/loadtest.db",
+            "BLOB_STORE_DIR": os.path.join(workdir, "blobs"),
+            "GROQ_API_KEY": "fake", "COHERE_API_KEY": "fake",
+            "GROQ_BASE_URL": provider_url, "COHERE_BASE_URL": provider_url,
+            "RATE_LIMIT_CHAT": unlimited, "RATE_LIMIT_SUMMARIZE": unlimited,
+            "RATE_LIMIT_UPLOAD": unlimited, "RATE_LIMIT_BULK_IMPORT": unlimited,
+            "DAILY_LLM_TOKEN_BUDGET": str(10 ** 12), "DAILY_EMBEDDING_CALL_BUDGET": str(10 ** 12),
+            "HOST_CACHE_DIR": os.path.join(workdir, "hostcache"),
+            "WEB_CONCURRENCY": str(self.args.workers),
+            "PYTHONPATH": ROOT,
+        })
+        return env
+
+    def run(self) -> dict:
+        args = self.args
+        provider_port = free_port()
+        provider = serve(port=provider_port, latency_ms=args.provider_latency_ms, jitter_ms=args.provider_jitter_ms)
+        self.provider_url = f"http://127.0.0.1:{provider_port}"
+        workdir = tempfile.mkdtemp(prefix="papernest-loadtest-")
+        port = free_port()
+        self.base = f"http://127.0.0.1:{port}"
+        if args.workers:
+            command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app",
+                       "--bind", f"127.0.0.1:{port}", "--log-level", "warning"]
+        else:
+            command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+        server = subprocess.Popen(
+            command,
+            cwd=ROOT, env=self.server_env(self.provider_url, workdir),
+            stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL,
+        )
+        sampler = None
+        try:
+            self._wait_until_up(server)
+            sampler = RssSampler(server.pid)
+            print(f"🌱 Seeding {args.users} users x {args.papers} papers")
+            self.seed()
+            self.pdfs = {pages: [make_pdf(pages=pages, seed=seed) for seed in range(8)] for pages in args.pdf_pages}
+            endpoints = {}
+            for name in args.scenarios:
+                print(f"🏃 {name}: {args.requests} operations, concurrency {args.concurrency}")
+                endpoints.update(self.run_scenario(name, sampler))
+        finally:
+            if sampler is not None:
+                sampler.stop()
+            server.terminate()
+            server.wait()
+            provider.shutdown()
+        return {"meta": self.meta(), "endpoints": endpoints}
+
+    def _wait_until_up(self, server: subprocess.Popen, timeout: float = 60.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError("API server exited during startup (run with --verbose)")
+            try:
+                requests.get(f"{self.base}/health", timeout=1)
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError("API server did not start")
+
+    def meta(self) -> dict:
+        args = self.args
+        try:
+            commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                    text=True).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "database": "postgresql" if (args.database_url or "").startswith("postgres") else "sqlite",
+            "config": {key: getattr(args, key) for key in (
+                "scenarios", "concurrency", "requests", "users", "papers", "pdf_pages",
+                "provider_latency_ms", "provider_jitter_ms", "abandon_after_ms", "seed", "workers")},
+        }
+
+
+def print_results(results: dict) -> None:
+    print(f"\n{'endpoint':<32} {'req':>5} {'err':>4} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'RSS MB':>8}")
+    for endpoint, r in results["endpoints"].items():
+        print(f"{endpoint:<32} {r['requests']:>5} {r['errors']:>4} {r['throughput_rps']:>8.1f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['peak_rss_mb']:>8.1f}")
+    abandoned = [r for r in results["endpoints"].values() if "upstream_calls_per_request" in r]
+    if abandoned:
+        print(f"\nabandon: {abandoned[0]['upstream_calls_per_request']:.2f} upstream calls per abandoned request")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Print per-endpoint changes against the baseline; returns the regressions."""
+    regressions = []
+    print(f"\nvs baseline {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')}), "
+          f"tolerance {tolerance:.0%}")
+    for endpoint, current in results["endpoints"].items():
+        before = baseline["endpoints"].get(endpoint)
+        if before is None:
+            print(f"{endpoint:<32} (new)")
+            continue
+        rps_change = current["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0.0
+        p95_change = current["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rss_change = current["peak_rss_mb"] - before["peak_rss_mb"]
+        flags = []
+        if rps_change < -tolerance:
+            flags.append("throughput")
+        if p95_change > tolerance:
+            flags.append("p95")
+        if current["errors"] > before["errors"]:
+            flags.append("errors")
+        marker = f"  ❌ REGRESSION ({', '.join(flags)})" if flags else ""
+        print(f"{endpoint:<32} rps {rps_change:+7.1%}  p95 {p95_change:+7.1%}  RSS {rss_change:+7.1f} MB{marker}")
+        if flags:
+            regressions.append(endpoint)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="operations per scenario")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--papers", type=int, default=20, help="seeded papers per user")
+    parser.add_argument("--pdf-pages", default="1,10,50", help="page counts of the uploaded PDFs")
+    parser.add_argument("--provider-latency-ms", type=float, default=200.0)
+    parser.add_argument("--provider-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--abandon-after-ms", type=float, default=100.0,
+                        help="read timeout of the abandon scenario's clients")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="run the API under gunicorn with this many workers (default: a single uvicorn process)")
+    parser.add_argument("--database-url", help="default: a fresh SQLite file")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="loadtest-results.json")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--save-baseline", help="also write the results here")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative throughput / p95 change")
+    parser.add_argument("--verbose", action="store_true", help="show the server's log output")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    args.pdf_pages = [int(pages) for pages in args.pdf_pages.split(",")]
+
+    results = LoadTest(args).run()
+    print_results(results)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"💾 Wrote {path}")
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
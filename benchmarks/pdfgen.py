@@ -0,0 +1,59 @@
+"""
+Generate simple text PDFs for benchmarks and load tests (no third-party dependencies).
+
+    from benchmarks.pdfgen import make_pdf
+    pdf_bytes = make_pdf(pages=10, words_per_page=400, seed=1)
+"""
+import random
+
+_WORDS = (
+    "attention transformer model training dataset baseline results accuracy network layer "
+    "embedding retrieval gradient optimization loss evaluation benchmark architecture encoder "
+    "decoder inference latency throughput parameter experiment ablation analysis method paper "
+    "section figure table proposed approach performance improvement related work conclusion"
+).split()
+
+
+def _page_stream(words, line_width: int = 12) -> bytes:
+    lines = [" ".join(words[i:i + line_width]) for i in range(0, len(words), line_width)]
+    ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+    for line in lines:
+        ops.append(f"({line}) Tj T*")
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def make_pdf(pages: int = 1, words_per_page: int = 300, seed: int = 0) -> bytes:
+    """Build a valid multi-page PDF whose pages contain pseudo-random words."""
+    rng = random.Random(seed)
+    objects = []  # object bodies, numbered from 1
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # placeholder, filled once the page ids are known
+    page_ids = []
+    for _ in range(pages):
+        stream = _page_stream([rng.choice(_WORDS) for _ in range(words_per_page)])
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref)
+    return bytes(out)
@@ -0,0 +1,57 @@
+"""
+Production server: gunicorn managing uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+- Workers: WEB_CONCURRENCY, default 2. Each worker is a full copy of the app with its
+  own PDF extraction process pool, so size it to the machine's memory as well as its
+  cores (LLM waits run in threads inside each worker, so a few workers go a long way).
+- The app is imported once in the master before forking (PRELOAD_APP, default true):
+  tables are created once, and read-only state (settings, schemas, compiled regexes,
+  the JSON encoder) is shared copy-on-write. Database connections are never shared:
+  each worker opens its own pool after the fork.
+- Graceful reload: `kill -HUP <master>` starts new workers and lets the old ones finish
+  their requests (within GRACEFUL_TIMEOUT). With preloading, new code is only picked up
+  by a new master: `kill -USR2 <master>` starts one next to the old, then `kill -QUIT`
+  the old master once the new one is up.
+- Caches shared by the workers of a host live in app/core/hostcache.py; sessions are
+  in the database, so any worker can serve any request.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = os.environ.get("PRELOAD_APP", "true").lower() in ("1", "true", "yes")
+
+timeout = int(os.environ.get("WORKER_TIMEOUT", "120"))  # summarize / chat wait on the LLM
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("KEEPALIVE", "5"))
+# Recycle workers now and then to bound memory growth (0 = never)
+max_requests = int(os.environ.get("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get("ACCESS_LOG") or None
+errorlog = "-"
+
+# Each worker gets its own PDF extraction process pool; split the cores between them
+os.environ.setdefault("INGEST_EXTRACT_WORKERS", str(max(1, multiprocessing.cpu_count() // max(1, workers))))
+
+
+def post_fork(server, worker):
+    # Connections opened in the master (create_all at import) must not be used by children
+    from app.db.database import engine
+    from app.core import pipeline
+    engine.dispose(close=False)
+    # The worker's own id for leasing the papers it processes, so a crashed or recycled
+    # worker's papers are taken over by the others (see app/core/pipeline.py)
+    pipeline.owner_id()
+
+
+def when_ready(server):
+    server.log.info(f"PaperNest ready with {server.cfg.workers} workers")
+    if server.cfg.workers > 1 and not os.environ.get("RATE_LIMIT_REDIS_URL"):
+        server.log.warning(
+            "Rate limits and /metrics are per worker; set RATE_LIMIT_REDIS_URL to share rate limits"
+        )
@@ -1,7 +1,8 @@
 import streamlit as st
-import requests
 from datetime import datetime
 
+from api_client import PaperNestClient, make_session
+
 # Configuration
 import os
 # Configuration
@@ -20,6 +21,21 @@ if "session_id" not in st.session_state:
 if "username" not in st.session_state:
     st.session_state.username = None
 
+
+@st.cache_resource
+def http_session():
+    """Connection pool shared by all browser sessions (keep-alive instead of a new connection per call)"""
+    return make_session()
+
+
+# Per browser session: login + read cache (see api_client.py)
+if "api" not in st.session_state:
+    st.session_state.api = PaperNestClient(API_URL, session=http_session())
+api = st.session_state.api
+if api.session_id != st.session_state.session_id:
+    api.set_session(st.session_state.session_id)
+
+
 # Sidebar - Authentication
 with st.sidebar:
     st.title("🔐 Authentication")
@@ -34,13 +50,9 @@ with st.sidebar:
             
             if st.button("Login", type="primary"):
                 try:
-                    resp = requests.post(
-                        f"{API_URL}/auth/login",
-                        json={"username": login_username, "password": login_password}
-                    )
+                    resp = api.login(login_username, login_password)
                     if resp.status_code == 200:
-                        data = resp.json()
-                        st.session_state.session_id = data["session_id"]
+                        st.session_state.session_id = api.session_id
                         st.session_state.username = login_username
                         st.success("✅ Logged in successfully!")
                         st.rerun()
@@ -61,14 +73,7 @@ with st.sidebar:
             
             if st.button("Register", type="primary"):
                 try:
-                    resp = requests.post(
-                        f"{API_URL}/auth/register",
-                        json={
-                            "email": reg_email,
-                            "username": reg_username,
-                            "password": reg_password
-                        }
-                    )
+                    resp = api.register(reg_email, reg_username, reg_password)
                     if resp.status_code == 201:
                         st.success("✅ Registered! Please login.")
                     else:
@@ -84,6 +89,7 @@ with st.sidebar:
         if st.button("Logout", type="secondary"):
             st.session_state.session_id = None
             st.session_state.username = None
+            api.set_session(None)
             st.rerun()
 
 # Main app
@@ -93,8 +99,18 @@ if not st.session_state.session_id:
     st.info("👈 Please login or register to continue")
     st.stop()
 
-# Headers for authenticated requests
-headers = {"X-Session-ID": st.session_state.session_id}
+# Everything this page shows, fetched concurrently (and once, though two tabs use the list)
+try:
+    (papers_status, papers), (usage_status, usage) = api.get_many(["/papers/", "/usage/me"])
+except Exception as e:
+    st.error(f"❌ Connection Error: {str(e)}")
+    st.stop()
+
+if usage_status == 200:
+    st.sidebar.caption(
+        f"🤖 AI usage today: {usage['llm_tokens']:,} / {usage['llm_token_budget']:,} tokens, "
+        f"{usage['embedding_calls']:,} / {usage['embedding_call_budget']:,} embedding calls"
+    )
 
 # Create tabs
 tab1, tab2, tab3 = st.tabs(["📄 My Papers", "➕ Add New Paper", "💬 Chat with Paper"])
@@ -104,9 +120,7 @@ with tab1:
     st.header("My Research Papers")
     
     try:
-        resp = requests.get(f"{API_URL}/papers/", headers=headers)
-        if resp.status_code == 200:
-            papers = resp.json()
+        if papers_status == 200:
             
             if not papers:
                 st.info("No papers yet. Add your first paper in the 'Add New Paper' tab!")
@@ -134,6 +148,50 @@ with tab1:
                     filtered_papers = [p for p in filtered_papers if p["priority"] == priority_filter]
                 
                 st.write(f"Showing {len(filtered_papers)} papers")
+
+                # Bulk actions on everything currently shown (one request each)
+                if filtered_papers:
+                    with st.expander(f"⚡ Bulk actions on {len(filtered_papers)} shown papers"):
+                        shown_ids = [p["id"] for p in filtered_papers]
+                        bcol1, bcol2, bcol3 = st.columns(3)
+                        with bcol1:
+                            bulk_status = st.selectbox("Set status", ["—", "TO_READ", "READING", "DONE"])
+                        with bcol2:
+                            bulk_priority = st.selectbox("Set priority", ["—", "LOW", "MEDIUM", "HIGH"])
+                        with bcol3:
+                            if st.button("Apply to shown papers"):
+                                changes = {}
+                                if bulk_status != "—":
+                                    changes["status"] = bulk_status
+                                if bulk_priority != "—":
+                                    changes["priority"] = bulk_priority
+                                if changes:
+                                    resp = api.patch(
+                                        "/papers/bulk",
+                                        json={"where": {"ids": shown_ids}, "changes": changes}
+                                    )
+                                    if resp.status_code == 200:
+                                        st.success(f"✅ Updated {resp.json()['affected']} papers")
+                                        st.rerun()
+                                    else:
+                                        st.error(f"Failed: {resp.json().get('detail')}")
+                            # Keyed by the selection, so changing the filters clears the confirmation
+                            confirm_delete = st.checkbox(
+                                f"Yes, delete {len(shown_ids)} papers",
+                                key=f"confirm_bulk_delete_{hash(tuple(shown_ids))}"
+                            )
+                            if st.button(f"🗑️ Delete {len(shown_ids)} shown papers", type="secondary",
+                                         disabled=not confirm_delete):
+                                resp = api.delete(
+                                    "/papers/bulk",
+                                    json={"where": {"ids": shown_ids}}
+                                )
+                                if resp.status_code == 200:
+                                    st.success(f"✅ Deleted {resp.json()['affected']} papers")
+                                    st.rerun()
+                                else:
+                                    st.error(f"Failed: {resp.json().get('detail')}")
+
                 st.divider()
                 
                 # Display papers
@@ -148,6 +206,11 @@ with tab1:
                             if paper.get('categories'):
                                 st.write(f"**Categories:** {paper['categories']}")
                             st.write(f"**Created:** {paper['created_at'][:10]}")
+                            state = paper.get('processing_state', 'ready')
+                            if state not in ("ready", "failed"):
+                                st.info(f"⏳ Processing: {state}…")
+                            elif state == "failed" or paper.get('processing_error'):
+                                st.warning(f"⚠️ {paper.get('processing_error') or 'Processing failed'}")
                             
                             if paper.get('paper_text'):
                                 st.write("**Paper Text:**")
@@ -156,14 +219,14 @@ with tab1:
                             if paper.get('summary'):
                                 st.success("**AI Summary:**")
                                 st.write(paper['summary'])
-                            else:
-                                if st.button("🤖 Generate AI Summary", key=f"summarize_{paper['id']}"):
+                                if paper.get('summary_stale'):
+                                    st.warning("The paper text was edited after this summary was generated.")
+                            if not paper.get('summary') or paper.get('summary_stale'):
+                                label = "🔄 Regenerate AI Summary" if paper.get('summary') else "🤖 Generate AI Summary"
+                                if st.button(label, key=f"summarize_{paper['id']}"):
                                     with st.spinner("Generating summary... (10-15 sec first time)"):
                                         try:
-                                            resp = requests.post(
-                                                f"{API_URL}/papers/{paper['id']}/summarize",
-                                                headers=headers
-                                            )
+                                            resp = api.post(f"/papers/{paper['id']}/summarize", slow=True)
                                             if resp.status_code == 200:
                                                 st.success("✅ Summary generated!")
                                                 st.rerun()
@@ -175,10 +238,7 @@ with tab1:
                         with col2:
                             if st.button("🗑️ Delete", key=f"delete_{paper['id']}", type="secondary"):
                                 try:
-                                    resp = requests.delete(
-                                        f"{API_URL}/papers/{paper['id']}",
-                                        headers=headers
-                                    )
+                                    resp = api.delete(f"/papers/{paper['id']}")
                                     if resp.status_code == 204:
                                         st.success("✅ Deleted!")
                                         st.rerun()
@@ -187,7 +247,7 @@ with tab1:
                                 except Exception as e:
                                     st.error(f"Error: {str(e)}")
         else:
-            st.error(f"Failed to fetch papers: {resp.status_code}")
+            st.error(f"Failed to fetch papers: {papers_status}")
     except Exception as e:
         st.error(f"Error: {str(e)}")
 
@@ -239,17 +299,16 @@ with tab2:
                             "priority": priority,
                             "categories": categories if categories else ""
                         }
-                        resp = requests.post(
-                            f"{API_URL}/papers/upload",
-                            headers=headers,
+                        resp = api.post(
+                            "/papers/upload",
+                            slow=True,
                             files=files,
                             data=data
                         )
                     else:
                         # Manual entry endpoint
-                        resp = requests.post(
-                            f"{API_URL}/papers/",
-                            headers=headers,
+                        resp = api.post(
+                            "/papers/",
                             json={
                                 "title": title,
                                 "authors": authors,
@@ -260,8 +319,11 @@ with tab2:
                             }
                         )
                     
-                    if resp.status_code == 201:
-                        st.success("✅ Paper added successfully!")
+                    if resp.status_code in (200, 201):
+                        if resp.json().get("processing_state") not in (None, "ready"):
+                            st.success("✅ Paper uploaded! Text extraction and summary are running in the background.")
+                        else:
+                            st.success("✅ Paper added successfully!")
                         st.balloons()
                         st.rerun()
                     else:
@@ -279,9 +341,7 @@ with tab3:
     
     # 1. Select Paper
     try:
-        resp = requests.get(f"{API_URL}/papers/", headers=headers)
-        if resp.status_code == 200:
-            papers = resp.json()
+        if papers_status == 200:
             if not papers:
                 st.info("No papers available to chat with.")
             else:
@@ -333,9 +393,10 @@ with tab3:
                             message_placeholder = st.empty()
                             with st.spinner("Thinking..."):
                                 try:
-                                    resp = requests.post(
-                                        f"{API_URL}/papers/{selected_paper_id}/chat",
-                                        headers=headers,
+                                    resp = api.post(
+                                        f"/papers/{selected_paper_id}/chat",
+                                        slow=True,
+                                        invalidate=False,
                                         data={"query": prompt}
                                     )
                                     if resp.status_code == 200:
@@ -0,0 +1,81 @@
+"""
+Test setup: a throwaway SQLite database and cache directories, configured before the
+app is imported (settings are read at import time). No AI provider is called.
+
+    pip install -r requirements-dev.txt && python -m pytest
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_workdir = tempfile.mkdtemp(prefix="papernest-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/test.db"
+os.environ["HOST_CACHE_DIR"] = os.path.join(_workdir, "hostcache")
+os.environ["EMBED_CACHE_DIR"] = os.path.join(_workdir, "embeddings")
+os.environ["BLOB_STORE_DIR"] = os.path.join(_workdir, "blobs")
+os.environ["INGEST_EXTRACT_WORKERS"] = "0"
+for _key in ("GROQ_API_KEY", "COHERE_API_KEY", "RATE_LIMIT_REDIS_URL"):
+    os.environ.pop(_key, None)
+
+from app.db.database import Base, SessionLocal, engine  # noqa: E402
+from app.models import embedding, insights, paper, session, user  # noqa: E402,F401
+from app.core.security import hash_password  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+Base.metadata.create_all(bind=engine)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def make_user(db):
+    """Factory for users with unique names."""
+    created = []
+
+    def make(name: str = "user") -> User:
+        username = f"{name}{len(created)}-{os.urandom(4).hex()}"
+        account = User(email=f"{username}@example.com", username=username,
+                       hashed_password=hash_password("password123"))
+        db.add(account)
+        db.commit()
+        created.append(account)
+        return account
+    return make
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers(db, make_user):
+    """Factory: X-Session-ID headers for a new user (or the given one)."""
+    from app.core.sessions import create_session
+
+    def headers(account: User = None) -> dict:
+        account = account or make_user()
+        return {"X-Session-ID": create_session(account.id, db)}
+    return headers
@@ -0,0 +1,126 @@
+import io
+import json
+import zipfile
+
+import numpy as np
+import pytest
+
+from app.core import pipeline
+from app.core.archive import FORMAT, VERSION, ArchiveError, export_library, import_library
+from app.core.blobstore import get_blob_store
+from app.core.rag_utils import EMBED_MODEL, chunk_key
+from app.models.embedding import ChunkEmbedding
+from app.models.paper import Paper, PriorityEnum, StatusEnum
+
+
+def _export(user_id: int, **options) -> io.BytesIO:
+    return io.BytesIO(b"".join(export_library(user_id, **options)))
+
+
+def _archive(papers, manifest=None, extra=None) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("manifest.json", json.dumps(manifest or {"format": FORMAT, "version": VERSION}))
+        archive.writestr("papers.jsonl", "".join(json.dumps(paper) + "\n" for paper in papers))
+        for name, data in (extra or {}).items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def _library(db, user_id: int):
+    return db.query(Paper).filter(Paper.user_id == user_id).order_by(Paper.id).all()
+
+
+def test_export_import_round_trip(db, make_user):
+    owner, other = make_user(), make_user()
+    pdf_key, _ = get_blob_store().put(io.BytesIO(b"%PDF-1.4 round trip"))
+    db.add_all([
+        Paper(title="With text", authors="A. Author", status=StatusEnum.READING, priority=PriorityEnum.HIGH,
+              categories="ml", paper_text="Body of the paper.", summary="Short.", pdf_sha256=pdf_key,
+              user_id=owner.id),
+        Paper(title="Title only", user_id=owner.id),
+    ])
+    db.commit()
+
+    papers, queued, pdfs = import_library(_export(owner.id, pdfs=True), other.id, db)
+
+    assert (papers, pdfs) == (2, 1)
+    with_text, title_only = _library(db, other.id)
+    assert (with_text.title, with_text.authors, with_text.status, with_text.priority, with_text.categories) == \
+        ("With text", "A. Author", StatusEnum.READING, PriorityEnum.HIGH, "ml")
+    assert (with_text.paper_text, with_text.summary, with_text.pdf_sha256) == ("Body of the paper.", "Short.", pdf_key)
+    assert title_only.paper_text is None
+    # Only papers with text need embedding, and only that stage
+    assert queued == [with_text.id]
+    assert (with_text.processing_state, with_text.processing_stages) == (pipeline.QUEUED, pipeline.EMBED)
+    assert title_only.processing_state == pipeline.READY
+
+
+def test_import_never_writes_archived_embeddings(db, make_user):
+    user = make_user()
+    key = chunk_key("A chunk some other user's paper also contains.")
+    archive = _archive(
+        [{"title": "Planted", "paper_text": "A chunk some other user's paper also contains."}],
+        manifest={"format": FORMAT, "version": VERSION, "embedding_model": EMBED_MODEL},
+        extra={"embeddings/00000.txt": key, "embeddings/00000.npy": _npy(np.ones((1, 7), dtype=np.float32))},
+    )
+
+    papers, queued, _ = import_library(archive, user.id, db)
+
+    assert papers == 1 and len(queued) == 1
+    assert db.query(ChunkEmbedding).filter(ChunkEmbedding.chunk_sha256 == key).count() == 0
+
+
+def test_import_links_only_pdfs_shipped_in_the_archive(db, make_user):
+    user = make_user()
+    import_library(_archive([{"title": "Claims a PDF", "pdf_sha256": "f" * 64}]), user.id, db)
+    assert _library(db, user.id)[0].pdf_sha256 is None
+
+
+@pytest.mark.parametrize("archive, message", [
+    (io.BytesIO(b"not a zip"), "Not a zip archive"),
+    (_archive([], manifest={"format": "something-else"}), "Not a PaperNest library archive"),
+    (_archive([], manifest={"format": FORMAT, "version": VERSION + 1}), "newer than this server supports"),
+    (_archive([{"title": "Fine"}, {"authors": "No title"}]), "Invalid paper on line 2"),
+])
+def test_import_rejects_invalid_archives(db, make_user, archive, message):
+    user = make_user()
+    with pytest.raises(ArchiveError, match=message):
+        import_library(archive, user.id, db)
+    db.rollback()
+    assert _library(db, user.id) == []
+
+
+def test_import_endpoint_queues_imported_text_for_embedding(client, auth_headers, make_user, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(pipeline, "submit_text", lambda *args: submitted.append(args))
+    user = make_user()
+    archive = _archive([{"title": "One", "paper_text": "Some text."}, {"title": "Two"}])
+
+    resp = client.post("/papers/import", headers=auth_headers(user),
+                       files={"archive": ("library.zip", archive.getvalue(), "application/zip")})
+
+    assert resp.status_code == 201, resp.text
+    assert resp.json() == {"papers": 2, "queued": 1, "pdfs": 0}
+    assert len(submitted) == 1 and submitted[0][1:] == (user.id, pipeline.EMBED)
+
+
+def test_import_endpoint_submits_queued_papers_in_batches(client, auth_headers, make_user, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(pipeline, "submit_text", lambda paper_ids, *args: submitted.append(paper_ids))
+    monkeypatch.setattr(pipeline, "TEXT_BATCH_SIZE", 2)
+    user = make_user()
+    archive = _archive([{"title": f"P{i}", "paper_text": f"Text {i}."} for i in range(5)])
+
+    resp = client.post("/papers/import", headers=auth_headers(user),
+                       files={"archive": ("library.zip", archive.getvalue(), "application/zip")})
+
+    assert resp.json()["queued"] == 5
+    assert [len(batch) for batch in submitted] == [2, 2, 1]
+
+
+def _npy(matrix: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.lib.format.write_array(buffer, matrix, allow_pickle=False)
+    return buffer.getvalue()
@@ -0,0 +1,147 @@
+import io
+import os
+import sys
+import types
+
+import pytest
+
+from app.core import blobstore
+from app.core.blobstore import BlobStore, BlobTooLarge, LocalBlobStore, S3BlobStore, get_blob_store
+from app.core.dedup import sha256_bytes
+from app.models.paper import Paper
+
+
+def test_backends_must_implement_the_interface():
+    class Partial(BlobStore):
+        def put(self, source):
+            return "", 0
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_local_put_is_content_addressed(tmp_path, monkeypatch):
+    monkeypatch.setattr(blobstore, "CHUNK_SIZE", 4)  # several chunks
+    store = LocalBlobStore(str(tmp_path))
+    data = b"%PDF-1.4 some bytes"
+
+    key, size = store.put(io.BytesIO(data))
+    again, _ = store.put(io.BytesIO(data))
+
+    assert (key, size) == (sha256_bytes(data), len(data)) and again == key
+    assert store.local_path(key) == os.path.join(str(tmp_path), key[:2], key[2:4], key)
+    with store.open(key) as blob:
+        assert blob.read() == data
+    assert list(store.keys()) == [key] and store.size(key) == len(data)
+    assert os.listdir(tmp_path / "tmp") == []
+
+    store.delete(key)
+    assert not store.exists(key) and store.local_path(key) is None
+
+
+def test_oversized_blob_is_refused_and_leaves_nothing_behind(tmp_path, monkeypatch):
+    monkeypatch.setattr(blobstore, "CHUNK_SIZE", 4)
+    monkeypatch.setattr(blobstore, "MAX_BLOB_BYTES", 10)
+    store = LocalBlobStore(str(tmp_path))
+
+    with pytest.raises(BlobTooLarge):
+        store.put(io.BytesIO(b"x" * 11))
+
+    assert os.listdir(tmp_path / "tmp") == []
+    assert list(store.keys()) == []
+    assert store.put(io.BytesIO(b"x" * 10))[1] == 10
+
+
+def test_pdf_download_supports_range(client, auth_headers, db, make_user):
+    user = make_user()
+    data = b"%PDF-1.4 " + bytes(range(256)) * 4
+    key, _ = get_blob_store().put(io.BytesIO(data))
+    paper = Paper(title="Ranged", user_id=user.id, pdf_sha256=key)
+    db.add(paper)
+    db.commit()
+    headers = auth_headers(user)
+
+    whole = client.get(f"/papers/{paper.id}/pdf", headers=headers)
+    part = client.get(f"/papers/{paper.id}/pdf", headers={**headers, "Range": "bytes=9-18"})
+
+    assert whole.status_code == 200 and whole.content == data
+    assert whole.headers["content-type"] == "application/pdf"
+    assert part.status_code == 206 and part.content == data[9:19]
+    assert part.headers["content-range"] == f"bytes 9-18/{len(data)}"
+
+
+def test_oversized_upload_is_413(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(blobstore, "MAX_BLOB_BYTES", 16)
+    resp = client.post("/papers/upload", headers=auth_headers(), data={"title": "Huge"},
+                       files={"file": ("huge.pdf", b"%PDF-1.4 " + b"x" * 64, "application/pdf")})
+    assert resp.status_code == 413
+
+
+class FakeS3:
+    """The boto3 S3 client calls S3BlobStore makes, against a dict."""
+
+    class exceptions:
+        class ClientError(Exception):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise self.exceptions.ClientError("404")
+        return {"ContentLength": len(self.objects[Bucket, Key])}
+
+    def upload_fileobj(self, fileobj, bucket, key):
+        self.objects[bucket, key] = fileobj.read()
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[Bucket, Key])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def get_paginator(self, operation):
+        objects = self.objects
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                yield {"Contents": [{"Key": key} for bucket, key in sorted(objects)
+                                    if bucket == Bucket and key.startswith(Prefix)]}
+
+        return Paginator()
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.example/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    client = FakeS3()
+    monkeypatch.setitem(sys.modules, "boto3", types.SimpleNamespace(client=lambda service, endpoint_url: client))
+    return client
+
+
+def test_s3_key_layout(s3):
+    store = S3BlobStore("papers", prefix="pdfs/")
+    data = b"%PDF-1.4 in a bucket"
+
+    key, size = store.put(io.BytesIO(data))
+    store.put(io.BytesIO(data))  # already there: not uploaded again
+
+    assert list(s3.objects) == [("papers", f"pdfs/{key}")] and size == len(data)
+    assert list(store.keys()) == [key]
+    assert store.exists(key) and store.size(key) == len(data)
+    assert store.open(key).read() == data
+    assert store.local_path(key) is None
+    assert store.presigned_url(key, filename="Paper.pdf") == f"https://s3.example/papers/pdfs/{key}?expires=3600"
+    with store.local_copy(key) as path:
+        assert open(path, "rb").read() == data
+    assert not os.path.exists(path)
+
+
+def test_s3_refuses_oversized_blobs(s3, monkeypatch):
+    monkeypatch.setattr(blobstore, "MAX_BLOB_BYTES", 4)
+    with pytest.raises(BlobTooLarge):
+        S3BlobStore("papers", prefix="pdfs/").put(io.BytesIO(b"too big"))
+    assert s3.objects == {}
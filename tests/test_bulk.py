@@ -0,0 +1,147 @@
+import io
+import json
+import time
+import zipfile
+
+from benchmarks.pdfgen import make_pdf
+
+from app.api import bulk
+from app.core import pipeline, prefetch
+from app.models.paper import Paper, StatusEnum
+
+
+def _wait_for(client, headers, job_id: str, timeout: float = 30.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/papers/bulk/{job_id}", headers=headers).json()
+        if job["state"] == "completed" or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_bulk_import_queues_rows_and_processes_them_through_the_pipeline(client, auth_headers, db):
+    headers = auth_headers()
+    pdf = make_pdf(pages=2, words_per_page=60, seed=7)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.pdf", pdf)
+        zf.writestr("copy-of-a.pdf", pdf)
+        zf.writestr("broken.pdf", b"not a pdf")
+        zf.writestr("metadata.jsonl", json.dumps({"title": "Notes", "paper_text": "Imported text."}) + "\n")
+
+    resp = client.post("/papers/bulk", headers=headers,
+                       files={"files": ("papers.zip", archive.getvalue(), "application/zip")})
+
+    assert resp.status_code == 202, resp.text
+    created = {item["title"]: item["paper_id"] for item in resp.json()["items"]}
+    assert set(created) == {"Notes", "a", "copy-of-a", "broken"}
+    # Resumable from the start: the PDF is stored and the row queued, not "ready" without text
+    row = db.get(Paper, created["a"])
+    assert row.pdf_sha256 is not None
+    assert row.paper_text or row.processing_state in (pipeline.QUEUED, pipeline.EXTRACTING)
+
+    job = _wait_for(client, headers, resp.json()["job_id"])
+    states = {item["title"]: item["state"] for item in job["items"]}
+    assert job["state"] == "completed"
+    assert states == {"Notes": "done", "a": "done", "copy-of-a": "done", "broken": "failed"}
+    db.expire_all()
+    a, copy = db.get(Paper, created["a"]), db.get(Paper, created["copy-of-a"])
+    assert a.paper_text and a.paper_text == copy.paper_text
+    assert a.content_sha256 == a.pdf_sha256 == copy.pdf_sha256
+    assert db.get(Paper, created["broken"]).processing_state == pipeline.FAILED
+
+
+def test_bulk_import_status_is_private_to_the_importing_user(client, auth_headers):
+    headers = auth_headers()
+    resp = client.post("/papers/bulk", headers=headers,
+                       files={"metadata": ("m.jsonl", json.dumps({"title": "Only title"}), "application/json")})
+    assert resp.status_code == 202, resp.text
+    job_id = resp.json()["job_id"]
+
+    assert client.get(f"/papers/bulk/{job_id}", headers=headers).json()["state"] == "completed"
+    assert client.get(f"/papers/bulk/{job_id}", headers=auth_headers()).status_code == 404
+
+
+def test_bulk_update_prefetches_the_rows_it_moved_out_of_the_filter(client, auth_headers, db, make_user,
+                                                                    monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(prefetch, "schedule", lambda paper_ids: scheduled.extend(paper_ids))
+    user = make_user()
+    papers = [Paper(title=f"P{i}", user_id=user.id, status=StatusEnum.TO_READ) for i in range(3)]
+    db.add_all(papers)
+    db.commit()
+
+    resp = client.patch("/papers/bulk", headers=auth_headers(user),
+                        json={"where": {"status": "TO_READ"}, "changes": {"status": "READING"}})
+
+    assert resp.json() == {"affected": 3}
+    assert sorted(scheduled) == sorted(paper.id for paper in papers)
+
+
+def test_bulk_operations_only_touch_the_callers_papers(client, auth_headers, db, make_user):
+    me, someone = make_user(), make_user()
+    mine = Paper(title="Mine", user_id=me.id, status=StatusEnum.TO_READ)
+    theirs = Paper(title="Theirs", user_id=someone.id, status=StatusEnum.TO_READ)
+    db.add_all([mine, theirs])
+    db.commit()
+    headers = auth_headers(me)
+
+    resp = client.patch("/papers/bulk", headers=headers,
+                        json={"where": {"ids": [mine.id, theirs.id]}, "changes": {"status": "DONE"}})
+    assert resp.json() == {"affected": 1}
+    resp = client.request("DELETE", "/papers/bulk", headers=headers, json={"where": {"status": "TO_READ"}})
+    assert resp.json() == {"affected": 0}  # mine is DONE now, theirs is not mine
+
+    db.expire_all()
+    assert db.get(Paper, mine.id).status == StatusEnum.DONE
+    assert db.get(Paper, theirs.id).status == StatusEnum.TO_READ
+
+
+def test_bulk_category_filter_matches_literally(client, auth_headers, db, make_user):
+    user = make_user()
+    db.add_all([Paper(title="Percent", user_id=user.id, categories="100%_sure"),
+                Paper(title="Other", user_id=user.id, categories="100 percent sure")])
+    db.commit()
+
+    resp = client.patch("/papers/bulk", headers=auth_headers(user),
+                        json={"where": {"category": "100%_"}, "changes": {"priority": "HIGH"}})
+
+    assert resp.json() == {"affected": 1}
+
+
+def test_bulk_operations_need_a_filter(client, auth_headers, monkeypatch):
+    headers = auth_headers()
+    resp = client.request("DELETE", "/papers/bulk", headers=headers, json={"where": {}})
+    assert resp.status_code == 400
+    monkeypatch.setattr(bulk, "MAX_ITEMS", 2)
+    resp = client.patch("/papers/bulk", headers=headers,
+                        json={"where": {"ids": [1, 2, 3]}, "changes": {"status": "DONE"}})
+    assert resp.status_code == 400
+
+
+def _zip(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_bulk_import_rejects_bad_uploads_with_400(client, auth_headers):
+    headers = auth_headers()
+    pdf = make_pdf(pages=1, words_per_page=20, seed=3)
+    cases = [
+        ([("files", ("broken.zip", b"not a zip", "application/zip"))], "'broken.zip' is not a valid zip"),
+        ([("files", ("a.zip", _zip({"a.pdf": pdf, "metadata.jsonl": b"\xff\xfe{"}), "application/zip"))],
+         "metadata.jsonl in 'a.zip' is not UTF-8"),
+        ([("files", ("a.pdf", pdf, "application/pdf")), ("metadata", ("m.jsonl", b"\xff", "text/plain"))],
+         "m.jsonl is not UTF-8"),
+        ([("files", ("a.pdf", pdf, "application/pdf")), ("files", ("a.pdf", pdf, "application/pdf"))],
+         "Duplicate file name 'a.pdf'"),
+        ([("files", ("a.pdf", pdf, "application/pdf")), ("files", ("b.zip", _zip({"a.pdf": pdf}), "application/zip"))],
+         "Duplicate file name 'a.pdf'"),
+    ]
+    for files, detail in cases:
+        resp = client.post("/papers/bulk", headers=headers, files=files)
+        assert resp.status_code == 400, resp.text
+        assert detail in resp.json()["detail"]
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from app.core.rag_utils import chunk_key, chunk_text, iter_chunk_spans
+
+CHUNK_SIZE, OVERLAP = 2000, 200
+
+
+def _paper(words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(500)]
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(6, 25))
+        sentences.append(" ".join(rng.choices(vocabulary, k=length)).capitalize() + ".")
+        sentences.append("\n" if rng.random() < 0.1 else " ")
+        words -= length
+    return "".join(sentences)
+
+
+@pytest.mark.parametrize("text", [
+    _paper(5000),
+    _paper(300, seed=1),
+    "x" * 7000,                    # one "word" longer than any chunk
+    "line\n" * 2000,
+    "Ünïcödé — text. " * 400,
+])
+def test_spans_cover_the_text_with_bounded_overlap(text):
+    spans = list(iter_chunk_spans(text, CHUNK_SIZE, OVERLAP))
+
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    for (start, end), (next_start, next_end) in zip(spans, spans[1:]):
+        # Each chunk starts with at most `overlap` characters of the previous one, and no gap
+        assert start < next_start <= end < next_end
+        assert end - next_start <= OVERLAP
+    for start, end in spans:
+        assert end - start <= CHUNK_SIZE * 3 // 2 + OVERLAP
+
+
+def test_empty_text_has_no_chunks():
+    assert list(iter_chunk_spans("")) == []
+    assert chunk_text("") == []
+
+
+def test_chunk_text_stops_at_limit():
+    text = _paper(5000)
+    everything = chunk_text(text)
+    assert len(everything) > 3
+    assert chunk_text(text, limit=3) == everything[:3]
+
+
+def test_edit_only_changes_the_chunks_around_it():
+    text = _paper(8000, seed=2)
+    middle = text.index(". ", len(text) // 2) + 2
+    edited = text[:middle] + "An inserted sentence that was not there before. " + text[middle:]
+
+    before = {chunk_key(chunk) for chunk in chunk_text(text)}
+    after = {chunk_key(chunk) for chunk in chunk_text(edited)}
+
+    assert len(before) > 10
+    # Fixed-size chunks would shift every boundary after the edit
+    assert len(after - before) <= 3
+    assert len(before & after) >= len(before) - 3
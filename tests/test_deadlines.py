@@ -0,0 +1,117 @@
+import threading
+import time
+
+import anyio
+import pytest
+from fastapi import HTTPException
+
+from app.api import papers as papers_api
+from app.core import deadlines
+from app.core.deadlines import Deadline, RequestCancelled, request_deadline, run
+from app.core.providers import Provider
+from app.models.paper import Paper
+
+
+class FakeRequest:
+    """The parts of a Starlette Request that request_deadline() and run() use."""
+
+    def __init__(self, headers=None, disconnect_after=None):
+        self.headers = headers or {}
+        self.scope = {}
+        self.url = type("URL", (), {"path": "/papers/1/chat"})()
+        self.disconnect_after = disconnect_after
+
+    async def receive(self):
+        if self.disconnect_after is None:
+            await anyio.sleep_forever()
+        await anyio.sleep(self.disconnect_after)
+        return {"type": "http.disconnect"}
+
+
+def _deadline(headers) -> Deadline:
+    return anyio.run(request_deadline, FakeRequest(headers))
+
+
+def test_header_sets_the_deadline_and_is_clamped(monkeypatch):
+    monkeypatch.setattr(deadlines, "DEFAULT_SECONDS", 120.0)
+    monkeypatch.setattr(deadlines, "MAX_SECONDS", 300.0)
+
+    assert _deadline({}).seconds == 120.0
+    assert _deadline({deadlines.HEADER: "2.5"}).seconds == 2.5
+    assert _deadline({deadlines.HEADER: "3600"}).seconds == 300.0
+    monkeypatch.setattr(deadlines, "DEFAULT_SECONDS", 900.0)
+    assert _deadline({}).seconds == 300.0
+
+
+@pytest.mark.parametrize("value", ["0", "-1", "soon", "nan", ""])
+def test_header_must_be_a_positive_number(value):
+    with pytest.raises(HTTPException) as raised:
+        _deadline({deadlines.HEADER: value})
+    assert raised.value.status_code == 400
+
+
+def test_run_returns_the_result_and_binds_the_deadline():
+    deadline = Deadline(10.0)
+
+    result = anyio.run(run, FakeRequest(), deadline, lambda: deadlines.current())
+
+    assert result is deadline
+    assert deadlines.current() is None
+
+
+def test_client_disconnect_cancels_the_work():
+    deadline = Deadline(10.0)
+    started = time.monotonic()
+
+    def wait_for_provider():
+        deadlines.current().sleep(5.0)  # e.g. a retry backoff
+        return "never"
+
+    with pytest.raises(RequestCancelled):
+        anyio.run(run, FakeRequest(disconnect_after=0.05), deadline, wait_for_provider)
+
+    assert deadline.cancelled
+    assert time.monotonic() - started < 2.0
+
+
+def test_result_paid_for_is_returned_after_a_disconnect():
+    deadline = Deadline(10.0)
+    in_flight = threading.Event()
+
+    def provider_call_in_flight():
+        in_flight.set()
+        deadline._cancelled.wait(5.0)
+        return "summary"
+
+    assert anyio.run(run, FakeRequest(disconnect_after=0.05), deadline, provider_call_in_flight) == "summary"
+    assert in_flight.is_set() and deadline.cancelled
+
+
+def test_missed_deadline_answers_504(client, auth_headers, db, make_user, monkeypatch):
+    provider = Provider("slow", timeout=30.0, max_retries=3, max_concurrency=2,
+                        failure_threshold=5, reset_timeout=30.0, backoff_base=0.01)
+
+    class ReadTimeout(Exception):
+        pass
+
+    def slow_upstream(timeout: float):
+        time.sleep(timeout)
+        raise ReadTimeout("read timed out")
+
+    monkeypatch.setattr(papers_api, "summarize_text", lambda text: provider.call(slow_upstream))
+    user = make_user()
+    paper = Paper(title="Slow", paper_text="Text nobody else has summarized, for the deadline test.",
+                  user_id=user.id)
+    db.add(paper)
+    db.commit()
+    before = deadlines.REQUESTS_ABANDONED.value(endpoint="/papers/{paper_id}/summarize", reason="deadline")
+
+    headers = {**auth_headers(user), deadlines.HEADER: "0.2"}
+    resp = client.post(f"/papers/{paper.id}/summarize", headers=headers)
+
+    assert resp.status_code == 504, resp.text
+    assert "deadline" in resp.json()["detail"]
+    assert provider.breaker.state == "closed"  # the request ran out of time, not the provider
+    assert deadlines.REQUESTS_ABANDONED.value(endpoint="/papers/{paper_id}/summarize", reason="deadline") == before + 1
+    db.refresh(paper)
+    assert paper.summary is None
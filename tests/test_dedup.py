@@ -0,0 +1,94 @@
+import pytest
+
+from benchmarks.pdfgen import make_pdf
+
+from app.core import pipeline
+from app.core.dedup import known_extractions, sha256_bytes, text_sha256
+from app.models.paper import Paper
+
+TEXT = "Extracted once, by whoever uploaded this PDF first."
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    calls = []
+    monkeypatch.setattr(pipeline, "submit", lambda *args, **kwargs: calls.append(args))
+    return calls
+
+
+def _donor(db, user, pdf: bytes, **values) -> Paper:
+    paper = Paper(title="Donor", user_id=user.id, paper_text=TEXT, text_sha256=text_sha256(TEXT),
+                  content_sha256=sha256_bytes(pdf), pdf_sha256=sha256_bytes(pdf), summary="A summary.",
+                  **values)
+    db.add(paper)
+    db.commit()
+    return paper
+
+
+def _upload(client, headers, pdf: bytes, title: str = "Upload"):
+    return client.post("/papers/upload", headers=headers, data={"title": title},
+                       files={"file": ("paper.pdf", pdf, "application/pdf")})
+
+
+def test_reupload_of_own_pdf_returns_the_existing_paper(client, auth_headers, db, make_user, submitted):
+    user = make_user()
+    pdf = make_pdf(pages=1, words_per_page=30, seed=11)
+    donor = _donor(db, user, pdf)
+
+    resp = _upload(client, auth_headers(user), pdf, title="Same PDF again")
+
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["id"] == donor.id
+    assert submitted == []
+
+
+def test_pdf_uploaded_by_someone_else_reuses_their_extraction(client, auth_headers, db, make_user, submitted):
+    pdf = make_pdf(pages=1, words_per_page=30, seed=12)
+    _donor(db, make_user(), pdf)
+    user = make_user()
+
+    resp = _upload(client, auth_headers(user), pdf)
+
+    assert resp.status_code == 201, resp.text
+    paper = resp.json()
+    assert (paper["paper_text"], paper["summary"], paper["processing_state"]) == (TEXT, "A summary.", pipeline.READY)
+    assert submitted == []
+
+
+def test_stale_summary_is_not_reused(client, auth_headers, db, make_user, submitted):
+    pdf = make_pdf(pages=1, words_per_page=30, seed=13)
+    _donor(db, make_user(), pdf, summary_stale=True)
+
+    paper = _upload(client, auth_headers(make_user()), pdf).json()
+
+    assert paper["paper_text"] == TEXT and paper["summary"] is None
+
+
+def test_edited_paper_is_never_a_donor(client, auth_headers, db, make_user, submitted):
+    pdf = make_pdf(pages=1, words_per_page=30, seed=14)
+    owner = make_user()
+    donor = _donor(db, owner, pdf)
+    resp = client.patch(f"/papers/{donor.id}", headers=auth_headers(owner),
+                        json={"paper_text": TEXT + " Private notes of the owner."})
+    assert resp.status_code == 200
+    db.refresh(donor)
+    assert donor.content_sha256 is None
+
+    user = make_user()
+    paper = _upload(client, auth_headers(user), pdf).json()
+
+    assert paper["paper_text"] is None and paper["processing_state"] == pipeline.QUEUED
+    assert [args[1:] for args in submitted] == [(user.id, sha256_bytes(pdf))]
+    assert known_extractions(db, [sha256_bytes(pdf)]) == {}
+
+
+def test_known_extractions_skips_edited_papers(db, make_user):
+    user = make_user()
+    pdf, other_pdf = make_pdf(pages=1, seed=15), make_pdf(pages=1, seed=16)
+    _donor(db, user, pdf)
+    edited = _donor(db, user, other_pdf)
+    edited.paper_text, edited.content_sha256 = "Edited.", None
+    db.commit()
+
+    assert known_extractions(db, [sha256_bytes(pdf), sha256_bytes(other_pdf)]) == \
+        {sha256_bytes(pdf): (TEXT, "A summary.")}
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.core import embedcache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedcache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(embedcache, "_mapped", embedcache.OrderedDict())
+    return tmp_path
+
+
+def _index(rows: int = 6, cols: int = 8):
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(rows, cols)).astype(np.float32)
+    spans = np.array([(i * 10, i * 10 + 10) for i in range(rows)])
+    return matrix, spans
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_store_and_load_round_trip(cache_dir, monkeypatch, dtype):
+    monkeypatch.setattr(embedcache, "DTYPE", dtype)
+    matrix, spans = _index()
+    embedcache.store("paper", matrix, spans)
+    monkeypatch.setattr(embedcache, "_mapped", embedcache.OrderedDict())  # map it from the file
+
+    index = embedcache.load("paper")
+
+    assert index is not None and len(index) == 6
+    assert index.spans.tolist() == spans.tolist()
+    query = embedcache.normalize(matrix[3:4])[0]
+    assert index.search(query, top_k=2)[0] == 3
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: b"",                         # empty
+    lambda data: data[:7],                    # shorter than the header
+    lambda data: data[:-5],                   # truncated matrix
+    lambda data: b"XXXX" + data[4:],          # wrong magic
+    lambda data: data + b"\0" * 16,           # rows do not match the size
+])
+def test_corrupt_file_is_a_miss_and_is_removed(cache_dir, damage):
+    matrix, spans = _index()
+    embedcache.store("paper", matrix, spans)
+    path = embedcache._path("paper")
+    with open(path, "rb") as fh:
+        data = fh.read()
+    with open(path, "wb") as fh:
+        fh.write(damage(data))
+    embedcache._mapped.clear()
+
+    assert embedcache.load("paper") is None
+    assert not os.path.exists(path)
+    assert embedcache.load("missing") is None
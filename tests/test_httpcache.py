@@ -0,0 +1,77 @@
+from app.core import pipeline
+from app.models.paper import Paper, StatusEnum
+
+
+def _library(client, headers, etag=None):
+    if etag is not None:
+        headers = {**headers, "If-None-Match": etag}
+    return client.get("/papers/", headers=headers)
+
+
+def _setup(db, make_user, auth_headers):
+    user = make_user()
+    paper = Paper(title="Cached", user_id=user.id, status=StatusEnum.TO_READ)
+    db.add(paper)
+    db.commit()
+    return user, paper, auth_headers(user)
+
+
+def test_repeat_get_with_if_none_match_is_304(client, auth_headers, db, make_user):
+    _, paper, headers = _setup(db, make_user, auth_headers)
+
+    first = _library(client, headers)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and [row["title"] for row in first.json()] == ["Cached"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    again = _library(client, headers, etag)
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["ETag"] == etag
+
+    one = client.get(f"/papers/{paper.id}", headers=headers)
+    assert one.headers["ETag"] != etag  # views of the library have their own tags
+    assert client.get(f"/papers/{paper.id}", headers={**headers, "If-None-Match": one.headers["ETag"]}).status_code == 304
+
+
+def test_single_patch_changes_the_etag(client, auth_headers, db, make_user):
+    _, paper, headers = _setup(db, make_user, auth_headers)
+    etag = _library(client, headers).headers["ETag"]
+
+    assert client.patch(f"/papers/{paper.id}", headers=headers, json={"title": "Renamed"}).status_code == 200
+
+    resp = _library(client, headers, etag)
+    assert resp.status_code == 200 and resp.headers["ETag"] != etag
+    assert [row["title"] for row in resp.json()] == ["Renamed"]
+
+
+def test_bulk_patch_changes_the_etag(client, auth_headers, db, make_user):
+    _, _, headers = _setup(db, make_user, auth_headers)
+    etag = _library(client, headers).headers["ETag"]
+
+    resp = client.patch("/papers/bulk", headers=headers,
+                        json={"where": {"status": "TO_READ"}, "changes": {"status": "DONE"}})
+    assert resp.json() == {"affected": 1}
+
+    resp = _library(client, headers, etag)
+    assert resp.status_code == 200 and resp.headers["ETag"] != etag
+    assert [row["status"] for row in resp.json()] == ["DONE"]
+
+
+def test_pipeline_state_change_changes_the_etag(client, auth_headers, db, make_user):
+    _, paper, headers = _setup(db, make_user, auth_headers)
+    etag = _library(client, headers).headers["ETag"]
+
+    pipeline._set_state([paper.id], pipeline.FAILED, error="Could not read the PDF")
+
+    resp = _library(client, headers, etag)
+    assert resp.status_code == 200 and resp.headers["ETag"] != etag
+
+
+def test_other_users_writes_keep_the_etag(client, auth_headers, db, make_user):
+    _, _, headers = _setup(db, make_user, auth_headers)
+    _, theirs, their_headers = _setup(db, make_user, auth_headers)
+    etag = _library(client, headers).headers["ETag"]
+
+    client.patch(f"/papers/{theirs.id}", headers=their_headers, json={"title": "Theirs, renamed"})
+
+    assert _library(client, headers, etag).status_code == 304
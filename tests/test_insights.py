@@ -0,0 +1,73 @@
+from app.api import papers as papers_api
+from app.core import insights
+from app.models.paper import Paper
+
+TEXT = """Learning to Cache Insights
+
+Abstract
+We study when to compute structural insights for {name}.
+
+1 Introduction
+Insights are computed once per text, at ingest.
+
+2 Method
+Request handlers only read them.
+
+References
+[1] A. Author. Computing things ahead of time. 2020.
+"""
+
+
+def _paper(db, user, name: str) -> Paper:
+    paper = Paper(title=name, user_id=user.id, paper_text=TEXT.format(name=name))
+    db.add(paper)
+    db.commit()
+    return paper
+
+
+def test_get_serves_stored_insights_and_queues_missing_ones(client, auth_headers, db, make_user, monkeypatch):
+    computed = []
+    compute = insights.compute_insights
+
+    def counting(db, text):
+        computed.append(text)
+        return compute(db, text)
+
+    monkeypatch.setattr(insights, "compute_insights", counting)
+    user = make_user()
+    paper = _paper(db, user, "get")
+    headers = auth_headers(user)
+
+    first = client.get(f"/papers/{paper.id}/insights", headers=headers)
+
+    assert first.status_code == 409 and first.headers["Retry-After"]
+    assert computed == [paper.paper_text]  # in the background task, after the response
+
+    second = client.get(f"/papers/{paper.id}/insights", headers=headers)
+    assert second.status_code == 200, second.text
+    assert [section["title"] for section in second.json()["sections"]][:2] == ["Abstract", "Introduction"]
+    assert len(computed) == 1
+
+
+def test_outdated_insights_are_not_served(db, make_user, monkeypatch):
+    user = make_user()
+    paper = _paper(db, user, "outdated")
+    insights.precompute(paper.paper_text)
+    monkeypatch.setattr(insights, "VERSION", insights.VERSION + 1)
+
+    assert insights.stored_insights(db, paper.paper_text) is None
+
+
+def test_chat_reads_insights_without_computing_them(client, auth_headers, db, make_user, monkeypatch):
+    seen = []
+    monkeypatch.setattr(papers_api, "chat_with_paper", lambda text, query, found: seen.append(found) or "answer")
+    user = make_user()
+    paper = _paper(db, user, "chat")
+    headers = auth_headers(user)
+
+    for _ in range(2):
+        resp = client.post(f"/papers/{paper.id}/chat", headers=headers, data={"query": "What are the sections?"})
+        assert resp.json() == {"response": "answer"}
+
+    # The first turn goes without (and queues them), the next one has them
+    assert seen[0] is None and seen[1]["sections"]
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+import pytest
+
+from app.core import pipeline
+from app.models.paper import Paper
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """Papers resume() hands to the pipeline, without running it."""
+    papers = []
+    monkeypatch.setattr(pipeline, "submit", lambda paper_ids, user_id, pdf_key, stages: papers.extend(paper_ids))
+    monkeypatch.setattr(pipeline, "submit_text", lambda paper_ids, user_id, stages: papers.extend(paper_ids))
+    return papers
+
+
+def _paper(db, user, **values) -> Paper:
+    paper = Paper(title="Queued", user_id=user.id, pdf_sha256="ab" * 32, **values)
+    db.add(paper)
+    db.commit()
+    return paper
+
+
+def test_resume_claims_papers_whose_lease_expired(db, make_user, submitted):
+    user = make_user()
+    stale = _paper(db, user, processing_state=pipeline.EXTRACTING, processing_owner="crashed-worker",
+                   processing_heartbeat=pipeline._now() - timedelta(seconds=pipeline.LEASE_SECONDS + 1))
+    never_leased = _paper(db, user, processing_state=pipeline.QUEUED)
+
+    pipeline.resume()
+
+    assert stale.id in submitted and never_leased.id in submitted
+    db.refresh(stale)
+    assert stale.processing_owner == pipeline.owner_id()
+
+
+def test_resume_leaves_papers_leased_by_a_live_worker(db, make_user, submitted):
+    user = make_user()
+    sibling = _paper(db, user, processing_state=pipeline.EMBEDDING, processing_owner="sibling-worker",
+                     processing_heartbeat=pipeline._now())
+    mine = _paper(db, user, **pipeline.queued())
+    done = _paper(db, user, processing_state=pipeline.READY)
+
+    pipeline.resume()
+
+    assert not {sibling.id, mine.id, done.id} & set(submitted)
+    db.refresh(sibling)
+    assert sibling.processing_owner == "sibling-worker"
+
+
+def test_resumed_paper_is_claimed_once(db, make_user, submitted):
+    user = make_user()
+    paper = _paper(db, user, processing_state=pipeline.QUEUED)
+
+    pipeline.resume()
+    pipeline.resume()  # e.g. the next heartbeat, or a sibling worker
+
+    assert submitted.count(paper.id) == 1
+
+
+def test_resume_runs_the_stages_the_paper_was_queued_with(db, make_user, monkeypatch):
+    user = make_user()
+    calls = []
+    monkeypatch.setattr(pipeline, "submit", lambda *args: calls.append(("extract",) + args))
+    monkeypatch.setattr(pipeline, "submit_text", lambda *args: calls.append(("index",) + args))
+    pdf = _paper(db, user, processing_state=pipeline.EXTRACTING, processing_stages="")
+    text_only = Paper(title="Imported", user_id=user.id, paper_text="Imported text.",
+                      processing_state=pipeline.QUEUED, processing_stages=pipeline.EMBED)
+    db.add(text_only)
+    db.commit()
+
+    pipeline.resume()
+
+    assert ("extract", [pdf.id], user.id, pdf.pdf_sha256, "") in calls
+    assert ("index", [text_only.id], user.id, pipeline.EMBED) in calls
+
+
+def test_papers_with_stored_text_are_indexed_once_per_distinct_text(db, make_user, monkeypatch):
+    indexed = []
+    monkeypatch.setattr(pipeline, "_index", lambda paper_ids, user_id, text, stages: indexed.append((paper_ids, text)))
+    user = make_user()
+    first, copy, other = (_paper(db, user, paper_text=text) for text in ("Same text.", "Same text.", "Other."))
+
+    pipeline._index_stored([first.id, copy.id, other.id], user.id, pipeline.EMBED)
+
+    assert indexed == [([first.id, copy.id], "Same text."), ([other.id], "Other.")]
@@ -0,0 +1,197 @@
+import time
+
+import pytest
+
+from app.core import deadlines, providers
+from app.core.providers import (
+    Provider, ProviderError, ProviderTimeoutError, ProviderUnavailableError,
+)
+
+
+class APIStatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ReadTimeout(Exception):
+    pass
+
+
+class FakeClock:
+    """time.monotonic() / time.sleep() that only move when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class FakeClient:
+    """Answers each call with the next outcome (an exception to raise, or a value)."""
+
+    def __init__(self, clock: FakeClock, *outcomes, latency: float = 0.0):
+        self.clock = clock
+        self.outcomes = list(outcomes)
+        self.latency = latency
+        self.timeouts = []
+
+    def __call__(self, timeout: float):
+        self.timeouts.append(timeout)
+        self.clock.now += self.latency
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(time, "sleep", fake.sleep)
+    monkeypatch.setattr(providers.random, "uniform", lambda low, high: high)  # no jitter
+    return fake
+
+
+def _provider(**overrides) -> Provider:
+    settings = dict(name="fake", timeout=10.0, max_retries=2, max_concurrency=2,
+                    failure_threshold=3, reset_timeout=30.0, backoff_base=0.5, backoff_max=4.0)
+    settings.update(overrides)
+    return Provider(**settings)
+
+
+def test_retries_transient_errors_with_backoff(clock):
+    provider = _provider()
+    client = FakeClient(clock, APIStatusError(503), APIStatusError(429), "answer")
+
+    assert provider.call(client) == "answer"
+    assert len(client.timeouts) == 3
+    assert clock.slept == [0.5, 1.0]
+    assert provider.breaker.state == "closed"
+
+
+def test_non_retryable_errors_are_not_retried_and_keep_the_circuit_closed(clock):
+    provider = _provider(failure_threshold=1)
+    client = FakeClient(clock, APIStatusError(400))
+
+    with pytest.raises(ProviderError) as raised:
+        provider.call(client)
+
+    assert not raised.value.retryable
+    assert len(client.timeouts) == 1 and clock.slept == []
+    assert provider.breaker.state == "closed"
+
+
+def test_retries_stop_at_the_deadline(clock):
+    provider = _provider(max_retries=10, backoff_base=1.0)
+    client = FakeClient(clock, *[ReadTimeout("read timed out")] * 10, latency=1.0)
+
+    with pytest.raises(ProviderTimeoutError):
+        provider.call(client, timeout=5.0)
+
+    # Each attempt only gets what is left of the 5s budget, and no pause runs past it
+    assert client.timeouts[0] == 5.0
+    assert all(later < earlier for earlier, later in zip(client.timeouts, client.timeouts[1:]))
+    assert clock.now <= 1000.0 + 5.0
+    assert len(client.timeouts) < 10
+
+
+def test_breaker_opens_after_threshold_and_half_opens_after_cooldown(clock):
+    provider = _provider(max_retries=0, failure_threshold=3, reset_timeout=30.0)
+    failing = FakeClient(clock, *[APIStatusError(500)] * 3)
+    for _ in range(3):
+        with pytest.raises(ProviderError):
+            provider.call(failing)
+    assert provider.breaker.state == "open"
+
+    # Open: fail fast, without calling the provider
+    untouched = FakeClient(clock)
+    with pytest.raises(ProviderUnavailableError) as raised:
+        provider.call(untouched)
+    assert untouched.timeouts == [] and raised.value.retry_after == pytest.approx(30.0)
+
+    # After the cooldown a single probe goes through; its failure re-opens the circuit
+    clock.now += 30.0
+    assert provider.breaker.state == "half_open"
+    with pytest.raises(ProviderError):
+        provider.call(FakeClient(clock, APIStatusError(502)))
+    assert provider.breaker.state == "open"
+
+    # A successful probe closes it
+    clock.now += 30.0
+    assert provider.call(FakeClient(clock, "back")) == "back"
+    assert provider.breaker.state == "closed"
+
+
+def test_half_open_lets_only_one_probe_through(clock):
+    provider = _provider(max_retries=0, failure_threshold=1)
+    with pytest.raises(ProviderError):
+        provider.call(FakeClient(clock, APIStatusError(500)))
+    clock.now += 30.0
+
+    breaker = provider.breaker
+    assert breaker.allow() is True   # the probe
+    assert breaker.allow() is False  # everyone else while it is in flight
+
+
+def test_breakers_are_per_key(clock):
+    provider = _provider(max_retries=0, failure_threshold=1)
+    with pytest.raises(ProviderError):
+        provider.call(FakeClient(clock, APIStatusError(500)), key="model-a")
+
+    assert provider.breaker_for("model-a").state == "open"
+    assert provider.call(FakeClient(clock, "fine"), key="model-b") == "fine"
+
+
+def test_concurrency_limit_rejects_when_no_slot_frees_up(clock):
+    provider = _provider(max_concurrency=1, queue_timeout=0.0)
+    provider._slots.acquire()  # a call already in flight
+    try:
+        with pytest.raises(ProviderUnavailableError, match="too many in-flight"):
+            provider.call(FakeClient(clock))
+    finally:
+        provider._slots.release()
+
+
+def test_call_is_limited_by_the_request_deadline(clock):
+    provider = _provider()
+    request = deadlines.Deadline(2.0)
+    token = deadlines._current.set(request)
+    try:
+        client = FakeClient(clock, "answer")
+        assert provider.call(client) == "answer"
+        assert client.timeouts == [2.0]
+
+        # A timeout caused by the request's own deadline is the request's, not the provider's
+        with pytest.raises(deadlines.DeadlineExceeded):
+            provider.call(FakeClient(clock, ReadTimeout("read timed out"), latency=2.0))
+        assert provider.breaker.state == "closed"
+
+        # Nothing is started once the deadline has passed
+        untouched = FakeClient(clock)
+        with pytest.raises(deadlines.DeadlineExceeded):
+            provider.call(untouched)
+        assert untouched.timeouts == []
+    finally:
+        deadlines._current.reset(token)
+
+
+def test_no_retry_after_the_client_disconnects(clock):
+    provider = _provider()
+    request = deadlines.Deadline(60.0)
+    token = deadlines._current.set(request)
+    try:
+        client = FakeClient(clock, APIStatusError(503), "answer")
+        request.cancel()
+        with pytest.raises(deadlines.RequestCancelled):
+            provider.call(client)
+        assert client.timeouts == []
+    finally:
+        deadlines._current.reset(token)
@@ -0,0 +1,96 @@
+import pytest
+
+from app.core import ratelimit
+from app.core.ratelimit import MemoryBackend, parse_rate
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic() for the limiter."""
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_parse_rate():
+    assert parse_rate("20/minute") == (20.0, 20 / 60)
+    assert parse_rate("10/hour") == (10.0, 10 / 3600)
+    with pytest.raises(ValueError):
+        parse_rate("10/fortnight")
+
+
+def test_bucket_allows_a_burst_of_capacity_then_rejects(clock):
+    backend = MemoryBackend()
+    results = [backend.take("u:chat", 3, 1.0)[0] for _ in range(4)]
+    assert results == [True, True, True, False]
+    allowed, tokens, wait = backend.take("u:chat", 3, 1.0)
+    assert not allowed
+    assert wait == pytest.approx(1 - tokens)
+
+
+def test_bucket_refills_at_the_configured_rate(clock):
+    backend = MemoryBackend()
+    for _ in range(2):
+        backend.take("u:chat", 2, 0.5)
+    assert not backend.take("u:chat", 2, 0.5)[0]
+    clock[0] += 1.0  # half a token
+    assert not backend.take("u:chat", 2, 0.5)[0]
+    clock[0] += 1.0
+    assert backend.take("u:chat", 2, 0.5)[0]
+    clock[0] += 100.0  # refill never exceeds capacity
+    assert backend.peek("u:chat", 2, 0.5) == 2
+
+
+def test_buckets_are_per_key(clock):
+    backend = MemoryBackend()
+    assert backend.take("1:chat", 1, 0.1)[0]
+    assert not backend.take("1:chat", 1, 0.1)[0]
+    assert backend.take("2:chat", 1, 0.1)[0]
+    assert backend.take("1:summarize", 1, 0.1)[0]
+
+
+def test_idle_buckets_are_evicted_once_full_again(clock):
+    backend = MemoryBackend()
+    for user_id in range(100):
+        backend.take(f"{user_id}:chat", 10, 1.0)
+    assert len(backend) == 100
+    clock[0] += 0.5  # one token short of full: kept
+    backend.take("active:chat", 10, 1.0)
+    assert len(backend) == 101
+    clock[0] += 1.0
+    backend.take("active:chat", 10, 1.0)
+    assert len(backend) == 1
+    # An evicted bucket reads as full, which is what it would have refilled to
+    assert backend.peek("0:chat", 10, 1.0) == 10
+    assert backend.take("0:chat", 10, 1.0)[1] == 9
+
+
+def test_eviction_follows_refill_time_across_mixed_periods(clock):
+    backend = MemoryBackend()
+    backend.take("1:upload", *parse_rate("10/hour"))  # full again in 6 minutes
+    for user_id in range(100):
+        backend.take(f"{user_id}:chat", *parse_rate("20/minute"))  # full again in 3 seconds
+    clock[0] += 4.0
+    backend.take("2:upload", *parse_rate("10/hour"))
+    # The older, slower bucket does not hold back the chat buckets behind it
+    assert len(backend) == 2
+    assert backend.peek("1:upload", *parse_rate("10/hour")) < 10
+    clock[0] += 360.0
+    backend.take("3:chat", *parse_rate("20/minute"))
+    assert len(backend) == 1
+
+
+def test_busy_key_does_not_grow_the_expiry_heap(clock):
+    backend = MemoryBackend()
+    for _ in range(1000):
+        backend.take("busy:chat", 1000, 1.0)
+        clock[0] += 0.001
+    assert len(backend) == 1
+    assert len(backend._expiry) <= 2 * len(backend) + 64
+
+
+def test_daily_usage_resets_with_the_day():
+    backend = MemoryBackend()
+    assert backend.add_usage("u:llm_tokens", 5, "2026-01-01") == 5
+    assert backend.add_usage("u:llm_tokens", 5, "2026-01-01") == 10
+    assert backend.get_usage("u:llm_tokens", "2026-01-02") == 0
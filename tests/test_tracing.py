@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+
+from app.core.tracing import SlowRequestProfiler
+
+
+def _spin(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def spin_in_request_a():
+    _spin(0.01)
+
+
+def spin_in_request_b():
+    _spin(0.01)
+
+
+def spin_in_background():
+    _spin(0.3)
+
+
+def test_slow_request_profile_only_attributes_its_own_task(tmp_path):
+    profiler = SlowRequestProfiler(threshold_ms=0, interval_ms=1, output_dir=str(tmp_path))
+    background = threading.Thread(target=spin_in_background, name="pipeline-embed_0")
+
+    async def request(label: str, work):
+        token = profiler.request_started()
+        started = time.perf_counter()
+        for _ in range(20):
+            work()
+            await asyncio.sleep(0)  # let the other request run in between
+        profiler.request_finished(started, label, token)
+
+    async def main():
+        await asyncio.gather(request("a", spin_in_request_a), request("b", spin_in_request_b))
+
+    background.start()
+    asyncio.run(main())
+    background.join()
+    profiler._writer.submit(lambda: None).result()  # wait for the dumps
+
+    profiles = {path.name.rsplit("-", 1)[1]: path.read_text() for path in tmp_path.iterdir()}
+    assert set(profiles) == {"a.folded", "b.folded"}
+    assert "spin_in_request_a" in profiles["a.folded"] and "spin_in_request_b" not in profiles["a.folded"]
+    assert "spin_in_request_b" in profiles["b.folded"] and "spin_in_request_a" not in profiles["b.folded"]
+    # Other threads' work is kept apart, under its own root frame
+    assert "[thread pipeline-embed_0];" in profiles["a.folded"]
+    for line in profiles["a.folded"].splitlines():
+        assert "spin_in_background" not in line or line.startswith("[thread pipeline-embed_0];")